@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Write an export straight into a zip or tar.gz archive.
+
+``ArchiveWriter`` has the same ``write()`` / ``write_chunks()`` interface
+as ``BatchedWriter``, so ``create_markdown_files()`` and the logbook
+writers can render into an archive instead of the filesystem::
+
+    with ArchiveWriter("things-backup.tar.gz") as writer:
+        create_markdown_files(projects, "things3_projects", writer=writer)
+        writer.write_chunks("logbook.md", iter_logbook_md(logbook))
+
+Members are streamed into the archive as they are rendered, in the order
+they are written, so a backup is one sequential write. Every member gets
+the same timestamp (``SOURCE_DATE_EPOCH`` if set, else 1980-01-01),
+fixed permissions and no owner, and the gzip header carries no name or
+time, so the same data always gives a byte-identical archive. The
+archive is written to a temporary file and renamed into place when the
+writer is closed.
+"""
+
+import argparse
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from output_writer import create_temp_file
+
+ARCHIVE_FORMATS = {".zip": "zip", ".tar.gz": "tar.gz", ".tgz": "tar.gz", ".tar": "tar"}
+DEFAULT_ARCHIVE_MTIME = 315532800  # 1980-01-01, the earliest time a zip member can carry
+MEMBER_MODE = 0o644
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+def archive_format(path):
+    """Return the archive format implied by the file name."""
+    for suffix, archive_type in ARCHIVE_FORMATS.items():
+        if path.endswith(suffix):
+            return archive_type
+    raise ValueError(f"Cannot tell the archive format of {path!r}; use one of: {', '.join(ARCHIVE_FORMATS)}")
+
+
+def archive_mtime():
+    """Return the timestamp given to every member."""
+    return int(os.environ.get("SOURCE_DATE_EPOCH", DEFAULT_ARCHIVE_MTIME))
+
+
+class ArchiveWriter:
+    """Stream files into a zip, tar or tar.gz archive, one member per write."""
+
+    # Every archive starts empty, so exporters must write everything
+    incremental = False
+
+    def __init__(self, path, root=".", archive_type=None, mtime=None):
+        self.path = path
+        self.root = root
+        self.archive_type = archive_type or archive_format(path)
+        self.mtime = archive_mtime() if mtime is None else mtime
+        self.members = set()
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, self.temp_path = create_temp_file(path)
+        self.file = os.fdopen(fd, 'wb')
+        self.gzip = None
+        if self.archive_type == "zip":
+            self.archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            fileobj = self.file
+            if self.archive_type == "tar.gz":
+                self.gzip = gzip.GzipFile(filename="", mode='wb', fileobj=self.file, mtime=self.mtime)
+                fileobj = self.gzip
+            self.archive = tarfile.open(fileobj=fileobj, mode='w|', format=tarfile.PAX_FORMAT)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    def member_name(self, path):
+        """Return the archive member name of a path below root."""
+        name = os.path.relpath(path, self.root).replace(os.sep, "/")
+        if name == ".." or name.startswith("../"):
+            raise ValueError(f"{path!r} is outside the archive root {self.root!r}")
+        if name in self.members:
+            raise ValueError(f"{name!r} was already written to {self.path}")
+        self.members.add(name)
+        return name
+
+    def makedirs(self, directory):
+        """Directories are implied by member names; nothing to create."""
+
+    def remove(self, path):
+        """An archive starts empty; there is nothing to remove."""
+
+    def write(self, path, content):
+        """Add content as a member; returns 'created' like BatchedWriter.write()."""
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        name = self.member_name(path)
+        if self.archive_type == "zip":
+            self.archive.writestr(self.zip_info(name), data)
+        else:
+            self.archive.addfile(self.tar_info(name, len(data)), io.BytesIO(data))
+        self.created += 1
+        return "created"
+
+    def write_chunks(self, path, chunks):
+        """
+        Like write(), but for content produced piece by piece.
+
+        Zip members are compressed as the chunks arrive. A tar header needs
+        the member size up front, so chunks are spooled (in memory up to
+        SPOOL_SIZE, then on disk) before the member is added.
+        """
+        encoded = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+        name = self.member_name(path)
+        if self.archive_type == "zip":
+            with self.archive.open(self.zip_info(name), 'w') as member:
+                for chunk in encoded:
+                    member.write(chunk)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+                for chunk in encoded:
+                    spool.write(chunk)
+                size = spool.tell()
+                spool.seek(0)
+                self.archive.addfile(self.tar_info(name, size), spool)
+        self.created += 1
+        return "created"
+
+    def zip_info(self, name):
+        info = zipfile.ZipInfo(name, date_time=time.gmtime(self.mtime)[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = (0o100000 | MEMBER_MODE) << 16
+        return info
+
+    def tar_info(self, name, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = self.mtime
+        info.mode = MEMBER_MODE
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        return info
+
+    def flush(self):
+        """Members are streamed as they are written; kept for BatchedWriter parity."""
+
+    def close(self):
+        """Finish the archive and move it into place."""
+        self.archive.close()
+        if self.gzip is not None:
+            self.gzip.close()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def discard(self):
+        """Abandon the archive, leaving any previous one in place."""
+        try:
+            self.archive.close()
+        except Exception:
+            pass
+        self.file.close()
+        try:
+            os.unlink(self.temp_path)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up the Things 3 projects and logbook into one archive.")
+    parser.add_argument("archive", help="archive to write (.zip, .tar.gz, .tgz or .tar)")
+    parser.add_argument("--projects-directory", default="things3_projects",
+                        help="directory of the project files inside the archive (default: %(default)s)")
+    parser.add_argument("--logbook", default="logbook.md",
+                        help="path of the logbook inside the archive (default: %(default)s)")
+    parser.add_argument("--templates", metavar="FILE", help="JSON file of custom output templates")
+    args = parser.parse_args()
+
+    try:
+        archive_format(args.archive)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from md_templates import load_templates
+    from projects2md import create_markdown_files, get_all_tasks, group_tasks_by_project
+    from things2md import iter_logbook_md
+    from thingsdb import get_logbook
+
+    templates = load_templates(args.templates) if args.templates else None
+
+    print("Fetching tasks from Things 3...")
+    projects = group_tasks_by_project(get_all_tasks())
+    logbook = get_logbook()
+
+    with ArchiveWriter(args.archive) as writer:
+        create_markdown_files(projects, args.projects_directory, templates, writer=writer)
+        writer.write_chunks(args.logbook, iter_logbook_md(logbook, templates=templates))
+
+    print(f"Backup complete: {writer.created} files, {len(logbook)} logbook entries")
+    print(f"  Archive: {args.archive}")
+
+
+if __name__ == "__main__":
+    main()
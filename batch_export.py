@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Export many Things databases in one run.
+
+Each job pairs a copied ``main.sqlite`` with an output root; the logbook,
+project files and Dida CSV of that database are written below the root::
+
+    OUTPUT_ROOT/logbook.md
+    OUTPUT_ROOT/things3_projects/*.md
+    OUTPUT_ROOT/Things_to_Dida_export.csv
+
+Jobs run on a process pool, one database per worker at a time, with
+``THINGSDB`` pointing at that job's database. A failing export is
+recorded in the report and does not stop the other exports or jobs.
+
+The jobs file has one ``DB_PATH<TAB>OUTPUT_ROOT`` pair per line; blank
+lines and lines starting with ``#`` are ignored.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+EXPORTS = ("logbook", "projects", "dida")
+LOGBOOK_FILENAME = "logbook.md"
+PROJECTS_DIRECTORY = "things3_projects"
+DIDA_FILENAME = "Things_to_Dida_export.csv"
+
+
+@contextlib.contextmanager
+def things_database(db_path):
+    """Point things.py (and thingsdb) at db_path for the duration of a block."""
+    previous = os.environ.get("THINGSDB")
+    os.environ["THINGSDB"] = db_path
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("THINGSDB", None)
+        else:
+            os.environ["THINGSDB"] = previous
+
+
+def export_logbook(output_root, writer):
+    """Write OUTPUT_ROOT/logbook.md."""
+    from things2md import iter_logbook_md
+    from thingsdb import get_logbook
+
+    return writer.write_chunks(os.path.join(output_root, LOGBOOK_FILENAME), iter_logbook_md(get_logbook()))
+
+
+def export_projects(output_root, writer):
+    """Write one Markdown file per project into OUTPUT_ROOT/things3_projects."""
+    from projects2md import create_markdown_files, get_all_tasks, group_tasks_by_project
+
+    projects = group_tasks_by_project(get_all_tasks())
+    created, updated, unchanged = create_markdown_files(
+        projects, os.path.join(output_root, PROJECTS_DIRECTORY), writer=writer
+    )
+    return f"{created} created, {updated} updated, {unchanged} unchanged"
+
+
+def export_dida(output_root, writer):
+    """Write OUTPUT_ROOT/Things_to_Dida_export.csv."""
+    from things2dida import export_to_dida_csv
+
+    export_to_dida_csv(os.path.join(output_root, DIDA_FILENAME))
+    return "written"
+
+
+EXPORT_FUNCTIONS = {
+    "logbook": export_logbook,
+    "projects": export_projects,
+    "dida": export_dida,
+}
+
+
+def run_job(db_path, output_root, exports=EXPORTS):
+    """
+    Run the exports of one database and return its report.
+
+    Runs in a worker process. Output of the exporters is captured, and an
+    exception in one export is recorded without skipping the others.
+    """
+    from output_writer import BatchedWriter
+
+    report = {
+        "db": db_path,
+        "output": output_root,
+        "seconds": {},
+        "results": {},
+        "errors": {},
+        "total": 0.0,
+    }
+    started = time.perf_counter()
+
+    if not os.path.isfile(db_path):
+        report["errors"]["db"] = f"No such database: {db_path}"
+        return report
+
+    os.makedirs(output_root, exist_ok=True)
+    with things_database(db_path), contextlib.redirect_stdout(io.StringIO()):
+        for name in exports:
+            export_started = time.perf_counter()
+            try:
+                with BatchedWriter() as writer:
+                    report["results"][name] = EXPORT_FUNCTIONS[name](output_root, writer)
+            except Exception:
+                report["errors"][name] = traceback.format_exc(limit=3).strip()
+            report["seconds"][name] = time.perf_counter() - export_started
+
+    report["total"] = time.perf_counter() - started
+    return report
+
+
+def load_jobs(path):
+    """Read (db_path, output_root) pairs from a jobs file."""
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            parts = line.split("\t")
+            if len(parts) != 2 or not all(part.strip() for part in parts):
+                raise ValueError(f"{path}:{number}: expected DB_PATH<TAB>OUTPUT_ROOT")
+            jobs.append((parts[0].strip(), parts[1].strip()))
+    return jobs
+
+
+def run_batch(jobs, exports=EXPORTS, max_workers=None):
+    """
+    Export every (db_path, output_root) job on a process pool.
+
+    Returns the job reports in the order of ``jobs`` and the wall-clock
+    seconds of the whole batch. A job whose worker dies is reported as
+    failed instead of aborting the batch.
+    """
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs) or 1))
+    reports = [None] * len(jobs)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(run_job, db_path, output_root, tuple(exports)): index
+            for index, (db_path, output_root) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                reports[index] = future.result()
+            except Exception as e:
+                db_path, output_root = jobs[index]
+                reports[index] = {
+                    "db": db_path,
+                    "output": output_root,
+                    "seconds": {},
+                    "results": {},
+                    "errors": {"worker": f"{type(e).__name__}: {e}"},
+                    "total": 0.0,
+                }
+
+    return reports, time.perf_counter() - started
+
+
+def format_report(reports, wall_seconds, exports=EXPORTS, max_workers=None):
+    """Render the combined timing report as a Markdown table."""
+    header = "| Database | " + " | ".join(exports) + " | Total | Status |"
+    lines = [header, "|" + "---|" * (len(exports) + 3)]
+    for report in reports:
+        times = " | ".join(
+            f"{report['seconds'][name]:.2f}s" if name in report["seconds"] else "-"
+            for name in exports
+        )
+        status = "failed: " + ", ".join(report["errors"]) if report["errors"] else "ok"
+        lines.append(f"| {report['db']} | {times} | {report['total']:.2f}s | {status} |")
+
+    busy = sum(report["total"] for report in reports)
+    failed = sum(1 for report in reports if report["errors"])
+    lines.append("")
+    lines.append(
+        f"{len(reports)} databases, {failed} failed, {max_workers or os.cpu_count()} workers: "
+        f"{wall_seconds:.2f}s wall clock, {busy:.2f}s of export work ({busy / wall_seconds if wall_seconds else 0:.1f}x)"
+    )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export many Things databases on a process pool.")
+    parser.add_argument("jobs", help="file of DB_PATH<TAB>OUTPUT_ROOT lines")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="maximum number of databases exported at once (default: %(default)s)")
+    parser.add_argument("--exports", default=",".join(EXPORTS),
+                        help="comma-separated exports to run (default: %(default)s)")
+    parser.add_argument("--report", metavar="FILE", help="also write the job reports as JSON")
+    args = parser.parse_args()
+
+    exports = [name.strip() for name in args.exports.split(",") if name.strip()]
+    unknown = [name for name in exports if name not in EXPORT_FUNCTIONS]
+    if unknown:
+        parser.error(f"unknown exports: {', '.join(unknown)}; expected some of: {', '.join(EXPORTS)}")
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    reports, wall_seconds = run_batch(jobs, exports, args.workers)
+    print(format_report(reports, wall_seconds, exports, args.workers))
+    for report in reports:
+        for name, error in report["errors"].items():
+            print(f"\n{report['db']} ({name}):\n{error}")
+
+    if args.report:
+        from output_writer import write_file_atomically
+        write_file_atomically(args.report, json.dumps({"wall_seconds": wall_seconds, "jobs": reports}, indent=2))
+
+    return 1 if any(report["errors"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+"""
+Declarative routing of Things tasks to calendars.
+
+Routes are read from a JSON list, evaluated in order::
+
+    [
+        {"calendar": "Work", "source": "upcoming", "area": "Work", "final": true},
+        {"calendar": "Errands", "source": "upcoming", "tag": ["errand", "shopping"]},
+        {"calendar": "Things Upcoming", "source": "upcoming"},
+        {"calendar": "Things Logbook", "source": "logbook"},
+        {"calendar": "Things Deadlines", "source": "deadlines"}
+    ]
+
+``source`` selects the task list a route draws from (``upcoming`` is
+Today plus Upcoming). ``area``, ``project`` and ``tag`` each take a title,
+UUID or list of them; a route matches a task when every condition it sets
+matches. A to-do matches the area it lives in, directly or through its
+project or heading, and the project of its heading. A task goes to every
+matching calendar unless a matching route is ``final``. All routes are
+evaluated in one pass over each source, so adding calendars adds neither
+database queries nor event scans.
+"""
+
+import json
+from collections import OrderedDict
+
+ROUTE_SOURCES = ("upcoming", "logbook", "deadlines")
+ROUTE_CONDITIONS = ("area", "project", "tag")
+ROUTE_KEYS = ("calendar", "source", "final") + ROUTE_CONDITIONS
+
+DEFAULT_ROUTES = [
+    {"calendar": "Things Upcoming", "source": "upcoming"},
+    {"calendar": "Things Logbook", "source": "logbook"},
+    {"calendar": "Things Deadlines", "source": "deadlines"},
+]
+
+
+def as_values(value):
+    """Normalise a condition value to a set of strings."""
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+def compile_route(route):
+    """Validate a route and pre-compute its condition sets."""
+    unknown = set(route) - set(ROUTE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown route keys: {', '.join(sorted(unknown))}")
+    if not route.get("calendar"):
+        raise ValueError("Every route needs a calendar")
+    if route.get("source") not in ROUTE_SOURCES:
+        raise ValueError(
+            f"Route for {route['calendar']!r} needs a source; expected one of: {', '.join(ROUTE_SOURCES)}"
+        )
+
+    return {
+        "calendar": route["calendar"],
+        "source": route["source"],
+        "final": bool(route.get("final")),
+        "conditions": [
+            (condition, as_values(route[condition]))
+            for condition in ROUTE_CONDITIONS
+            if route.get(condition)
+        ],
+    }
+
+
+def compile_routes(routes):
+    """Compile routes, checking that each calendar is fed by one source."""
+    compiled = [compile_route(route) for route in routes]
+
+    sources = {}
+    for route in compiled:
+        source = sources.setdefault(route["calendar"], route["source"])
+        if source != route["source"]:
+            raise ValueError(
+                f"Calendar {route['calendar']!r} is routed from both {source} and {route['source']}"
+            )
+    return compiled
+
+
+def load_routes(path=None):
+    """Load and compile routes from a JSON file (the defaults if None)."""
+    if path is None:
+        return compile_routes(DEFAULT_ROUTES)
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile_routes(json.load(f))
+
+
+def task_values(task, condition):
+    """Return the titles and UUIDs a task offers for a condition."""
+    if condition == "tag":
+        return set(task.get("tags") or [])
+    return {task.get(condition), task.get(f"{condition}_title")} - {None}
+
+
+def route_matches(route, task):
+    """Return True if every condition of a route matches a task."""
+    return all(values & task_values(task, condition) for condition, values in route["conditions"])
+
+
+def route_sources(routes):
+    """Return the sources any route draws from."""
+    return {route["source"] for route in routes}
+
+
+def route_tasks(routes, tasks_by_source):
+    """
+    Assign tasks to calendars in one pass per source.
+
+    Returns an ordered {calendar: {"source": source, "tasks": [...]}}
+    with every routed calendar present, even when no task matched, so
+    that its stale events are still removed.
+    """
+    routed = OrderedDict()
+    routes_by_source = {}
+    for route in routes:
+        routed.setdefault(route["calendar"], {"source": route["source"], "tasks": []})
+        routes_by_source.setdefault(route["source"], []).append(route)
+
+    for source, tasks in tasks_by_source.items():
+        source_routes = routes_by_source.get(source, [])
+        for task in tasks:
+            for route in source_routes:
+                if route_matches(route, task):
+                    routed[route["calendar"]]["tasks"].append(task)
+                    if route["final"]:
+                        break
+    return routed
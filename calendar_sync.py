@@ -0,0 +1,435 @@
+"""
+Apply calendar change plans computed by the Things-to-Calendar syncs.
+
+A plan is plain data describing what one sync would do to one calendar::
+
+    {
+        "calendar": "Things Logbook",
+        "creates": [fields, ...],
+        "updates": [{"uuid": uuid, "changes": fields}, ...],
+        "deletes": [uuid, ...],
+        "unchanged": 0,
+        "preserved": 0,
+    }
+
+Event fields use the keys ``uuid``, ``title``, ``notes``, ``url``,
+``start_date`` and ``end_date`` (Unix timestamps) and ``is_all_day``.
+Planning never touches the calendar store; ``apply_plan`` does all of the
+calendar I/O, in batches with a pause between them (``batch_size`` and
+``batch_interval``, kept on the ``CalendarSession``), and reports failures
+per batch.
+
+``plan_digest_sync`` plans logbook digests: one all-day event per day (or
+per day and project) listing that day's completions, instead of one event
+per completed to-do.
+
+``plan_carried_over`` adds the "carried over" digest: one all-day event on
+today listing the Today to-dos whose start date has passed. Those to-dos
+keep their own events on the day they were scheduled, so at midnight only
+the digest moves instead of every overdue event.
+
+``CalendarSession`` keeps the calendar store, the resolved calendars and
+the UUID -> event indexes alive between the cycles of a continuous sync.
+Indexes follow our own writes and are only reloaded from the store on a
+slower refresh interval (or after a failed write); ``preload`` reloads
+the stale indexes of several calendars with a single event query. It also
+remembers the Things-side change signature each calendar was last synced
+from, so a cycle can skip calendars whose view did not change.
+"""
+
+from Foundation import NSDate, NSURL
+from CalendarStore import CalCalendarStore, CalEvent
+from collections import defaultdict
+import datetime
+import time
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_INTERVAL = 0.5
+DEFAULT_REFRESH_INTERVAL = 1800
+
+RESULT_COUNTERS = {"create": "created", "update": "updated", "delete": "removed"}
+
+DIGEST_MODES = ("day", "project")
+DIGEST_STATUS_MARKS = {"completed": "✓", "canceled": "✗"}
+NO_GROUP = "No project or area"
+
+CARRIED_OVER_KEY = "today&carried-over=1"
+
+
+def empty_plan(calendar_name):
+    """Return a plan that changes nothing."""
+    return {
+        "calendar": calendar_name,
+        "creates": [],
+        "updates": [],
+        "deletes": [],
+        "unchanged": 0,
+        "preserved": 0,
+    }
+
+
+def plan_summary(plan):
+    """Describe the size of a plan in one line."""
+    return (
+        f"{len(plan['creates'])} to create, {len(plan['updates'])} to update, "
+        f"{len(plan['deletes'])} to remove, {plan['unchanged']} unchanged, {plan['preserved']} preserved"
+    )
+
+
+def set_event_fields(event, fields):
+    """Copy plan fields onto a CalEvent."""
+    if "title" in fields:
+        event.setTitle_(fields["title"])
+    if "notes" in fields:
+        event.setNotes_(fields["notes"])
+    if "start_date" in fields:
+        event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(fields["start_date"]))
+    if "end_date" in fields:
+        event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(fields["end_date"]))
+    if "url" in fields:
+        event.setUrl_(NSURL.URLWithString_(fields["url"]))
+    if "is_all_day" in fields:
+        event.setIsAllDay_(fields["is_all_day"])
+
+
+def plan_operations(plan):
+    """Flatten a plan into (kind, uuid, fields) operations."""
+    for fields in plan["creates"]:
+        yield "create", fields["uuid"], fields
+    for update in plan["updates"]:
+        yield "update", update["uuid"], update["changes"]
+    for uuid in plan["deletes"]:
+        yield "delete", uuid, None
+
+
+def apply_operation(store, calendar, events, operation):
+    """Run one operation; return None on success or an error message."""
+    kind, uuid, fields = operation
+
+    if kind == "create":
+        event = CalEvent.event()
+        event.setCalendar_(calendar)
+        set_event_fields(event, fields)
+        res, err = store.saveEvent_span_error_(event, 0, None)
+        if res:
+            events[uuid] = event
+    elif kind == "update":
+        event = events[uuid]
+        set_event_fields(event, fields)
+        res, err = store.saveEvent_span_error_(event, 0, None)
+    else:
+        res, err = store.removeEvent_span_error_(events[uuid], 0, None)
+        if res:
+            events.pop(uuid, None)
+
+    if res:
+        return None
+    return err.localizedDescription() if err else "Unknown error"
+
+
+def operation_label(operation, events):
+    """Name an operation in error reports."""
+    kind, uuid, fields = operation
+    title = (fields or {}).get("title")
+    if title is None and uuid in events:
+        title = events[uuid].title()
+    return f"{kind} {title or uuid}"
+
+
+def check_batching(batch_size, batch_interval):
+    """Raise ValueError unless the batch size and pause can be applied."""
+    if batch_size < 1:
+        raise ValueError(f"batch size must be at least 1, got {batch_size}")
+    if batch_interval < 0:
+        raise ValueError(f"batch interval cannot be negative, got {batch_interval}")
+
+
+def apply_plan(store, calendar, plan, events, batch_size=DEFAULT_BATCH_SIZE, batch_interval=DEFAULT_BATCH_INTERVAL,
+               dry_run=False):
+    """
+    Apply a plan to a calendar and return a result summary.
+
+    ``events`` is the UUID -> CalEvent index the plan was computed from; it
+    is kept up to date with the events created and removed here. At most
+    ``batch_size`` operations run back to back, with ``batch_interval``
+    seconds of pause between batches. With ``dry_run`` nothing is written
+    and the result shows what would have been.
+    """
+    check_batching(batch_size, batch_interval)
+    operations = list(plan_operations(plan))
+    result = {
+        "calendar": plan["calendar"],
+        "created": 0,
+        "updated": 0,
+        "removed": 0,
+        "unchanged": plan["unchanged"],
+        "preserved": plan["preserved"],
+        "failed": 0,
+        "batches": 0,
+        "errors": [],
+        "seconds": 0.0,
+    }
+
+    if dry_run:
+        for kind, _, _ in operations:
+            result[RESULT_COUNTERS[kind]] += 1
+        return result
+
+    started = time.perf_counter()
+    for number, first in enumerate(range(0, len(operations), batch_size), 1):
+        if number > 1 and batch_interval:
+            time.sleep(batch_interval)
+
+        batch = operations[first:first + batch_size]
+        failures = []
+        for operation in batch:
+            try:
+                error = apply_operation(store, calendar, events, operation)
+            except Exception as e:
+                error = str(e)
+            if error:
+                failures.append(f"{operation_label(operation, events)}: {error}")
+            else:
+                result[RESULT_COUNTERS[operation[0]]] += 1
+
+        result["batches"] = number
+        if failures:
+            result["failed"] += len(failures)
+            result["errors"].append({"batch": number, "operations": len(batch), "failures": failures})
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def digest_key(day, group=None):
+    """
+    Return the id of a digest event.
+
+    Digest URLs open the Things Logbook (``things:///show?id=logbook``); the
+    extra parameters make the id unique per day and project.
+    """
+    key = f"logbook&day={day}"
+    if group:
+        key += f"&group={group}"
+    return key
+
+
+def task_group(task):
+    """Return the (id, title) of a logbook task's project or area."""
+    if task.get("project"):
+        return task["project"], task.get("project_title") or NO_GROUP
+    if task.get("area"):
+        return task["area"], task.get("area_title") or NO_GROUP
+    return "none", NO_GROUP
+
+
+def group_logbook_digests(tasks, mode="day"):
+    """Group logbook tasks into digests keyed by digest_key()."""
+    digests = defaultdict(lambda: {"day": None, "group_title": None, "tasks": []})
+    for task in tasks:
+        if not task.get("stop_date"):
+            continue
+        day = task["stop_date"][:10]
+        if mode == "project":
+            group, group_title = task_group(task)
+        else:
+            group, group_title = None, None
+        digest = digests[digest_key(day, group)]
+        digest["day"] = day
+        digest["group_title"] = group_title
+        digest["tasks"].append(task)
+    return digests
+
+
+def digest_fields(key, digest):
+    """Return the plan fields of one digest event."""
+    tasks = sorted(digest["tasks"], key=lambda task: (task["stop_date"], task["uuid"]))
+    completed = sum(1 for task in tasks if task.get("status") == "completed")
+    canceled = len(tasks) - completed
+
+    title = f"{completed} completed"
+    if canceled:
+        title += f", {canceled} canceled"
+    title = f"{digest['group_title'] or 'Logbook'}: {title}"
+
+    notes = "\n".join(
+        f"{DIGEST_STATUS_MARKS.get(task.get('status'), '-')} {task['title']} things:///show?id={task['uuid']}"
+        for task in tasks
+    )
+    day = datetime.datetime.strptime(digest["day"], "%Y-%m-%d").timestamp()
+    return {
+        "uuid": key,
+        "title": title,
+        "notes": notes,
+        "start_date": day,
+        "end_date": day,
+        "url": f"things:///show?id={key}",
+        "is_all_day": True,
+    }
+
+
+def plan_digest_sync(calendar_name, tasks, existing_events, mode="day"):
+    """
+    Plan logbook digest events for a calendar.
+
+    A digest is only rewritten when its title or notes change, i.e. when
+    that day's set of completions changed. Any other event in the calendar
+    (including per-task events from before digests were enabled) is removed.
+    """
+    plan = empty_plan(calendar_name)
+    digests = group_logbook_digests(tasks, mode)
+
+    for key, digest in digests.items():
+        fields = digest_fields(key, digest)
+        existing_event = existing_events.get(key)
+        if existing_event is None:
+            plan["creates"].append(fields)
+        elif existing_event.title() != fields["title"] or (existing_event.notes() or "") != fields["notes"]:
+            plan["updates"].append({"uuid": key, "changes": {"title": fields["title"], "notes": fields["notes"]}})
+        else:
+            plan["unchanged"] += 1
+
+    plan["deletes"] = [uuid for uuid in existing_events if uuid not in digests]
+    return plan
+
+
+def is_carried_over(task, today):
+    """Return True if a Today task's start date (if any) is before today."""
+    start_date = task.get("start_date")
+    return not start_date or start_date[:10] < today.isoformat()
+
+
+def carried_over_fields(tasks, today):
+    """Return the plan fields of the carried-over digest for today."""
+    tasks = sorted(tasks, key=lambda task: (task.get("start_date") or "", task["uuid"]))
+    title = f"Carried over: {len(tasks)} to-do" + ("" if len(tasks) == 1 else "s")
+    notes = "\n".join(
+        f"- {task['title']}"
+        + (f" (since {task['start_date'][:10]})" if task.get("start_date") else "")
+        + f" things:///show?id={task['uuid']}"
+        for task in tasks
+    )
+    day = datetime.datetime.combine(today, datetime.time()).timestamp()
+    return {
+        "uuid": CARRIED_OVER_KEY,
+        "title": title,
+        "notes": notes,
+        "start_date": day,
+        "end_date": day,
+        "url": f"things:///show?id={CARRIED_OVER_KEY}",
+        "is_all_day": True,
+    }
+
+
+def plan_carried_over(plan, tasks, existing_events, today=None):
+    """
+    Add the carried-over digest for ``tasks`` to a plan.
+
+    Returns the digest's key when there is anything to carry over, so the
+    caller can keep it out of the plan's deletes, and None otherwise.
+    """
+    if not tasks:
+        return None
+    today = today or datetime.date.today()
+    fields = carried_over_fields(tasks, today)
+
+    existing_event = existing_events.get(CARRIED_OVER_KEY)
+    if existing_event is None:
+        plan["creates"].append(fields)
+    elif (
+        existing_event.title() != fields["title"]
+        or (existing_event.notes() or "") != fields["notes"]
+        or datetime.date.fromtimestamp(existing_event.startDate().timeIntervalSince1970()) != today
+    ):
+        changes = {name: fields[name] for name in ("title", "notes", "start_date", "end_date")}
+        plan["updates"].append({"uuid": CARRIED_OVER_KEY, "changes": changes})
+    else:
+        plan["unchanged"] += 1
+    return CARRIED_OVER_KEY
+
+
+class CalendarSession:
+    """Calendar store, calendars and event indexes reused across sync cycles."""
+
+    def __init__(self, refresh_interval=DEFAULT_REFRESH_INTERVAL, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_interval=DEFAULT_BATCH_INTERVAL):
+        check_batching(batch_size, batch_interval)
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.store = CalCalendarStore.defaultCalendarStore()
+        self.calendars = {}
+        self.indexes = {}
+        self.loaded_at = {}
+        self.preloaded = set()
+        self.signatures = {}
+
+    def calendar(self, calendar_name):
+        """Return a calendar by title, scanning the store only on a miss."""
+        calendar = self.calendars.get(calendar_name)
+        if calendar is None:
+            self.calendars = {c.title(): c for c in self.store.calendars()}
+            calendar = self.calendars.get(calendar_name)
+        return calendar
+
+    def events(self, calendar_name, load):
+        """
+        Return the UUID -> event index of a calendar.
+
+        ``load`` reads the index from the store; it is only called the
+        first time and once the index is older than the refresh interval.
+        The returned dict is the cached index itself, so apply_plan keeps
+        it current with the events it creates and removes.
+        """
+        if calendar_name in self.preloaded:
+            self.preloaded.discard(calendar_name)
+        elif self.is_stale(calendar_name):
+            self.indexes[calendar_name] = load()
+            self.loaded_at[calendar_name] = time.monotonic()
+        return self.indexes[calendar_name]
+
+    def is_stale(self, calendar_name):
+        """Return True if a calendar's index is missing or due for a reload."""
+        loaded_at = self.loaded_at.get(calendar_name)
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval
+
+    def preload(self, calendar_names, load):
+        """
+        Reload the stale indexes of several calendars with one read.
+
+        ``load`` maps a list of calendar titles to a {title: index} dict;
+        it is not called when every index is still fresh. The next call
+        to ``events`` for each calendar returns its preloaded index as is.
+        """
+        stale = [name for name in calendar_names if self.is_stale(name)]
+        if not stale:
+            return
+        indexes = load(stale)
+        now = time.monotonic()
+        for name in stale:
+            self.indexes[name] = indexes.get(name, {})
+            self.loaded_at[name] = now
+            self.preloaded.add(name)
+
+    def is_unchanged(self, calendar_name, signature):
+        """
+        Return True if a calendar was last synced from this signature.
+
+        Calendars whose index is due for a refresh never count as
+        unchanged, so edits made in the Calendar app are still picked up.
+        """
+        return self.signatures.get(calendar_name) == signature and not self.is_stale(calendar_name)
+
+    def invalidate(self, calendar_name=None):
+        """Force a reload of one calendar's index, or of everything."""
+        if calendar_name is None:
+            self.calendars = {}
+            self.indexes = {}
+            self.loaded_at = {}
+            self.preloaded = set()
+            self.signatures = {}
+        else:
+            self.indexes.pop(calendar_name, None)
+            self.loaded_at.pop(calendar_name, None)
+            self.preloaded.discard(calendar_name)
+            self.signatures.pop(calendar_name, None)
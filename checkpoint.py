@@ -0,0 +1,109 @@
+"""
+Checkpoints that let an interrupted export resume where it stopped.
+
+An export marks each finished item (a project, a logbook partition) with
+a signature of its input and the hash of the content it wrote. Every
+``save_every`` marks, or ``save_seconds`` after the last save, the writer
+is flushed, so the marked files are on disk, and only then is the
+checkpoint file saved. An export that is interrupted saves its
+checkpoint the same way before the exception propagates. A rerun with
+``--resume`` skips items whose signature still matches the checkpoint,
+without rendering or comparing them again. A completed export removes
+its checkpoint.
+
+A checkpoint written with other templates (a different render key) is
+ignored.
+"""
+
+import json
+import os
+import time
+
+from output_writer import write_file_atomically
+
+CHECKPOINT_FILENAME = ".checkpoint.json"
+DEFAULT_SAVE_EVERY = 20
+DEFAULT_SAVE_SECONDS = 5.0
+
+
+class Checkpoint:
+    """Progress of one export, saved next to its output."""
+
+    def __init__(self, output_directory, writer, render_key="", resume=False, save_every=DEFAULT_SAVE_EVERY,
+                 save_seconds=DEFAULT_SAVE_SECONDS):
+        self.path = os.path.join(output_directory, CHECKPOINT_FILENAME)
+        self.writer = writer
+        self.render_key = render_key
+        self.save_every = save_every
+        self.save_seconds = save_seconds
+        self.done = self.load() if resume else {}
+        self.pending = {}
+        self.resumed = 0
+        self.last_save = time.monotonic()
+
+    def load(self):
+        """Return the finished items of a previous run with the same render key."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("render_key") != self.render_key:
+            return {}
+        return data.get("done", {})
+
+    def resume(self, item, signature):
+        """
+        Return the recorded state of an item if it can be skipped, else None.
+
+        A skipped item stays in the checkpoint, so a second interruption
+        does not lose it.
+        """
+        state = self.done.get(item)
+        if state is None or state.get("signature") != signature:
+            return None
+        self.resumed += 1
+        return state
+
+    def mark(self, item, signature, content_hash):
+        """Record a finished item; it is saved after the next writer flush."""
+        self.pending[item] = {"signature": signature, "hash": content_hash}
+        if len(self.pending) >= self.save_every or time.monotonic() - self.last_save >= self.save_seconds:
+            self.save()
+
+    def save(self):
+        """Flush the writer, then persist every item marked so far."""
+        self.writer.flush()
+        self.done.update(self.pending)
+        self.pending = {}
+        self.last_save = time.monotonic()
+        write_file_atomically(
+            self.path,
+            json.dumps({"render_key": self.render_key, "done": self.done}, indent=1, sort_keys=True),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Save what an interrupted export finished, keeping the original error.
+
+        Staged files are complete, so they are moved into place before
+        the writer would discard them.
+        """
+        if exc_type is not None and self.pending:
+            try:
+                self.save()
+            except Exception:
+                pass
+        return False
+
+    def clear(self):
+        """Remove the checkpoint after the export completed."""
+        self.done = {}
+        self.pending = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Inject rendered logbook sections into existing Obsidian daily notes.
+
+Each day's section is written between marker comments in the matching
+daily note, leaving the rest of the note untouched. A small state file in
+the notes directory remembers the hash of every section already written
+and the size and modification time of its note, so notes are only opened
+when their section changed or the note was edited since.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+
+from output_writer import BatchedWriter, write_file_atomically
+
+START_MARKER = "<!-- things2md:logbook:start -->"
+END_MARKER = "<!-- things2md:logbook:end -->"
+STATE_FILENAME = ".things2md_daily_notes.json"
+DEFAULT_FILENAME_FORMAT = "%Y-%m-%d.md"
+
+
+def section_hash(section):
+    """Hash a rendered section so unchanged days can be skipped."""
+    return hashlib.md5(section.encode('utf-8')).hexdigest()
+
+
+def daily_note_path(notes_directory, date, filename_format=DEFAULT_FILENAME_FORMAT):
+    """Return the path of the daily note for an ISO date string."""
+    day = datetime.datetime.strptime(date, '%Y-%m-%d')
+    return os.path.join(notes_directory, day.strftime(filename_format))
+
+
+def replace_marked_region(note, section):
+    """Return the note with the text between the markers set to section."""
+    block = f"{START_MARKER}\n{section}\n{END_MARKER}" if section else f"{START_MARKER}\n{END_MARKER}"
+
+    start = note.find(START_MARKER)
+    end = note.find(END_MARKER, start + len(START_MARKER)) if start != -1 else -1
+    if start != -1 and end != -1:
+        return note[:start] + block + note[end + len(END_MARKER):]
+
+    if not section:
+        return note
+
+    if note and not note.endswith("\n"):
+        note += "\n"
+    if note.strip():
+        note += "\n"
+    return f"{note}{block}\n"
+
+
+def marked_region(note):
+    """Return the text between the markers of a note, or None without markers."""
+    start = note.find(START_MARKER)
+    if start == -1:
+        return None
+    end = note.find(END_MARKER, start + len(START_MARKER))
+    if end == -1:
+        return None
+    return note[start + len(START_MARKER):end].strip("\n")
+
+
+def note_stat(path):
+    """Return [mtime_ns, size] of a note, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_state(path):
+    """
+    Load the date -> {"hash", "stat"} map written by a previous run.
+
+    Older state files stored only the hash; their notes are checked once.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        date: entry if isinstance(entry, dict) else {"hash": entry, "stat": None}
+        for date, entry in state.items()
+    }
+
+
+def save_state(state, path):
+    """Persist the date -> {"hash", "stat"} map."""
+    write_file_atomically(path, json.dumps(state, indent=0, sort_keys=True))
+
+
+def write_section(path, section, writer):
+    """Rewrite the marked region of one note; return True if it changed."""
+    with open(path, 'r') as f:
+        note = f.read()
+
+    updated = replace_marked_region(note, section)
+    if updated == note:
+        return False
+
+    writer.write(path, updated)
+    return True
+
+
+class DailyNotes:
+    """
+    Write (date, section) pairs into the matching daily notes.
+
+    Notes that do not exist are left alone. A day whose section has not
+    changed since the last run is skipped without opening its note, as
+    long as the note itself is untouched; a note edited since then is
+    read to check that its markers still hold the section. Days that
+    disappeared from the logbook have their marked region cleared by
+    finish(). keep() lets a caller skip rendering days whose sections
+    cannot have changed.
+    """
+
+    def __init__(self, notes_directory, filename_format=DEFAULT_FILENAME_FORMAT, writer=None):
+        self.notes_directory = notes_directory
+        self.filename_format = filename_format
+        self.state_path = os.path.join(notes_directory, STATE_FILENAME)
+        self.state = load_state(self.state_path)
+        self.writer = writer or BatchedWriter()
+        self.stale = set(self.state)
+        self.written = []
+        self.updated = 0
+        self.unchanged = 0
+        self.missing = 0
+
+    def path(self, date):
+        return daily_note_path(self.notes_directory, date, self.filename_format)
+
+    def is_current(self, path, date, digest, section):
+        """Return True if the note at path already holds the section."""
+        entry = self.state.get(date)
+        if entry is None or entry["hash"] != digest:
+            return False
+        stat = note_stat(path)
+        if stat is None:
+            return False
+        if stat == entry["stat"]:
+            return True
+        with open(path, 'r') as f:
+            if marked_region(f.read()) != section:
+                return False
+        entry["stat"] = stat
+        return True
+
+    def add(self, date, section):
+        """Bring the note of one day up to date with its section."""
+        section = section.strip("\n")
+        self.stale.discard(date)
+        digest = section_hash(section)
+        path = self.path(date)
+        if self.is_current(path, date, digest, section):
+            self.unchanged += 1
+            return
+
+        if not os.path.exists(path):
+            # Recorded so keep() notices when the note is created
+            self.state[date] = {"hash": digest, "stat": None}
+            self.missing += 1
+            return
+
+        if write_section(path, section, self.writer):
+            self.updated += 1
+        else:
+            self.unchanged += 1
+        self.state[date] = {"hash": digest, "stat": None}
+        self.written.append(date)
+
+    def keep(self, dates):
+        """
+        Keep the notes of days whose sections are known to be unchanged.
+
+        Returns False, keeping nothing, if any of the days has no recorded
+        section or its note was created, edited or removed since; the
+        caller must then add() their sections.
+        """
+        for date in dates:
+            entry = self.state.get(date)
+            if entry is None or note_stat(self.path(date)) != entry["stat"]:
+                return False
+        for date in dates:
+            self.stale.discard(date)
+            if self.state[date]["stat"] is None:
+                self.missing += 1
+            else:
+                self.unchanged += 1
+        return True
+
+    def finish(self):
+        """Clear stale days, save the state; return notes updated, unchanged and missing."""
+        for date in self.stale:
+            path = self.path(date)
+            if os.path.exists(path) and write_section(path, "", self.writer):
+                self.updated += 1
+            del self.state[date]
+
+        # Notes must be in place before the state claims they are up to date.
+        self.writer.flush()
+        for date in self.written:
+            self.state[date]["stat"] = note_stat(self.path(date))
+        save_state(self.state, self.state_path)
+        return self.updated, self.unchanged, self.missing
+
+
+def update_daily_notes(sections, notes_directory, filename_format=DEFAULT_FILENAME_FORMAT, writer=None):
+    """
+    Write (date, section) pairs into the matching daily notes.
+
+    Returns the number of notes updated, unchanged and missing.
+    """
+    notes = DailyNotes(notes_directory, filename_format, writer)
+    for date, section in sections:
+        notes.add(date, section)
+    return notes.finish()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+A small SQLite job queue for spreading exports over several hosts.
+
+Jobs are rows in one SQLite file that every worker can reach, for example
+on a shared filesystem::
+
+    python3 job_queue.py queue.sqlite add projects --db a.sqlite --output out/a/projects
+    python3 job_queue.py queue.sqlite add partition --db a.sqlite --output out/a/logbook --period 2024
+    python3 job_queue.py queue.sqlite work --processes 4
+    python3 job_queue.py queue.sqlite status
+
+A worker claims a job by taking a lease on it, renews the lease with a
+heartbeat while the job runs, and marks the job done or failed at the
+end. A job whose worker stopped heartbeating is claimed again once its
+lease expires, up to ``max_attempts`` times. A failed job is retried
+after a delay that doubles with every attempt, except for permanent
+errors such as a missing database, which fail the job at once. Because a
+job may run twice when a lease expires under a slow worker, every job
+replaces its output atomically (temp file plus rename), so a repeated
+run replaces files instead of corrupting them.
+
+SQLite relies on file locks; the shared filesystem must support them
+(NFSv4 and SMB usually do, some FUSE mounts do not).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+from batch_export import DIDA_FILENAME, LOGBOOK_FILENAME, PROJECTS_DIRECTORY, load_jobs, things_database
+
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 5
+DEFAULT_RETRY_SECONDS = 30
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+# Errors a retry cannot fix: missing files, bad job parameters.
+PERMANENT_ERRORS = (FileNotFoundError, NotADirectoryError, KeyError, ValueError)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    created REAL NOT NULL,
+    finished REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, lease_expires, id);
+"""
+
+# Pending jobs past their retry delay, and running jobs whose worker let
+# the lease expire. A pending job's lease_expires holds its retry time.
+CLAIMABLE_PREDICATE = """
+    (
+        (status = 'pending' AND (lease_expires IS NULL OR lease_expires <= :now))
+        OR (status = 'running' AND lease_expires < :now)
+    )
+    AND attempts < max_attempts
+"""
+
+
+def run_projects_job(params, writer):
+    """Render the project files of a database into params["output"]."""
+    from projects2md import create_markdown_files, get_all_tasks, group_tasks_by_project
+
+    created, updated, unchanged = create_markdown_files(
+        group_tasks_by_project(get_all_tasks()), params["output"], writer=writer
+    )
+    return f"{created} created, {updated} updated, {unchanged} unchanged"
+
+
+def run_logbook_job(params, writer):
+    """Render the whole logbook of a database into the file params["output"]."""
+    from things2md import logbook_to_md
+    from thingsdb import get_logbook
+
+    logbook = get_logbook()
+    os.makedirs(os.path.dirname(params["output"]) or ".", exist_ok=True)
+    writer.write(params["output"], logbook_to_md(logbook))
+    return f"{len(logbook)} entries"
+
+
+def run_partition_job(params, writer):
+    """Render one year or month of the logbook into params["output"]/<period>.md."""
+    from things2md import logbook_to_md
+    from thingsdb import get_logbook
+
+    period = params["period"]
+    logbook = get_logbook(period=period)
+    os.makedirs(params["output"], exist_ok=True)
+    writer.write(
+        os.path.join(params["output"], f"{period}.md"),
+        logbook_to_md(logbook, title=f"Things3 Logbook {period}"),
+    )
+    return f"{len(logbook)} entries"
+
+
+def run_dida_job(params, writer):
+    """Write the Dida CSV of a database to the file params["output"]."""
+    from things2dida import export_to_dida_csv
+
+    os.makedirs(os.path.dirname(params["output"]) or ".", exist_ok=True)
+    export_to_dida_csv(params["output"])
+    return "written"
+
+
+JOB_KINDS = {
+    "projects": run_projects_job,
+    "logbook": run_logbook_job,
+    "partition": run_partition_job,
+    "dida": run_dida_job,
+}
+
+
+class JobQueue:
+    """Jobs stored in a SQLite file, claimed under time-limited leases."""
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, retry_seconds=DEFAULT_RETRY_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, kind, params, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Add a job and return its id."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of: {', '.join(JOB_KINDS)}")
+        cursor = self.connection.execute(
+            "INSERT INTO jobs (kind, params, max_attempts, created) VALUES (?, ?, ?, ?)",
+            (kind, json.dumps(params, sort_keys=True), max_attempts, time.time()),
+        )
+        return cursor.lastrowid
+
+    def claim(self, worker):
+        """
+        Lease the oldest claimable job to worker.
+
+        Returns the job row, or None when nothing is claimable. The select
+        and update run in one write transaction, so two workers never
+        claim the same job.
+        """
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Lease expired on the last attempt', finished = ? "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            job = self.connection.execute(
+                f"SELECT * FROM jobs WHERE {CLAIMABLE_PREDICATE} ORDER BY id LIMIT 1", {"now": now}
+            ).fetchone()
+            if job is not None:
+                self.connection.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker, now + self.lease_seconds, job["id"]),
+                )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        if job is None:
+            return None
+        return self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+
+    def heartbeat(self, job_id, worker):
+        """Extend the lease of a running job; return False if worker lost it."""
+        cursor = self.connection.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id, worker, result=None, error=None, permanent=False):
+        """
+        Record the outcome of a job held by worker.
+
+        A failed job goes back to pending while it has attempts left,
+        unless the error is permanent; it can be claimed again after
+        retry_seconds, doubled for every attempt made. The outcome is
+        dropped if another worker has taken the job over.
+        """
+        now = time.time()
+        if error is None:
+            status = "'done'"
+        elif permanent:
+            status = "'failed'"
+        else:
+            status = "CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END"
+        cursor = self.connection.execute(
+            f"UPDATE jobs SET status = {status}, result = ?, error = ?, finished = ?, "
+            "lease_expires = CASE WHEN ? IS NULL THEN NULL ELSE ? * (1 << (attempts - 1)) + ? END "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (result, error, now, error, self.retry_seconds, now, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def counts(self):
+        """Return the number of jobs in each status."""
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for status, count in self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    def jobs(self, status=None):
+        """Return all jobs, or the jobs in one status, oldest first."""
+        if status is None:
+            return self.connection.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return self.connection.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,)).fetchall()
+
+    def pending_or_running(self):
+        """Return True while any job may still be claimed or finished."""
+        row = self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running') AND attempts < max_attempts"
+        ).fetchone()
+        return row[0] > 0
+
+
+def run_claimed_job(queue, job, worker):
+    """Run a claimed job, heartbeating from a separate connection until it ends."""
+    from output_writer import BatchedWriter
+
+    params = json.loads(job["params"])
+    stopped = threading.Event()
+
+    def keep_lease():
+        heartbeat_queue = JobQueue(queue.path, queue.lease_seconds)
+        try:
+            while not stopped.wait(queue.lease_seconds / 3):
+                if not heartbeat_queue.heartbeat(job["id"], worker):
+                    return
+        finally:
+            heartbeat_queue.close()
+
+    heartbeat = threading.Thread(target=keep_lease, daemon=True)
+    heartbeat.start()
+    try:
+        # Exporters report with print(); keep that out of the worker log
+        with things_database(params["db"]), contextlib.redirect_stdout(io.StringIO()):
+            if not os.path.isfile(params["db"]):
+                raise FileNotFoundError(f"No such database: {params['db']}")
+            with BatchedWriter() as writer:
+                result = JOB_KINDS[job["kind"]](params, writer)
+    except Exception as e:
+        stopped.set()
+        heartbeat.join()
+        queue.finish(
+            job["id"], worker, error=traceback.format_exc(limit=3).strip(),
+            permanent=isinstance(e, PERMANENT_ERRORS),
+        )
+        return False
+    stopped.set()
+    heartbeat.join()
+    queue.finish(job["id"], worker, result=result)
+    return True
+
+
+def work(path, worker=None, lease_seconds=DEFAULT_LEASE_SECONDS, wait=False, poll_seconds=DEFAULT_POLL_SECONDS):
+    """
+    Claim and run jobs until the queue is drained.
+
+    With wait, keep polling for new jobs instead of returning. Returns the
+    number of jobs that succeeded and failed in this worker.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(path, lease_seconds)
+    succeeded = failed = 0
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                if not wait and not queue.pending_or_running():
+                    break
+                # Another worker may still fail a job back to pending
+                time.sleep(poll_seconds)
+                continue
+
+            print(f"[{worker}] job {job['id']}: {job['kind']} {job['params']}", flush=True)
+            if run_claimed_job(queue, job, worker):
+                succeeded += 1
+            else:
+                failed += 1
+    finally:
+        queue.close()
+    return succeeded, failed
+
+
+def work_in_processes(path, processes, lease_seconds=DEFAULT_LEASE_SECONDS, wait=False,
+                      poll_seconds=DEFAULT_POLL_SECONDS):
+    """Run one worker per process on this host and wait for all of them."""
+    workers = [
+        multiprocessing.Process(target=work, args=(path, None, lease_seconds, wait, poll_seconds))
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+
+def add_batch(queue, jobs_file, kinds, periods=(), max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Add jobs for every DB_PATH<TAB>OUTPUT_ROOT line of a batch_export jobs file.
+
+    Outputs are laid out as batch_export.py does; each period adds a
+    partition job writing OUTPUT_ROOT/logbook/<period>.md.
+    """
+    added = []
+    for db_path, output_root in load_jobs(jobs_file):
+        outputs = {
+            "projects": os.path.join(output_root, PROJECTS_DIRECTORY),
+            "logbook": os.path.join(output_root, LOGBOOK_FILENAME),
+            "dida": os.path.join(output_root, DIDA_FILENAME),
+        }
+        for kind in kinds:
+            added.append(queue.add(kind, {"db": db_path, "output": outputs[kind]}, max_attempts))
+        for period in periods:
+            params = {"db": db_path, "output": os.path.join(output_root, "logbook"), "period": period}
+            added.append(queue.add("partition", params, max_attempts))
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribute Things exports over workers through a SQLite queue.")
+    parser.add_argument("queue", help="SQLite queue file, shared by all workers")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="seconds a claimed job is held without a heartbeat (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add one job")
+    add.add_argument("kind", choices=list(JOB_KINDS))
+    add.add_argument("--db", required=True, help="Things database of the job")
+    add.add_argument("--output", required=True, help="output file, or directory for projects and partition")
+    add.add_argument("--period", help="year or month of a partition job, e.g. 2024 or 2024-03")
+    add.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    add_jobs = commands.add_parser("add-batch", help="add jobs for every line of a batch_export.py jobs file")
+    add_jobs.add_argument("jobs", help="file of DB_PATH<TAB>OUTPUT_ROOT lines")
+    add_jobs.add_argument("--kinds", default="logbook,projects,dida",
+                          help="comma-separated job kinds per database (default: %(default)s)")
+    add_jobs.add_argument("--periods", default="",
+                          help="comma-separated logbook partitions per database, e.g. 2023,2024")
+    add_jobs.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    worker = commands.add_parser("work", help="claim and run jobs until the queue is drained")
+    worker.add_argument("--processes", type=int, default=1, help="worker processes on this host")
+    worker.add_argument("--wait", action="store_true", help="keep polling for new jobs instead of exiting")
+    worker.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS,
+                        help="seconds between polls of an empty queue (default: %(default)s)")
+
+    status = commands.add_parser("status", help="show job counts and failures")
+    status.add_argument("--all", action="store_true", help="list every job, not only failed ones")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        if args.kind == "partition" and not args.period:
+            parser.error("partition jobs need --period")
+        params = {"db": args.db, "output": args.output}
+        if args.period:
+            params["period"] = args.period
+        queue = JobQueue(args.queue, args.lease)
+        print(f"Added job {queue.add(args.kind, params, args.max_attempts)}")
+        queue.close()
+    elif args.command == "add-batch":
+        kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+        unknown = [kind for kind in kinds if kind not in ("logbook", "projects", "dida")]
+        if unknown:
+            parser.error(f"unknown job kinds: {', '.join(unknown)}")
+        periods = [period.strip() for period in args.periods.split(",") if period.strip()]
+        queue = JobQueue(args.queue, args.lease)
+        try:
+            print(f"Added {len(add_batch(queue, args.jobs, kinds, periods, args.max_attempts))} jobs")
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        finally:
+            queue.close()
+    elif args.command == "work":
+        if args.processes > 1:
+            work_in_processes(args.queue, args.processes, args.lease, args.wait, args.poll)
+        else:
+            succeeded, failed = work(args.queue, lease_seconds=args.lease, wait=args.wait,
+                                     poll_seconds=args.poll)
+            print(f"Jobs succeeded: {succeeded}, failed: {failed}")
+    else:
+        queue = JobQueue(args.queue, args.lease)
+        print(", ".join(f"{status}: {count}" for status, count in queue.counts().items()))
+        for job in queue.jobs(None if args.all else "failed"):
+            line = f"{job['id']} {job['status']} {job['kind']} {job['params']} attempts={job['attempts']}"
+            if job["worker"]:
+                line += f" worker={job['worker']}"
+            print(line)
+            if job["status"] == "failed" and job["error"]:
+                print(f"    {job['error'].splitlines()[-1]}")
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Persistent, incrementally maintained logbook rollups.
+
+Counts of completed and canceled entries are kept per day and per
+project, area and tag in a JSON file next to the logbook output. Each run
+only looks at entries newer than the last processed ``stop_date`` and at
+tasks modified since the previous run (e.g. moved from completed to
+canceled), so summaries never require rescanning ``things.logbook()``.
+"""
+
+import datetime
+import json
+import os
+import sys
+
+from output_writer import write_file_atomically
+from task_records import iter_records
+from thingsdb import ReadOnlyDatabase, get_logbook
+
+ROLLUPS_VERSION = 1
+ROLLUPS_FILENAME = "logbook_rollups.json"
+LOGBOOK_STATUSES = ('completed', 'canceled')
+
+
+def empty_rollups():
+    """Return a rollup structure with no entries processed yet."""
+    return {
+        "version": ROLLUPS_VERSION,
+        "stop_date": None,
+        "modified": None,
+        "totals": {"completed": 0, "canceled": 0},
+        "buckets": {},
+        "titles": {},
+        "entries": {},
+    }
+
+
+def load_rollups(path=ROLLUPS_FILENAME):
+    """Load rollups from disk, starting over if missing or outdated."""
+    if not os.path.exists(path):
+        return empty_rollups()
+
+    try:
+        with open(path, 'r') as f:
+            rollups = json.load(f)
+    except (OSError, ValueError):
+        return empty_rollups()
+
+    if rollups.get("version") != ROLLUPS_VERSION:
+        return empty_rollups()
+    return rollups
+
+
+def save_rollups(rollups, path=ROLLUPS_FILENAME):
+    """Atomically write rollups to disk."""
+    write_file_atomically(path, json.dumps(rollups, separators=(',', ':'), sort_keys=True))
+
+
+def entry_keys(record):
+    """Return the rollup dimensions a logbook record is counted under."""
+    keys = ["all"]
+    if record.project is not None:
+        keys.append(f"project:{record.project}")
+    if record.area is not None:
+        keys.append(f"area:{record.area}")
+    for tag in record.tags:
+        keys.append(f"tag:{tag}")
+    return keys
+
+
+def _count(rollups, record, sign):
+    """Add (sign=1) or remove (sign=-1) one entry from the counters."""
+    day, status, keys = record
+    column = LOGBOOK_STATUSES.index(status)
+    rollups["totals"][status] += sign
+
+    buckets = rollups["buckets"].setdefault(day, {})
+    for key in keys:
+        counts = buckets.setdefault(key, [0, 0])
+        counts[column] += sign
+        if counts == [0, 0]:
+            del buckets[key]
+    if not buckets:
+        del rollups["buckets"][day]
+
+
+def apply_entry(rollups, entry):
+    """Count a logbook record, replacing any previously counted state."""
+    remove_entry(rollups, entry.uuid)
+    if entry.status not in LOGBOOK_STATUSES or not entry.stop_date:
+        return
+
+    record = [entry.stop_date[:10], entry.status, entry_keys(entry)]
+    _count(rollups, record, 1)
+    rollups["entries"][entry.uuid] = record
+
+    if entry.project is not None:
+        rollups["titles"][f"project:{entry.project}"] = entry.project_title or ''
+    if entry.area is not None:
+        rollups["titles"][f"area:{entry.area}"] = entry.area_title or ''
+
+    if not rollups["stop_date"] or entry.stop_date > rollups["stop_date"]:
+        rollups["stop_date"] = entry.stop_date
+
+
+def remove_entry(rollups, uuid):
+    """Stop counting an entry that left the logbook or changed state."""
+    record = rollups["entries"].pop(uuid, None)
+    if record:
+        _count(rollups, record, -1)
+
+
+def get_modified_since(database, timestamp):
+    """Return uuid/status rows of tasks modified after a Unix timestamp."""
+    sql_query = """
+        SELECT
+            uuid,
+            CASE
+                WHEN status = 2 THEN 'canceled'
+                WHEN status = 3 THEN 'completed'
+            END AS status,
+            trashed
+        FROM
+            TMTask
+        WHERE
+            userModificationDate > ?
+        """
+    return database.execute_query(sql_query, parameters=(timestamp,))
+
+
+def get_last_modified(database):
+    """Return the newest modification timestamp in the database."""
+    rows = database.execute_query("SELECT MAX(userModificationDate) AS modified FROM TMTask")
+    return rows[0]["modified"] if rows else None
+
+
+def update_rollups(rollups, database=None):
+    """Bring rollups up to date, touching only new or modified entries."""
+    database = database or ReadOnlyDatabase()
+    last_modified = get_last_modified(database)
+
+    if not rollups["stop_date"]:
+        entries = get_logbook(database)
+    else:
+        # Re-read the boundary day (stop_date filters compare UTC dates)
+        # so late completions on the last processed day are not missed.
+        day = datetime.date.fromisoformat(rollups["stop_date"][:10])
+        since = (day - datetime.timedelta(days=1)).isoformat()
+        entries = get_logbook(database, since=since)
+
+        seen = {entry['uuid'] for entry in entries}
+        if rollups["modified"] is not None:
+            modified = []
+            for row in get_modified_since(database, rollups["modified"]):
+                uuid = row['uuid']
+                if uuid in seen:
+                    continue
+                if row.get('status') in LOGBOOK_STATUSES and not row.get('trashed'):
+                    modified.append(uuid)
+                else:
+                    remove_entry(rollups, uuid)
+
+            # Tasks that are done but no longer in the logbook, e.g. inside
+            # a trashed project, stop being counted.
+            changed = get_logbook(database, uuids=modified)
+            for uuid in set(modified) - {entry['uuid'] for entry in changed}:
+                remove_entry(rollups, uuid)
+            entries.extend(changed)
+
+    for record in iter_records(entries):
+        apply_entry(rollups, record)
+
+    rollups["modified"] = last_modified
+    return rollups
+
+
+def rollup_summary(rollups):
+    """Return history-wide totals without touching per-day buckets."""
+    return {
+        "completed": rollups["totals"]["completed"],
+        "canceled": rollups["totals"]["canceled"],
+        "stop_date": rollups["stop_date"],
+    }
+
+
+def day_summary(rollups, day, key="all"):
+    """Return (completed, canceled) for one day and rollup dimension."""
+    completed, canceled = rollups["buckets"].get(day, {}).get(key, (0, 0))
+    return completed, canceled
+
+
+def refresh_rollups(path=ROLLUPS_FILENAME):
+    """Load, update and save the rollups file, returning its contents."""
+    rollups = load_rollups(path)
+    update_rollups(rollups)
+    save_rollups(rollups, path)
+    return rollups
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else ROLLUPS_FILENAME
+    summary = rollup_summary(refresh_rollups(path))
+    print(f"Completed: {summary['completed']}")
+    print(f"Canceled: {summary['canceled']}")
+    print(f"Last completion: {summary['stop_date']}")
@@ -0,0 +1,173 @@
+"""
+User-definable output templates for task and project rendering.
+
+Templates use ``str.format`` placeholders, e.g. ``"{checkbox} {link}{tags_suffix}"``.
+Each one is compiled into a plain Python function returning an f-string,
+so rendering a custom format costs the same as the hard-coded f-strings it
+replaces. Compiled code objects are cached on disk, keyed by a hash of the
+template, so later runs skip the compile step entirely.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import string
+import sys
+
+TEMPLATE_ENGINE_VERSION = 1
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "things2md", "templates")
+
+# Placeholders available to each template kind, in call order.
+TEMPLATE_FIELDS = {
+    "task": ("checkbox", "title", "uuid", "url", "link", "status", "tags", "tags_suffix"),
+    "checklist_item": ("checkbox", "title", "status"),
+    "note_line": ("line",),
+    "heading": ("prefix", "level", "title"),
+    "front_matter": ("title", "uuid", "status", "url", "tags", "tags_line"),
+}
+
+DEFAULT_TEMPLATES = {
+    "task": "{checkbox} {link}{tags_suffix}",
+    "checklist_item": "\t{checkbox} {title}",
+    "note_line": "\t{line}",
+    "heading": "{prefix} {title}",
+    "front_matter": "---\nstatus: {status}\nurl: {url}\n{tags_line}---",
+}
+
+_compiled = {}
+_default_templates = None
+
+
+def template_key(kind, template):
+    """Hash a template together with everything its compiled form depends on."""
+    source = f"{TEMPLATE_ENGINE_VERSION}\0{sys.version}\0{kind}\0{template}"
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def template_to_source(kind, template):
+    """Translate a format template into the source of a render function."""
+    fields = TEMPLATE_FIELDS[kind]
+    parts = []
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise ValueError(f"Invalid {kind} template {template!r}: {e}") from None
+
+    for literal, field, spec, conversion in parsed:
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+
+        if field not in fields:
+            raise ValueError(
+                f"Unknown placeholder {{{field}}} in {kind} template; "
+                f"expected one of: {', '.join(fields)}"
+            )
+        if spec and ('{' in spec or '\\' in spec or not spec.isprintable()):
+            raise ValueError(f"Unsupported format spec {spec!r} in {kind} template")
+
+        placeholder = field
+        if conversion:
+            placeholder += f"!{conversion}"
+        if spec:
+            placeholder += f":{spec}"
+        placeholder = '{' + placeholder + '}'
+        try:
+            compile(f"f{placeholder!r}", f"<{kind} template>", "eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid placeholder {placeholder} in {kind} template: {e.msg}") from None
+        parts.append(placeholder)
+
+    return f"def render({', '.join(fields)}):\n    return f{''.join(parts)!r}\n"
+
+
+def _load_cached_code(path):
+    """Read a compiled template from the disk cache, if present."""
+    try:
+        with open(path, 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _store_cached_code(path, code):
+    """Write a compiled template to the disk cache; failures are ignored."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            marshal.dump(code, f)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def compile_template(kind, template, cache_directory=DEFAULT_CACHE_DIRECTORY):
+    """Return the render function for a template, compiling it at most once."""
+    key = template_key(kind, template)
+    render = _compiled.get(key)
+    if render is not None:
+        return render
+
+    cache_path = os.path.join(cache_directory, f"{key}.marshal") if cache_directory else None
+    code = _load_cached_code(cache_path) if cache_path else None
+    if code is None:
+        code = compile(template_to_source(kind, template), f"<{kind} template>", "exec")
+        if cache_path:
+            _store_cached_code(cache_path, code)
+
+    namespace = {}
+    exec(code, namespace)
+    render = namespace["render"]
+    _compiled[key] = render
+    return render
+
+
+def compile_templates(overrides=None, cache_directory=DEFAULT_CACHE_DIRECTORY):
+    """Compile a full template set, falling back to the defaults."""
+    overrides = overrides or {}
+    unknown = set(overrides) - set(TEMPLATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown template kinds: {', '.join(sorted(unknown))}")
+
+    templates = {}
+    for kind, default in DEFAULT_TEMPLATES.items():
+        template = overrides.get(kind, default)
+        templates[kind] = compile_template(
+            kind, template, cache_directory if kind in overrides else None
+        )
+    return templates
+
+
+def load_templates(path, cache_directory=DEFAULT_CACHE_DIRECTORY):
+    """Compile the templates defined in a JSON file of kind -> template."""
+    with open(path, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+    return compile_templates(overrides, cache_directory)
+
+
+def template_file_key(path):
+    """Hash a templates file so outputs rendered with it can be invalidated."""
+    if not path:
+        return ""
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def default_templates():
+    """Return the compiled built-in templates (never cached on disk)."""
+    global _default_templates
+    if _default_templates is None:
+        _default_templates = compile_templates()
+    return _default_templates
+
+
+def checkbox_for(status):
+    """Return the Markdown checkbox for a Things status."""
+    if status == 'completed':
+        return "- [x]"
+    if status == 'canceled':
+        return "- [-]"
+    return "- [ ]"
@@ -0,0 +1,247 @@
+"""
+Atomic, batched file output.
+
+Files are written to a temporary file in the target directory and renamed
+into place, so readers (Obsidian, sync daemons) never see a truncated
+file. Durability is handled per batch rather than per file: the staged
+files are fsynced and renamed when the batch is flushed, then each
+touched directory is fsynced once. Files whose content is unchanged are
+never opened for writing, and files removed through the writer are only
+deleted once the batch that replaces them is in place.
+"""
+
+import contextlib
+import filecmp
+import os
+import secrets
+
+DEFAULT_BATCH_SIZE = 500
+TEMP_FILE_ATTEMPTS = 100
+
+
+def create_temp_file(path):
+    """
+    Create a temporary file next to path; return (fd, temp_path).
+
+    The file is created with mode 0o666, so the process umask applies as
+    it would to a plain open(); mkstemp's 0o600 would need the umask read
+    back, and changing it to read it races with other threads.
+    """
+    directory = os.path.dirname(path) or "."
+    for _ in range(TEMP_FILE_ATTEMPTS):
+        temp_path = os.path.join(directory, f".{os.path.basename(path)}.{secrets.token_hex(4)}.tmp")
+        try:
+            return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), temp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"Could not create a temporary file for {path}")
+
+
+def sync_file(path):
+    """Flush the data of a file to disk."""
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def sync_directory(directory):
+    """Persist renames in a directory (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_has_content(path, data):
+    """Return True if the file exists and already holds exactly data."""
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def stage_file(path, data):
+    """Write data to a temporary file next to path and return its name."""
+    return stage_chunks(path, [data])
+
+
+def stage_chunks(path, chunks):
+    """Write byte chunks to a temporary file next to path and return its name."""
+    fd, temp_path = create_temp_file(path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+
+@contextlib.contextmanager
+def open_atomically(path, mode='w', **kwargs):
+    """
+    Open a temporary file that replaces path when the block exits.
+
+    For writers that need a file object (csv, json.dump). If the block
+    raises, the temporary file is removed and path is left untouched.
+    """
+    fd, temp_path = create_temp_file(path)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    sync_directory(os.path.dirname(path) or ".")
+
+
+class BatchedWriter:
+    """Write many files atomically, syncing once per batch."""
+
+    # Output persists between runs, so exporters may skip unchanged work
+    incremental = True
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.pending = []
+        self.removals = []
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    def makedirs(self, directory):
+        """Create an output directory (and its parents) if needed."""
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, path, content):
+        """
+        Stage content for path unless the file already holds it.
+
+        Returns 'created', 'updated' or 'unchanged'.
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        exists = os.path.exists(path)
+        if exists and file_has_content(path, data):
+            self.unchanged += 1
+            return "unchanged"
+
+        return self._add(stage_file(path, data), path, exists)
+
+    def write_chunks(self, path, chunks):
+        """
+        Like write(), but for content produced piece by piece.
+
+        Chunks are streamed into the temporary file, so the whole content
+        is never held in memory; an identical result is discarded.
+        """
+        encoded = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+        temp_path = stage_chunks(path, encoded)
+        exists = os.path.exists(path)
+        if exists and filecmp.cmp(temp_path, path, shallow=False):
+            os.unlink(temp_path)
+            self.unchanged += 1
+            return "unchanged"
+        return self._add(temp_path, path, exists)
+
+    def remove(self, path):
+        """Delete a file once the files staged so far are in place."""
+        self.removals.append(path)
+
+    def _add(self, temp_path, path, exists):
+        """Queue a staged file and flush once the batch is full."""
+        self.pending.append((temp_path, path))
+        if exists:
+            self.updated += 1
+            status = "updated"
+        else:
+            self.created += 1
+            status = "created"
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return status
+
+    def flush(self):
+        """
+        Make staged files durable, move them into place, then apply removals.
+
+        With a progress, every flush advances one write phase whose total
+        is the number of files written so far; close() ends it.
+        """
+        if not self.pending and not self.removals:
+            return
+
+        progress = self.progress
+        interrupted = progress.resume("write", self.created + self.updated) if progress else None
+        directories = set()
+        for temp_path, path in self.pending:
+            sync_file(temp_path)
+            os.replace(temp_path, path)
+            directories.add(os.path.dirname(path) or ".")
+            if progress:
+                progress.advance()
+        for path in self.removals:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            directories.add(os.path.dirname(path) or ".")
+        for directory in sorted(directories):
+            sync_directory(directory)
+        self.pending = []
+        self.removals = []
+        if progress:
+            progress.suspend()
+            if interrupted:
+                progress.resume(interrupted)
+
+    def close(self):
+        """Flush the last batch and end the write phase."""
+        self.flush()
+        if self.progress and "write" in self.progress.suspended:
+            interrupted = self.progress.resume("write")
+            self.progress.finish()
+            if interrupted:
+                self.progress.resume(interrupted)
+
+    def discard(self):
+        """Drop staged files without touching their targets."""
+        for temp_path, _ in self.pending:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+        self.pending = []
+        self.removals = []
+
+
+def write_file_atomically(path, content):
+    """Atomically replace a single file if its content changed."""
+    with BatchedWriter() as writer:
+        return writer.write(path, content)
@@ -0,0 +1,187 @@
+"""
+Progress reporting for long exports.
+
+An export runs as a sequence of phases (fetch, group, render, write).
+``Progress`` reports each phase with the items done, the total when it
+is known, the throughput and an ETA, either as a one-line terminal bar
+or as JSON lines a scheduler can parse::
+
+    {"event": "progress", "phase": "render", "done": 120, "total": 480,
+     "elapsed": 1.5, "rate": 80.0, "eta": 4.5}
+
+Every phase emits a ``start`` and an ``end`` event, and ``progress``
+events at most every ``interval`` seconds in between. Output goes to
+stderr so it never mixes with an export written to stdout. A Progress
+without a mode reports nothing, so callers need no checks of their own.
+
+Work done in several stretches, such as batched writes between renders,
+uses ``resume`` and ``suspend``: a resumed phase keeps its count and
+elapsed time, so it is reported as one phase with one ``end`` event.
+"""
+
+import json
+import sys
+import time
+
+PROGRESS_MODES = ("bar", "json")
+DEFAULT_INTERVAL = 0.2
+BAR_WIDTH = 24
+
+
+def format_duration(seconds):
+    """Format seconds as m:ss (or h:mm:ss)."""
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_bar(event):
+    """Render a progress event as one terminal line."""
+    line = f"{event['phase']:<8}"
+    if event["total"]:
+        filled = min(BAR_WIDTH, BAR_WIDTH * event["done"] // event["total"])
+        line += f" [{'#' * filled}{'.' * (BAR_WIDTH - filled)}] {event['done']}/{event['total']}"
+    else:
+        line += f" {event['done']}"
+    line += f" {event['rate']:.1f}/s"
+    if event["event"] == "end":
+        line += f" in {format_duration(event['elapsed'])}"
+    elif event["eta"] is not None:
+        line += f" ETA {format_duration(event['eta'])}"
+    return line
+
+
+class Progress:
+    """Phase, items done and total, throughput and ETA of a running export."""
+
+    def __init__(self, mode=None, stream=None, interval=DEFAULT_INTERVAL):
+        if mode is not None and mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode {mode!r}; expected one of: {', '.join(PROGRESS_MODES)}")
+        self.mode = mode
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.phase = None
+        self.total = None
+        self.done = 0
+        self.started = 0.0
+        self.last_emit = 0.0
+        self.line_width = 0
+        self.suspended = {}
+
+    def start(self, phase, total=None):
+        """Begin a phase, ending the previous one if it is still open."""
+        if self.phase is not None:
+            self.finish()
+        self.suspended.pop(phase, None)
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.started = self.last_emit = time.monotonic()
+        self.emit("start")
+
+    def suspend(self):
+        """Pause the current phase without ending it."""
+        if self.phase is None:
+            return
+        self.suspended[self.phase] = (self.done, self.total, time.monotonic() - self.started)
+        self.phase = None
+
+    def resume(self, phase, total=None):
+        """
+        Switch to phase, suspending the current one; return the phase suspended.
+
+        A phase suspended earlier continues from its count and elapsed
+        time; any other phase starts afresh. total replaces the phase's
+        total when given.
+        """
+        if self.phase == phase:
+            if total is not None:
+                self.total = total
+            return None
+        interrupted = self.phase
+        self.suspend()
+        state = self.suspended.pop(phase, None)
+        if state is None:
+            self.phase = phase
+            self.total = total
+            self.done = 0
+            self.started = self.last_emit = time.monotonic()
+            self.emit("start")
+            return interrupted
+        self.phase = phase
+        self.done, self.total, elapsed = state
+        if total is not None:
+            self.total = total
+        self.last_emit = time.monotonic()
+        self.started = self.last_emit - elapsed
+        return interrupted
+
+    def advance(self, count=1):
+        """Count finished items, emitting an event at most every interval."""
+        self.done += count
+        now = time.monotonic()
+        if now - self.last_emit >= self.interval:
+            self.last_emit = now
+            self.emit("progress")
+
+    def finish(self, done=None):
+        """End the current phase; done overrides the count (e.g. rows fetched)."""
+        if self.phase is None:
+            return
+        if done is not None:
+            self.done = done
+        self.emit("end")
+        self.phase = None
+
+    def event(self, kind):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = round(max(self.total - self.done, 0) / rate, 1)
+        return {
+            "event": kind,
+            "phase": self.phase,
+            "done": self.done,
+            "total": self.total,
+            "elapsed": round(elapsed, 3),
+            "rate": round(rate, 1),
+            "eta": eta,
+        }
+
+    def emit(self, kind):
+        if self.mode is None:
+            return
+        event = self.event(kind)
+        if self.mode == "json":
+            self.stream.write(json.dumps(event) + "\n")
+        else:
+            line = format_bar(event)
+            # Pad over the rest of a longer previous line
+            self.stream.write("\r" + line.ljust(self.line_width))
+            self.line_width = len(line)
+            if kind == "end":
+                self.stream.write("\n")
+                self.line_width = 0
+        self.stream.flush()
+
+
+def track(progress, phase, items, total=None):
+    """
+    Yield items, counting each one as done in phase.
+
+    The total defaults to len(items) when items has one. With progress
+    None the items are passed through untouched.
+    """
+    if progress is None:
+        yield from items
+        return
+    if total is None and hasattr(items, "__len__"):
+        total = len(items)
+    progress.start(phase, total)
+    for item in items:
+        yield item
+        progress.advance()
+    progress.finish()
@@ -2,9 +2,18 @@
 import os
 import things
 import hashlib
+import argparse
+import json
 from collections import defaultdict
 from datetime import datetime
 
+from checkpoint import Checkpoint
+from md_templates import checkbox_for, default_templates, load_templates, template_file_key
+from output_writer import BatchedWriter
+from progress import PROGRESS_MODES, Progress, track
+from render_cache import open_cache
+from thingsdb import fetch_concurrently, get_logbook, get_todos
+
 
 def build_project_lookup(status=None):
     """Index projects by uuid so we can resolve inherited metadata."""
@@ -12,54 +21,21 @@ def build_project_lookup(status=None):
     return {project["uuid"]: project for project in project_list}, project_list
 
 
-def build_heading_lookup(project_lookup):
-    """Map each heading to its parent project (and area) metadata."""
-    headings = things.tasks(type="heading", status=None)
-    heading_lookup = {}
-    for heading in headings:
-        project_id = heading.get("project")
-        if not project_id:
-            continue
-
-        project_info = project_lookup.get(project_id, {})
-        heading_lookup[heading["uuid"]] = {
-            "project": project_id,
-            "project_title": heading.get("project_title")
-            or project_info.get("title", ""),
-            "area": project_info.get("area"),
-            "area_title": project_info.get("area_title"),
-            "heading_title": heading.get("title", ""),
-        }
-
-    return heading_lookup
-
-
-def inject_heading_context(task, heading_lookup):
-    """Ensure to-dos under headings expose their project/area context."""
-    if "project" in task or "heading" not in task:
-        return
-
-    meta = heading_lookup.get(task["heading"])
-    if not meta:
+def append_tasks_with_headings(content, tasks, heading_level, templates=None, cache=None):
+    """Append task markdown grouped by heading hierarchy."""
+    if not tasks:
         return
 
-    task["project"] = meta.get("project")
-    task["project_title"] = meta.get("project_title")
+    templates = templates or default_templates()
 
-    if meta.get("area") and "area" not in task:
-        task["area"] = meta["area"]
+    def render(task):
+        return format_task_as_markdown(task, templates)
 
-    if meta.get("area_title") and "area_title" not in task:
-        task["area_title"] = meta["area_title"]
-
-    if (not task.get("heading_title")) and meta.get("heading_title"):
-        task["heading_title"] = meta["heading_title"]
-
-
-def append_tasks_with_headings(content, tasks, heading_level):
-    """Append task markdown grouped by heading hierarchy."""
-    if not tasks:
-        return
+    if cache is not None:
+        def render_task(task):
+            return cache.get_or_render(task, render, namespace="projects")
+    else:
+        render_task = render
 
     tasks_without_heading = []
     heading_sections = {}
@@ -79,17 +55,18 @@ def append_tasks_with_headings(content, tasks, heading_level):
             tasks_without_heading.append(task)
 
     for task in tasks_without_heading:
-        content.append(format_task_as_markdown(task))
+        content.append(render_task(task))
 
     heading_prefix = "#" * heading_level
+    render_heading = templates["heading"]
 
     for heading_id in heading_order:
         section = heading_sections[heading_id]
         if content and content[-1] != "":
             content.append("")
-        content.append(f"{heading_prefix} {section['title']}")
+        content.append(render_heading(prefix=heading_prefix, level=heading_level, title=section['title']))
         for task in section["tasks"]:
-            content.append(format_task_as_markdown(task))
+            content.append(render_task(task))
 
 
 def compute_md5(text):
@@ -97,6 +74,17 @@ def compute_md5(text):
     return hashlib.md5(text.encode('utf-8')).hexdigest()
 
 
+def project_signature(project_data):
+    """Fingerprint a project and its tasks without rendering them."""
+    digest = hashlib.md5(json.dumps(project_data['info'], sort_keys=True, default=str).encode('utf-8'))
+    for task in project_data['active_tasks'] + project_data['completed_tasks']:
+        digest.update(
+            f"{task['uuid']}|{task.get('status')}|{task.get('stop_date')}|{task.get('modified')}|"
+            f"{task.get('heading_title')}\n".encode('utf-8')
+        )
+    return digest.hexdigest()
+
+
 def sanitize_filename(filename):
     """Sanitize the filename by removing or replacing special characters."""
     invalid_chars = ['<', '>', ':', '"', '/', '\\', '|', '?', '*']
@@ -130,9 +118,10 @@ def get_checklist_items(task):
     return []
 
 
-def format_checklist_as_markdown(task):
+def format_checklist_as_markdown(task, templates=None):
     """Format checklist items as nested markdown checkboxes."""
     items = get_checklist_items(task)
+    render_item = (templates or default_templates())["checklist_item"]
     formatted = []
     for item in items:
         title = item.get('title', '').strip()
@@ -140,31 +129,32 @@ def format_checklist_as_markdown(task):
             continue
 
         status = item.get('status', 'incomplete')
-        if status == 'completed':
-            checkbox = "- [x]"
-        elif status == 'canceled':
-            checkbox = "- [-]"
-        else:
-            checkbox = "- [ ]"
-
-        formatted.append(f"\t{checkbox} {title}")
+        formatted.append(render_item(checkbox=checkbox_for(status), title=title, status=status))
 
     return formatted
 
 
 def get_all_tasks():
-    """Get all tasks including completed ones from Things 3."""
-    # Get active tasks
-    active_tasks = things.todos()
+    """Get all tasks including completed ones from Things 3.
     
-    # Get completed/canceled tasks from logbook
-    logbook_tasks = things.logbook()
+    To-dos under headings come with their project and area resolved.
+    """
+    # Active tasks and completed/canceled tasks from the logbook are
+    # independent reads, so fetch them concurrently.
+    active_tasks, logbook_tasks = fetch_concurrently([
+        (get_todos, {}),
+        (get_logbook, {}),
+    ])
     
     return active_tasks + logbook_tasks
 
 
-def group_tasks_by_project(all_tasks):
-    """Group tasks by their project."""
+def group_tasks_by_project(all_tasks, progress=None):
+    """Group tasks by their project.
+    
+    Tasks under headings are expected to carry their project already, as
+    get_all_tasks() returns them.
+    """
     projects = defaultdict(lambda: {
         'info': {},
         'active_tasks': [],
@@ -173,7 +163,6 @@ def group_tasks_by_project(all_tasks):
     
     # Also get standalone projects
     project_lookup, project_list = build_project_lookup(status=None)
-    heading_lookup = build_heading_lookup(project_lookup)
 
     for project in project_list:
         project_id = project['uuid']
@@ -187,11 +176,8 @@ def group_tasks_by_project(all_tasks):
             'area_title': project.get('area_title')
         }
     
-    for task in all_tasks:
-        inject_heading_context(task, heading_lookup)
-
     # Group tasks by project
-    for task in all_tasks:
+    for task in track(progress, "group", all_tasks):
         if 'project' in task:
             project_id = task['project']
             project_title = task.get('project_title', 'Untitled')
@@ -261,60 +247,65 @@ def group_tasks_by_project(all_tasks):
     return projects
 
 
-def format_task_as_markdown(task):
+def format_task_as_markdown(task, templates=None):
     """Format a single task as markdown checkbox item."""
+    templates = templates or default_templates()
     title = task.get('title', 'Untitled')
     uuid = task.get('uuid', '')
     status = task.get('status', 'open')
     notes = task.get('notes', '')
     tags = task.get('tags', [])
     
-    # Determine checkbox state
-    if status == 'completed':
-        checkbox = "- [x]"
-    elif status == 'canceled':
-        checkbox = "- [-]"
-    else:
-        checkbox = "- [ ]"
-    
     # Build task line
-    task_line = f"{checkbox} [{title}](things:///show?id={uuid})"
-
-    # Add tags
-    if tags:
-        task_line += " " + " ".join(f"#{tag}" for tag in tags)
+    url = f"things:///show?id={uuid}"
+    hashtags = " ".join(f"#{tag}" for tag in tags) if tags else ""
+    task_line = templates["task"](
+        checkbox=checkbox_for(status),
+        title=title,
+        uuid=uuid,
+        url=url,
+        link=f"[{title}]({url})",
+        status=status,
+        tags=hashtags,
+        tags_suffix=f" {hashtags}" if hashtags else "",
+    )
 
     lines = [task_line]
 
     if notes:
-        lines.extend('\t' + line for line in notes.splitlines())
+        render_note_line = templates["note_line"]
+        lines.extend(render_note_line(line=line) for line in notes.splitlines())
 
-    lines.extend(format_checklist_as_markdown(task))
+    lines.extend(format_checklist_as_markdown(task, templates))
 
     return '\n'.join(lines)
 
 
-def generate_project_markdown(project_data):
+def generate_project_markdown(project_data, templates=None, cache=None):
     """Generate markdown content for a project."""
+    templates = templates or default_templates()
     info = project_data['info']
     active_tasks = project_data['active_tasks']
     completed_tasks = project_data['completed_tasks']
     
     # Generate metadata
-    metadata = []
-    metadata.append("---")
-    metadata.append(f"status: {info['status']}")
     if info['uuid'] == '__inbox__':
-        metadata.append("url: things:///show?id=inbox")
+        url = "things:///show?id=inbox"
     else:
-        metadata.append(f"url: things:///show?id={info['uuid']}")
-    if info['tags']:
-        metadata.append(f"tags: {', '.join(info['tags'])}")
-    metadata.append("---")
+        url = f"things:///show?id={info['uuid']}"
+    tags = ', '.join(info['tags']) if info['tags'] else ""
+    metadata = templates["front_matter"](
+        title=info['title'],
+        uuid=info['uuid'],
+        status=info['status'],
+        url=url,
+        tags=tags,
+        tags_line=f"tags: {tags}\n" if tags else "",
+    )
     
     # Generate content
     content = []
-    content.extend(metadata)
+    content.append(metadata)
     content.append("")
     
     # Project title
@@ -335,7 +326,7 @@ def generate_project_markdown(project_data):
         content.append("")
         # Sort by creation date if available
         active_tasks.sort(key=lambda x: x.get('created', ''), reverse=False)
-        append_tasks_with_headings(content, active_tasks, heading_level=3)
+        append_tasks_with_headings(content, active_tasks, heading_level=3, templates=templates, cache=cache)
 
     # Completed tasks
     if completed_tasks:
@@ -344,21 +335,39 @@ def generate_project_markdown(project_data):
         content.append("")
         # Sort by completion date if available
         completed_tasks.sort(key=lambda x: x.get('stop_date', ''), reverse=True)
-        append_tasks_with_headings(content, completed_tasks, heading_level=3)
+        append_tasks_with_headings(content, completed_tasks, heading_level=3, templates=templates, cache=cache)
 
     return '\n'.join(content)
 
 
-def create_markdown_files(projects, output_directory="things3_projects"):
-    """Create markdown files for each project."""
-    os.makedirs(output_directory, exist_ok=True)
-    
+def create_markdown_files(projects, output_directory="things3_projects", templates=None, cache=None, writer=None,
+                          checkpoint=None, progress=None):
+    """
+    Create markdown files for each project.
+
+    With a checkpoint, projects finished by an interrupted run with the
+    same input are skipped (and counted as unchanged), and each finished
+    project is recorded. Run the export inside ``with checkpoint:``
+    so that an interruption still saves the projects already written.
+    """
     files_created = 0
     files_updated = 0
     files_unchanged = 0
+
+    # Files are replaced atomically and synced in batches; unchanged
+    # files are left untouched.
+    owns_writer = writer is None
+    writer = writer or BatchedWriter()
+    writer.makedirs(output_directory)
     
-    for project_id, project_data in projects.items():
+    for project_id, project_data in track(progress, "render", projects.items()):
         info = project_data['info']
+
+        if checkpoint is not None:
+            signature = project_signature(project_data)
+            if checkpoint.resume(project_id, signature):
+                files_unchanged += 1
+                continue
         
         # Generate filename
         sanitized_name = sanitize_filename(info['title'])
@@ -370,46 +379,76 @@ def create_markdown_files(projects, output_directory="things3_projects"):
         file_path = os.path.join(output_directory, filename)
         
         # Generate content
-        new_content = generate_project_markdown(project_data)
+        new_content = generate_project_markdown(project_data, templates, cache)
         
-        # Check if file exists and compare content
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                existing_content = f.read()
-            
-            if compute_md5(existing_content) == compute_md5(new_content):
-                files_unchanged += 1
-                continue
-            else:
-                files_updated += 1
-        else:
+        # Write file if it is new or its content changed
+        status = writer.write(file_path, new_content)
+        if status == "created":
             files_created += 1
-        
-        # Write file
-        with open(file_path, 'w') as f:
-            f.write(new_content)
+        elif status == "updated":
+            files_updated += 1
+        else:
+            files_unchanged += 1
+
+        if checkpoint is not None:
+            checkpoint.mark(project_id, signature, compute_md5(new_content))
+
+    if owns_writer:
+        writer.flush()
     
     return files_created, files_updated, files_unchanged
 
 
 def main():
     """Main function to export Things 3 projects to markdown."""
+    parser = argparse.ArgumentParser(description="Export Things 3 projects to Markdown files.")
+    parser.add_argument("--output-directory", default="things3_projects", help="directory for project files")
+    parser.add_argument("--templates", metavar="FILE", help="JSON file of custom output templates")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse rendered task fragments from a cache in the output directory")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip projects finished by an interrupted run, as recorded in its checkpoint")
+    parser.add_argument("--progress", choices=PROGRESS_MODES,
+                        help="report progress on stderr as a terminal bar or as JSON lines")
+    args = parser.parse_args()
+    progress = Progress(args.progress)
+
+    templates = load_templates(args.templates) if args.templates else None
+    render_key = template_file_key(args.templates)
+    cache = None
+    if args.cache:
+        cache = open_cache(args.output_directory, render_key)
+
     print("Fetching tasks from Things 3...")
+    progress.start("fetch")
     all_tasks = get_all_tasks()
+    progress.finish(len(all_tasks))
     print(f"Found {len(all_tasks)} total tasks")
     
     print("Grouping tasks by project...")
-    projects = group_tasks_by_project(all_tasks)
+    projects = group_tasks_by_project(all_tasks, progress)
     print(f"Found {len(projects)} projects")
     
     print("Creating markdown files...")
-    created, updated, unchanged = create_markdown_files(projects)
+    with BatchedWriter(progress=progress) as writer:
+        checkpoint = Checkpoint(args.output_directory, writer, render_key, resume=args.resume)
+        with checkpoint:
+            created, updated, unchanged = create_markdown_files(
+                projects, args.output_directory, templates, cache, writer, checkpoint, progress
+            )
+    checkpoint.clear()
+    if cache is not None:
+        cache.save()
     
     print(f"\nExport complete:")
     print(f"  Files created: {created}")
     print(f"  Files updated: {updated}")
     print(f"  Files unchanged: {unchanged}")
-    print(f"  Output directory: things3_projects/")
+    if checkpoint.resumed:
+        print(f"  Resumed from checkpoint: {checkpoint.resumed}")
+    print(f"  Output directory: {args.output_directory}/")
+    if cache is not None:
+        print(f"  Render cache hits: {cache.hits}, misses: {cache.misses}")
 
 if __name__ == "__main__":
     main()
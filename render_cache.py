@@ -0,0 +1,108 @@
+"""
+Persistent cache of rendered per-task Markdown fragments.
+
+Fragments are keyed by task UUID and stored with a fingerprint of every
+field that goes into them plus the renderer version, so a task is only
+re-rendered (and its checklist only re-fetched) when it actually changed.
+things.py rows only flag that a task has a checklist, so the items
+themselves are fingerprinted from one query over all checklist items.
+The cache is bounded: once it holds more than ``max_entries`` fragments
+the least recently used ones are evicted.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from output_writer import write_file_atomically
+
+# Bump whenever the Markdown produced for a task changes shape.
+RENDERER_VERSION = 1
+
+CACHE_FILENAME = ".things2md_render_cache.json"
+DEFAULT_MAX_ENTRIES = 50000
+
+FINGERPRINT_FIELDS = (
+    "title", "status", "notes", "tags", "checklist", "stop_date", "modified",
+)
+
+
+class FragmentCache:
+    """Size-bounded LRU cache of rendered task fragments, saved as JSON."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, render_key=""):
+        self.path = path
+        self.max_entries = max_entries
+        self.render_key = f"{RENDERER_VERSION}|{render_key}"
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.checklists = None
+        self.load()
+
+    def load(self):
+        """Read cached fragments from disk, oldest first."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("render_key") != self.render_key:
+            return
+        for key, fingerprint, fragment in data.get("entries", []):
+            self.entries[key] = (fingerprint, fragment)
+
+    def save(self):
+        """Write the cache to disk in least-to-most recently used order."""
+        data = {
+            "render_key": self.render_key,
+            "entries": [[key, fingerprint, fragment] for key, (fingerprint, fragment) in self.entries.items()],
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_file_atomically(self.path, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+    def checklist_signature(self, task):
+        """Return a signature of the task's checklist items, if it has any."""
+        checklist = task.get("checklist")
+        if checklist is not True:
+            return None
+        if self.checklists is None:
+            from thingsdb import get_checklist_signatures
+
+            self.checklists = get_checklist_signatures()
+        return self.checklists.get(task.get("uuid"))
+
+    def fingerprint(self, task):
+        """Hash the task fields a rendered fragment depends on."""
+        values = [task.get(field) for field in FINGERPRINT_FIELDS]
+        values.append(self.checklist_signature(task))
+        return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
+    def get_or_render(self, task, render, namespace=""):
+        """Return the cached fragment for a task, rendering it on a miss."""
+        key = f"{namespace}:{task.get('uuid', '')}"
+        fingerprint = self.fingerprint(task)
+
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        fragment = render(task)
+        self.entries[key] = (fingerprint, fragment)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return fragment
+
+
+def open_cache(directory, render_key="", max_entries=DEFAULT_MAX_ENTRIES):
+    """Open the fragment cache stored in an output directory."""
+    return FragmentCache(os.path.join(directory or ".", CACHE_FILENAME), max_entries, render_key)
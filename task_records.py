@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Compact, read-only task records for the exporters.
+
+``things.py`` returns every task as a dict, and the exporters used to
+grow those dicts further with project and area context. A ``TaskRecord``
+stores the same fields in ``__slots__`` and interns the strings that
+repeat across rows (status, type, project/area UUIDs and titles, tags),
+so large histories take a fraction of the memory. Tasks are expected to
+carry their heading context already, as ``thingsdb`` returns them; the
+source dict is never modified.
+
+Run this module to measure the difference on synthetic data.
+"""
+
+import sys
+
+RECORD_FIELDS = (
+    "uuid", "type", "title", "status", "notes", "tags", "checklist",
+    "project", "project_title", "area", "area_title", "heading", "heading_title",
+    "start", "start_date", "deadline", "stop_date", "created", "modified",
+)
+
+# Fields whose values repeat across many tasks and are worth interning.
+SHARED_FIELDS = (
+    "type", "status", "project", "project_title", "area", "area_title",
+    "heading", "heading_title", "start", "start_date", "deadline",
+)
+
+NO_TAGS = ()
+
+
+def intern_value(value):
+    """Intern a string, passing other values through."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def intern_tags(tags):
+    """Return tags as a tuple of interned strings."""
+    if not tags:
+        return NO_TAGS
+    return tuple(sys.intern(tag) for tag in tags)
+
+
+class TaskRecord:
+    """Slotted snapshot of a Things task."""
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, **fields):
+        for name in RECORD_FIELDS:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_task(cls, task):
+        """Build a record from a things.py dict without modifying it."""
+        record = cls.__new__(cls)
+        for name in RECORD_FIELDS:
+            setattr(record, name, task.get(name))
+
+        for name in SHARED_FIELDS:
+            setattr(record, name, intern_value(getattr(record, name)))
+        record.tags = intern_tags(record.tags)
+        return record
+
+    def get(self, name, default=None):
+        """Dict-style access, so record and dict helpers can be shared."""
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        """Return the fields that are set as a plain dict."""
+        return {
+            name: getattr(self, name)
+            for name in RECORD_FIELDS
+            if getattr(self, name) is not None
+        }
+
+    def __repr__(self):
+        return f"TaskRecord(uuid={self.uuid!r}, title={self.title!r})"
+
+
+def iter_records(tasks):
+    """Yield a record per task as the tasks are consumed."""
+    for task in tasks:
+        yield TaskRecord.from_task(task)
+
+
+def to_records(tasks):
+    """Convert tasks into a list of records."""
+    return list(iter_records(tasks))
+
+
+def synthetic_tasks(count, projects=200, areas=10, tags=30):
+    """
+    Yield task dicts shaped like thingsdb.get_logbook() rows.
+
+    Every string is built per row, as sqlite3 does, so equal values are
+    distinct objects just like in a real query result.
+    """
+    for i in range(count):
+        project = i % projects
+        yield {
+            "uuid": f"TASK{i:018d}",
+            "type": "".join(("to", "-do")),
+            "title": f"Task {i} title",
+            "status": "".join(("comp", "leted")) if i % 5 else "".join(("can", "celed")),
+            "notes": f"Notes for task {i}" if i % 3 == 0 else "",
+            "tags": [f"tag{(i + k) % tags}" for k in range(i % 3)],
+            "checklist": False,
+            "project": f"PROJ{project:018d}",
+            "project_title": f"Project {project}",
+            "area": f"AREA{project % areas:018d}",
+            "area_title": f"Area {project % areas}",
+            "heading": f"HEAD{project:018d}",
+            "heading_title": f"Heading {project}",
+            "start": "".join(("An", "ytime")),
+            "start_date": None,
+            "deadline": None,
+            "stop_date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 10:{i % 60:02d}:00",
+            "created": f"2023-{1 + i % 12:02d}-{1 + i % 28:02d} 09:00:00",
+            "modified": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 10:{i % 60:02d}:00",
+        }
+
+
+def measure(count):
+    """Return peak traced memory (bytes) of holding tasks as dicts vs records."""
+    import tracemalloc
+
+    tracemalloc.start()
+    tasks = list(synthetic_tasks(count))
+    _, dict_peak = tracemalloc.get_traced_memory()
+    del tasks
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    records = to_records(synthetic_tasks(count))
+    _, record_peak = tracemalloc.get_traced_memory()
+    del records
+    tracemalloc.stop()
+
+    return dict_peak, record_peak
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dict_peak, record_peak = measure(count)
+    print(f"Tasks: {count}")
+    print(f"Peak memory as dicts:   {dict_peak / 2**20:8.1f} MiB")
+    print(f"Peak memory as records: {record_peak / 2**20:8.1f} MiB")
+    print(f"Reduction: {100.0 * (1 - record_peak / dict_peak):.1f}%")
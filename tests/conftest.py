@@ -0,0 +1,146 @@
+"""
+Shared fixtures: a small Things 3 database built from scratch.
+
+The database has the tables and columns things.py reads, with areas,
+projects (one trashed, some completed), headings, tags, checklists and
+to-dos spread over the Inbox, areas, projects and headings. Open to-dos
+fall in Today, Upcoming, Anytime, Someday and overdue deadlines relative
+to the real current date, and some logbook entries share a completion
+time so that ordering ties are exercised.
+"""
+
+import datetime
+import os
+import plistlib
+import random
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = """
+CREATE TABLE TMTask (uuid TEXT PRIMARY KEY, type INTEGER, status INTEGER, trashed INTEGER DEFAULT 0,
+  title TEXT, notes TEXT, area TEXT, project TEXT, heading TEXT, start INTEGER, startDate INTEGER,
+  deadline INTEGER, deadlineSuppressionDate INTEGER, stopDate REAL, creationDate REAL,
+  userModificationDate REAL, "index" INTEGER, todayIndex INTEGER, rt1_recurrenceRule BLOB);
+CREATE TABLE TMArea (uuid TEXT PRIMARY KEY, title TEXT, "index" INTEGER, visible INTEGER);
+CREATE TABLE TMTag (uuid TEXT PRIMARY KEY, title TEXT, shortcut TEXT, "index" INTEGER);
+CREATE TABLE TMTaskTag (tasks TEXT, tags TEXT);
+CREATE TABLE TMAreaTag (areas TEXT, tags TEXT);
+CREATE TABLE TMChecklistItem (uuid TEXT PRIMARY KEY, title TEXT, status INTEGER, stopDate REAL,
+  task TEXT, "index" INTEGER, creationDate REAL, userModificationDate REAL);
+CREATE TABLE Meta (key TEXT, value TEXT);
+CREATE TABLE TMSettings (uuid TEXT, uriSchemeAuthenticationToken TEXT);
+"""
+
+AREAS = [(f"AREA{i:018d}", f"Area {i}") for i in range(3)]
+TAGS = [(f"TAG{i:019d}", f"tag{i}") for i in range(4)]
+
+
+def thingsdate(day):
+    """Encode a date the way Things stores startDate and deadline."""
+    return (day.year << 16) | (day.month << 12) | (day.day << 7)
+
+
+def build_things_database(path, done=300, open_count=120, seed=7):
+    """Write a deterministic Things database to path."""
+    rnd = random.Random(seed)
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    cursor.executescript(SCHEMA)
+    cursor.execute("INSERT INTO Meta VALUES ('databaseVersion', ?)", (plistlib.dumps(26).decode(),))
+    for index, (uuid, title) in enumerate(AREAS):
+        cursor.execute("INSERT INTO TMArea VALUES (?, ?, ?, 1)", (uuid, title, index))
+    for index, (uuid, title) in enumerate(TAGS):
+        cursor.execute("INSERT INTO TMTag VALUES (?, ?, NULL, ?)", (uuid, title, index))
+
+    now = time.time()
+    projects, headings = [], []
+    for i in range(8):
+        uuid = f"PROJ{i:018d}"
+        status = 3 if i >= 6 else 0
+        cursor.execute(
+            'INSERT INTO TMTask (uuid, type, status, trashed, title, notes, area, start, stopDate, creationDate, '
+            'userModificationDate, "index") VALUES (?, 1, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?)',
+            (uuid, status, 1 if i == 5 else 0, f"Project {i}", "notes" if i % 2 else "",
+             AREAS[i % 3][0] if i != 4 else None, now - 86400 * 5 if status else None,
+             now - 86400 * 400, now - 86400 * 3, i),
+        )
+        projects.append(uuid)
+        for h in range(2):
+            heading = f"HEAD{i:09d}{h:09d}"
+            cursor.execute(
+                'INSERT INTO TMTask (uuid, type, status, title, project, start, creationDate, userModificationDate, '
+                '"index") VALUES (?, 2, 0, ?, ?, 1, ?, ?, ?)',
+                (heading, f"Heading {i}.{h}", uuid, now - 86400 * 400, now - 86400 * 3, h),
+            )
+            headings.append(heading)
+
+    today = datetime.date.today()
+    counter = [0]
+
+    def add(status, stop, start, start_date=None, deadline=None, today_index=None):
+        counter[0] += 1
+        uuid = f"TASK{counter[0]:018d}"
+        where = rnd.random()
+        area = project = heading = None
+        if where < 0.35:
+            project = rnd.choice(projects)
+        elif where < 0.65:
+            heading = rnd.choice(headings)
+        elif where < 0.85:
+            area = rnd.choice(AREAS)[0]
+        cursor.execute(
+            'INSERT INTO TMTask (uuid, type, status, title, notes, area, project, heading, start, startDate, '
+            'deadline, stopDate, creationDate, userModificationDate, "index", todayIndex) '
+            'VALUES (?, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (uuid, status, f"Task {counter[0]}", "line one\nline two" if rnd.random() < 0.3 else "",
+             area, project, heading, start, start_date, deadline, stop, (stop or now) - 86400,
+             stop or now - rnd.random() * 1e6, rnd.randint(0, 50),
+             counter[0] if today_index is None else today_index),
+        )
+        for tag in rnd.sample(TAGS, rnd.choice([0, 0, 1, 2])):
+            cursor.execute("INSERT INTO TMTaskTag VALUES (?, ?)", (uuid, tag[0]))
+        if rnd.random() < 0.2:
+            for j in range(3):
+                cursor.execute(
+                    "INSERT INTO TMChecklistItem VALUES (?, ?, ?, NULL, ?, ?, ?, ?)",
+                    (f"CL{uuid}{j}", f"item {j}", rnd.choice([0, 3, 2]), uuid, j, now, now),
+                )
+        return uuid
+
+    shared_stop = now - 86400 * 2
+    for i in range(done):
+        stop = shared_stop if i % 25 == 0 else now - rnd.random() * 86400 * 365 * 3
+        add(rnd.choice([3, 3, 3, 2]), stop, 1)
+    for i in range(open_count):
+        kind = rnd.random()
+        if kind < 0.3:
+            add(0, None, 1, thingsdate(today - datetime.timedelta(days=rnd.randint(0, 10))), today_index=i % 7)
+        elif kind < 0.6:
+            day = today + datetime.timedelta(days=rnd.randint(1, 60))
+            deadline = thingsdate(day + datetime.timedelta(days=3)) if rnd.random() < 0.3 else None
+            add(0, None, 2, thingsdate(day), deadline)
+        elif kind < 0.7:
+            add(0, None, 1, None, thingsdate(today - datetime.timedelta(days=2)))
+        else:
+            add(0, None, rnd.choice([0, 1, 2]))
+
+    connection.commit()
+    connection.close()
+    return path
+
+
+@pytest.fixture(scope="session")
+def things_db_path(tmp_path_factory):
+    return build_things_database(str(tmp_path_factory.mktemp("things") / "main.sqlite"))
+
+
+@pytest.fixture
+def things_db(things_db_path, monkeypatch):
+    """Point things.py (and thingsdb) at the fixture database."""
+    monkeypatch.setenv("THINGSDB", things_db_path)
+    return things_db_path
@@ -0,0 +1,43 @@
+import os
+import tarfile
+import zipfile
+
+from archive_sink import ArchiveWriter
+from things2md import write_partitioned_logbook
+from thingsdb import get_logbook
+
+
+def test_partitions_in_archive_ignore_existing_export(things_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    logbook = get_logbook()
+    years = {entry["stop_date"][:4] for entry in logbook}
+    assert len(years) > 1
+
+    # A previous filesystem export would freeze every closed year
+    write_partitioned_logbook(logbook, "p", "year")
+
+    with ArchiveWriter("backup.zip") as writer:
+        rendered, skipped = write_partitioned_logbook(logbook, "p", "year", writer=writer)
+
+    with zipfile.ZipFile("backup.zip") as archive:
+        names = set(archive.namelist())
+    assert (rendered, skipped) == (len(years), 0)
+    assert names == {f"p/{year}.md" for year in years} | {"p/index.md"}
+    assert sorted(os.listdir("p")) == sorted([f"{year}.md" for year in years] + ["index.md", ".partitions.json"])
+
+
+def test_archive_is_deterministic(tmp_path, monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+
+    def build(name):
+        path = str(tmp_path / name)
+        with ArchiveWriter(path, root=str(tmp_path)) as writer:
+            writer.write(str(tmp_path / "a" / "one.md"), "one\n")
+            writer.write_chunks(str(tmp_path / "two.md"), ["t", "wo\n"])
+        with open(path, 'rb') as f:
+            return f.read()
+
+    assert build("first.tar.gz") == build("second.tar.gz")
+    with tarfile.open(tmp_path / "first.tar.gz") as archive:
+        assert archive.getnames() == ["a/one.md", "two.md"]
+        assert {member.mtime for member in archive.getmembers()} == {315532800}
@@ -0,0 +1,47 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import batch_export
+from thingsdb import get_logbook
+
+
+def test_batch_isolates_a_failing_database(things_db, tmp_path, monkeypatch, capsys):
+    pools = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, max_workers):
+            pools.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(batch_export, "ProcessPoolExecutor", RecordingPool)
+    good, missing = tmp_path / "good", tmp_path / "missing"
+    jobs = tmp_path / "jobs.tsv"
+    jobs.write_text(f"# comment\n{things_db}\t{good}\n\n{tmp_path / 'nope.sqlite'}\t{missing}\n")
+    report = tmp_path / "report.json"
+    monkeypatch.setattr(sys, "argv", [
+        "batch_export.py", str(jobs), "--workers", "4", "--report", str(report),
+    ])
+
+    assert batch_export.main() == 1
+    assert pools == [2]
+
+    reports = json.loads(report.read_text())["jobs"]
+    assert [job["db"] for job in reports] == [things_db, str(tmp_path / "nope.sqlite")]
+    ok, failed = reports
+    assert ok["errors"] == {} and sorted(ok["seconds"]) == sorted(batch_export.EXPORTS)
+    assert ok["total"] >= sum(ok["seconds"].values())
+    assert failed["errors"] == {"db": f"No such database: {tmp_path / 'nope.sqlite'}"}
+    assert failed["seconds"] == {} and not missing.exists()
+
+    logbook = (good / batch_export.LOGBOOK_FILENAME).read_text(encoding="utf-8")
+    assert logbook.count("\n## [[") == len({entry["stop_date"][:10] for entry in get_logbook()})
+    assert os.listdir(good / batch_export.PROJECTS_DIRECTORY)
+    assert (good / batch_export.DIDA_FILENAME).exists()
+
+    out = capsys.readouterr().out
+    assert f"| {things_db} |" in out and "| ok |" in out
+    assert "failed: db" in out
+    assert "2 databases, 1 failed, 4 workers" in out
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".")] == []
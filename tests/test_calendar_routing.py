@@ -0,0 +1,67 @@
+import sqlite3
+
+from calendar_routing import compile_routes, route_tasks
+from thingsdb import fetch_calendar_tasks, get_logbook, view_tasks
+
+
+def area_of(connection, uuid):
+    """Return the area a task lives in: its own, its project's or its heading's project's."""
+    area, project, heading = connection.execute(
+        "SELECT area, project, heading FROM TMTask WHERE uuid = ?", (uuid,)
+    ).fetchone()
+    if area:
+        return area
+    if heading:
+        project = connection.execute("SELECT project FROM TMTask WHERE uuid = ?", (heading,)).fetchone()[0]
+    if project:
+        return connection.execute("SELECT area FROM TMTask WHERE uuid = ?", (project,)).fetchone()[0]
+    return None
+
+
+def upcoming_tasks():
+    tasks = fetch_calendar_tasks()
+    return view_tasks(tasks, "today") + view_tasks(tasks, "upcoming")
+
+
+def test_area_route_matches_todos_inside_projects_and_headings(things_db):
+    connection = sqlite3.connect(things_db)
+    tasks = upcoming_tasks()
+    expected = {task["uuid"] for task in tasks if area_of(connection, task["uuid"]) == "AREA000000000000000000"}
+    nested = {task["uuid"] for task in tasks if task["uuid"] in expected and "project" in task}
+    assert nested, "fixture should have to-dos inside projects of the area"
+
+    routes = compile_routes([{"calendar": "Work", "source": "upcoming", "area": "Area 0"}])
+    routed = route_tasks(routes, {"upcoming": tasks})
+
+    assert {task["uuid"] for task in routed["Work"]["tasks"]} == expected
+
+
+def test_project_route_matches_todos_under_headings(things_db):
+    connection = sqlite3.connect(things_db)
+    tasks = upcoming_tasks()
+    expected = set()
+    for task in tasks:
+        project, heading = connection.execute(
+            "SELECT project, heading FROM TMTask WHERE uuid = ?", (task["uuid"],)
+        ).fetchone()
+        if heading:
+            project = connection.execute("SELECT project FROM TMTask WHERE uuid = ?", (heading,)).fetchone()[0]
+        if project == "PROJ000000000000000001":
+            expected.add(task["uuid"])
+
+    routes = compile_routes([{"calendar": "P1", "source": "upcoming", "project": "Project 1"}])
+    routed = route_tasks(routes, {"upcoming": tasks})
+
+    assert expected
+    assert {task["uuid"] for task in routed["P1"]["tasks"]} == expected
+
+
+def test_logbook_area_route_matches_todos_inside_projects(things_db):
+    connection = sqlite3.connect(things_db)
+    logbook = get_logbook(project_area=True)
+    expected = {task["uuid"] for task in logbook if area_of(connection, task["uuid"]) == "AREA000000000000000001"}
+
+    routes = compile_routes([{"calendar": "Done", "source": "logbook", "area": "AREA000000000000000001"}])
+    routed = route_tasks(routes, {"logbook": logbook})
+
+    assert {task["uuid"] for task in routed["Done"]["tasks"]} == expected
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import projects2md
+from checkpoint import CHECKPOINT_FILENAME, Checkpoint
+from output_writer import BatchedWriter
+
+
+def export(projects, output, resume=False):
+    with BatchedWriter() as writer:
+        checkpoint = Checkpoint(output, writer, resume=resume)
+        with checkpoint:
+            counts = projects2md.create_markdown_files(projects, output, writer=writer, checkpoint=checkpoint)
+    checkpoint.clear()
+    return counts, checkpoint.resumed
+
+
+def read_tree(directory):
+    return {name: open(os.path.join(directory, name), encoding="utf-8").read() for name in os.listdir(directory)}
+
+
+def test_interrupted_export_resumes(things_db, tmp_path, monkeypatch):
+    projects = projects2md.group_tasks_by_project(projects2md.get_all_tasks())
+    assert len(projects) > 4
+    output = str(tmp_path / "resumed")
+
+    render = projects2md.generate_project_markdown
+    rendered = []
+
+    def interrupt_after_four(*args):
+        if len(rendered) == 4:
+            raise KeyboardInterrupt
+        rendered.append(args[0]["info"]["title"])
+        return render(*args)
+
+    monkeypatch.setattr(projects2md, "generate_project_markdown", interrupt_after_four)
+    with pytest.raises(KeyboardInterrupt):
+        export(projects, output)
+    assert os.path.exists(os.path.join(output, CHECKPOINT_FILENAME))
+
+    monkeypatch.setattr(projects2md, "generate_project_markdown", render)
+    _, resumed = export(projects, output, resume=True)
+    assert resumed == 4
+
+    export(projects, str(tmp_path / "clean"))
+    assert read_tree(output) == read_tree(str(tmp_path / "clean"))
+
+
+def test_checkpoint_of_changed_project_is_not_trusted(tmp_path):
+    with BatchedWriter() as writer:
+        checkpoint = Checkpoint(str(tmp_path), writer)
+        checkpoint.mark("project", "signature", "hash")
+        checkpoint.save()
+
+    checkpoint = Checkpoint(str(tmp_path), BatchedWriter(), resume=True)
+    assert checkpoint.resume("project", "signature") == {"signature": "signature", "hash": "hash"}
+    assert checkpoint.resume("project", "changed") is None
+
+
+def test_checkpoint_is_saved_long_before_the_writer_batch(tmp_path):
+    writer = BatchedWriter()
+    checkpoint = Checkpoint(str(tmp_path), writer)
+    for i in range(100):
+        writer.write(str(tmp_path / f"{i}.md"), f"{i}\n")
+        checkpoint.mark(str(i), "signature", "hash")
+
+    saved = Checkpoint(str(tmp_path), BatchedWriter(), resume=True)
+    assert len(saved.done) == 100
+    assert all((tmp_path / f"{i}.md").exists() for i in range(100))
+
+
+def test_checkpoint_is_saved_after_an_interval(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path), BatchedWriter(), save_seconds=0)
+    checkpoint.mark("project", "signature", "hash")
+    assert os.path.exists(tmp_path / CHECKPOINT_FILENAME)
@@ -0,0 +1,78 @@
+import datetime
+import sys
+
+import things2md
+from daily_notes import START_MARKER, update_daily_notes
+
+
+def test_note_without_markers_is_rewritten(tmp_path):
+    note = tmp_path / "2024-03-01.md"
+    note.write_text("# Friday\n")
+    sections = [("2024-03-01", "- [x] Task\n")]
+
+    assert update_daily_notes(sections, str(tmp_path)) == (1, 0, 0)
+    assert update_daily_notes(sections, str(tmp_path)) == (0, 1, 0)
+
+    note.write_text("# Friday\n\nmarkers removed by hand\n")
+    assert update_daily_notes(sections, str(tmp_path)) == (1, 0, 0)
+    assert START_MARKER in note.read_text() and "- [x] Task" in note.read_text()
+
+
+def test_edited_note_with_intact_markers_is_not_rewritten(tmp_path):
+    note = tmp_path / "2024-03-01.md"
+    note.write_text("# Friday\n")
+    sections = [("2024-03-01", "- [x] Task\n")]
+    update_daily_notes(sections, str(tmp_path))
+
+    note.write_text("Notes added above\n" + note.read_text())
+    assert update_daily_notes(sections, str(tmp_path)) == (0, 1, 0)
+    assert note.read_text().startswith("Notes added above\n")
+
+
+def test_daily_notes_reuse_the_rendered_logbook(things_db, tmp_path, monkeypatch):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    days = {entry["stop_date"][:10] for entry in things2md.get_logbook()}
+    for day in days:
+        (notes / f"{day}.md").write_text(f"# {day}\n")
+
+    calls = []
+    render = things2md.format_logbook_entry
+    monkeypatch.setattr(things2md, "format_logbook_entry", lambda *args: calls.append(1) or render(*args))
+    monkeypatch.setattr(sys, "argv", [
+        "things2md.py", "--output", str(tmp_path / "logbook.md"), "--daily-notes", str(notes),
+    ])
+    things2md.main()
+
+    assert len(calls) == len(things2md.get_logbook())
+    for day in days:
+        assert START_MARKER in (notes / f"{day}.md").read_text()
+
+
+def test_frozen_partitions_are_not_rendered_for_daily_notes(things_db, tmp_path, monkeypatch):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    logbook = things2md.get_logbook()
+    days = sorted({entry["stop_date"][:10] for entry in logbook})
+    for day in days[1:]:
+        (notes / f"{day}.md").write_text(f"# {day}\n")
+    argv = [
+        "things2md.py", "--partition", "year", "--output-directory", str(tmp_path / "logbook"),
+        "--daily-notes", str(notes),
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+    things2md.main()
+
+    calls = []
+    render = things2md.format_logbook_entry
+    monkeypatch.setattr(things2md, "format_logbook_entry", lambda *args: calls.append(1) or render(*args))
+    things2md.main()
+    this_year = str(datetime.date.today().year)
+    assert len(calls) == sum(entry["stop_date"].startswith(this_year) for entry in logbook)
+    for day in days[1:]:
+        assert START_MARKER in (notes / f"{day}.md").read_text()
+
+    # A note created since the last run gets its section all the same
+    (notes / f"{days[0]}.md").write_text(f"# {days[0]}\n")
+    things2md.main()
+    assert START_MARKER in (notes / f"{days[0]}.md").read_text()
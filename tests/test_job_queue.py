@@ -0,0 +1,85 @@
+import time
+
+from job_queue import JobQueue, run_claimed_job
+
+
+def test_missing_database_fails_without_retry(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    job_id = queue.add("logbook", {"db": str(tmp_path / "missing.sqlite"), "output": str(tmp_path / "out.md")})
+
+    assert not run_claimed_job(queue, queue.claim("w1"), "w1")
+    job = queue.jobs()[0]
+    assert (job["id"], job["status"], job["attempts"]) == (job_id, "failed", 1)
+    assert "FileNotFoundError" in job["error"]
+    assert queue.claim("w1") is None
+
+
+def test_failed_job_waits_before_retry(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"), retry_seconds=60)
+    queue.add("logbook", {"db": "a.sqlite", "output": "out.md"})
+
+    job = queue.claim("w1")
+    assert queue.finish(job["id"], "w1", error="database is locked")
+    job = queue.jobs()[0]
+    assert job["status"] == "pending"
+    assert job["lease_expires"] >= time.time() + 59
+    assert queue.claim("w1") is None
+
+    queue.connection.execute("UPDATE jobs SET lease_expires = ?", (time.time() - 1,))
+    assert queue.claim("w1")["attempts"] == 2
+
+
+def test_job_output_stays_out_of_worker_log(things_db, tmp_path, capsys):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add("dida", {"db": things_db, "output": str(tmp_path / "dida.csv")})
+
+    assert run_claimed_job(queue, queue.claim("w1"), "w1")
+    assert capsys.readouterr().out == ""
+    assert (tmp_path / "dida.csv").read_text(encoding="utf-8-sig").startswith('\ufeff"Date: ')
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def expire_leases(queue):
+    queue.connection.execute("UPDATE jobs SET lease_expires = ? WHERE status = 'running'", (time.time() - 1,))
+
+
+def test_claimed_job_is_leased_to_one_worker(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add("logbook", {"db": "a.sqlite", "output": "out.md"})
+
+    job = queue.claim("w1")
+    assert (job["status"], job["worker"], job["attempts"]) == ("running", "w1", 1)
+    assert queue.claim("w2") is None
+    assert queue.heartbeat(job["id"], "w1")
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = JobQueue(path)
+    job_id = queue.add("logbook", {"db": "a.sqlite", "output": "out.md"})
+    queue.claim("w1")
+
+    expire_leases(queue)
+    job = JobQueue(path).claim("w2")
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, "w2", 2)
+
+    # The first worker lost the job: its heartbeat and outcome are ignored
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.finish(job_id, "w1", result="stale")
+    assert queue.finish(job_id, "w2", result="done")
+    assert queue.jobs()[0]["status"] == "done"
+
+
+def test_lease_expiring_on_last_attempt_fails_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add("logbook", {"db": "a.sqlite", "output": "out.md"}, max_attempts=2)
+    queue.claim("w1")
+    expire_leases(queue)
+    queue.claim("w2")
+    expire_leases(queue)
+
+    assert queue.claim("w3") is None
+    job = queue.jobs()[0]
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert "Lease expired" in job["error"]
+    assert not queue.pending_or_running()
@@ -0,0 +1,19 @@
+import pytest
+
+from md_templates import compile_template, compile_templates
+
+
+def test_custom_template_renders():
+    render = compile_template("checklist_item", "* {checkbox} {title!r:>8}", cache_directory=None)
+    assert render(checkbox="- [ ]", title="x", status="incomplete") == "* - [ ]      'x'"
+
+
+@pytest.mark.parametrize("template", ["{title!x}", "{title!}", "{link"])
+def test_bad_placeholder_names_template_and_field(template):
+    with pytest.raises(ValueError, match="task template"):
+        compile_templates({"task": template}, cache_directory=None)
+
+
+def test_unknown_placeholder_is_rejected():
+    with pytest.raises(ValueError, match=r"\{due\}"):
+        compile_template("task", "{due}", cache_directory=None)
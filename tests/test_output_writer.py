@@ -0,0 +1,57 @@
+import os
+import stat
+
+import pytest
+
+from output_writer import BatchedWriter, write_file_atomically
+
+
+@pytest.fixture
+def umask_027():
+    previous = os.umask(0o027)
+    yield
+    os.umask(previous)
+
+
+def test_new_files_follow_the_umask(tmp_path, umask_027):
+    path = tmp_path / "note.md"
+    write_file_atomically(str(path), "hello\n")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert path.read_text() == "hello\n"
+    assert os.listdir(tmp_path) == ["note.md"]
+
+
+def test_flush_syncs_files_without_a_global_sync(tmp_path, monkeypatch):
+    def global_sync():
+        raise AssertionError("os.sync() flushes every filesystem")
+
+    monkeypatch.setattr(os, "sync", global_sync, raising=False)
+    with BatchedWriter() as writer:
+        for i in range(3):
+            writer.write(str(tmp_path / f"{i}.md"), f"{i}\n")
+    assert sorted(os.listdir(tmp_path)) == ["0.md", "1.md", "2.md"]
+
+
+def test_removals_wait_for_the_flush(tmp_path):
+    stale = tmp_path / "2019.md"
+    stale.write_text("old\n")
+
+    writer = BatchedWriter()
+    writer.write(str(tmp_path / "2024.md"), "new\n")
+    writer.remove(str(stale))
+    assert stale.exists()
+    writer.flush()
+    assert not stale.exists()
+    assert (tmp_path / "2024.md").read_text() == "new\n"
+
+
+def test_discard_keeps_files_marked_for_removal(tmp_path):
+    stale = tmp_path / "2019.md"
+    stale.write_text("old\n")
+
+    with pytest.raises(RuntimeError):
+        with BatchedWriter() as writer:
+            writer.write(str(tmp_path / "2024.md"), "new\n")
+            writer.remove(str(stale))
+            raise RuntimeError("interrupted")
+    assert os.listdir(tmp_path) == ["2019.md"]
@@ -0,0 +1,30 @@
+import datetime
+import shutil
+import sqlite3
+
+from things2md import write_partitioned_logbook
+from thingsdb import get_logbook
+
+
+def test_project_rename_rewrites_frozen_partition(things_db_path, tmp_path, monkeypatch):
+    database = str(tmp_path / "main.sqlite")
+    shutil.copy(things_db_path, database)
+    monkeypatch.setenv("THINGSDB", database)
+    output = str(tmp_path / "logbook")
+
+    this_year = str(datetime.date.today().year)
+    entry = next(
+        entry for entry in get_logbook()
+        if entry.get("heading") and not entry["stop_date"].startswith(this_year)
+    )
+    year = entry["stop_date"][:4]
+    write_partitioned_logbook(get_logbook(), output, "year")
+
+    with sqlite3.connect(database) as connection:
+        connection.execute("UPDATE TMTask SET title = 'Renamed project' WHERE uuid = ?", (entry["project"],))
+        connection.execute("UPDATE TMTask SET title = 'Renamed heading' WHERE uuid = ?", (entry["heading"],))
+
+    rendered, _ = write_partitioned_logbook(get_logbook(), output, "year")
+    content = (tmp_path / "logbook" / f"{year}.md").read_text(encoding="utf-8")
+    assert "Renamed project" in content and "Renamed heading" in content
+    assert rendered >= 2
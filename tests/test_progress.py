@@ -0,0 +1,38 @@
+import io
+import json
+
+from output_writer import BatchedWriter
+from progress import Progress, track
+
+
+def events(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_every_flush_advances_one_write_phase(tmp_path):
+    stream = io.StringIO()
+    progress = Progress("json", stream, interval=0)
+    with BatchedWriter(batch_size=3, progress=progress) as writer:
+        for i in track(progress, "render", range(8)):
+            writer.write(str(tmp_path / f"{i}.md"), f"{i}\n")
+
+    write = [event for event in events(stream) if event["phase"] == "write"]
+    assert [event["event"] for event in write].count("start") == 1
+    assert write[-1]["event"] == "end"
+    assert (write[-1]["done"], write[-1]["total"]) == (8, 8)
+
+    render = [event for event in events(stream) if event["phase"] == "render"]
+    assert [event["event"] for event in render].count("end") == 1
+    assert render[-1]["done"] == 8
+
+
+def test_resumed_phase_keeps_its_count():
+    stream = io.StringIO()
+    progress = Progress("json", stream, interval=0)
+    progress.start("render", 4)
+    progress.advance(2)
+    assert progress.resume("write", 10) == "render"
+    progress.advance()
+    progress.suspend()
+    assert progress.resume("render") is None
+    assert (progress.done, progress.total) == (2, 4)
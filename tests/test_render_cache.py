@@ -0,0 +1,40 @@
+import shutil
+import sqlite3
+
+from render_cache import open_cache
+from things2md import format_logbook_entry
+from thingsdb import get_logbook
+
+
+def checklist_task(logbook):
+    return next(entry for entry in logbook if entry.get("checklist") is True)
+
+
+def test_checklist_edit_invalidates_cached_fragment(things_db_path, tmp_path, monkeypatch):
+    database = str(tmp_path / "main.sqlite")
+    shutil.copy(things_db_path, database)
+    monkeypatch.setenv("THINGSDB", database)
+
+    cache = open_cache(str(tmp_path))
+    task = checklist_task(get_logbook())
+    first = cache.get_or_render(task, format_logbook_entry)
+    cache.save()
+
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "UPDATE TMChecklistItem SET title = 'Edited item' WHERE task = ? AND \"index\" = 0", (task["uuid"],)
+        )
+
+    cache = open_cache(str(tmp_path))
+    task = checklist_task(get_logbook())
+    second = cache.get_or_render(task, format_logbook_entry)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert "Edited item" in second and "Edited item" not in first
+
+
+def test_unchanged_checklist_is_served_from_cache(things_db, tmp_path):
+    cache = open_cache(str(tmp_path))
+    task = checklist_task(get_logbook())
+    cache.get_or_render(task, format_logbook_entry)
+    cache.get_or_render(task, format_logbook_entry)
+    assert (cache.hits, cache.misses) == (1, 1)
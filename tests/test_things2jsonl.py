@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+import things
+
+from things2jsonl import export_to_jsonl
+
+
+def test_paged_export_matches_things(things_db, tmp_path):
+    output = tmp_path / "things.jsonl"
+    count = export_to_jsonl(str(output), page_size=7)
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+
+    expected = things.todos() + things.logbook()
+    assert count == len(expected)
+    assert [record["uuid"] for record in records[:len(things.todos())]] == [task["uuid"] for task in things.todos()]
+    assert sorted(record["uuid"] for record in records) == sorted(task["uuid"] for task in expected)
+
+    checklists = {record["uuid"]: record["checklist"] for record in records}
+    for task in expected:
+        items = things.checklist_items(task["uuid"]) if task.get("checklist") else []
+        assert [item["title"] for item in checklists[task["uuid"]]] == [item["title"] for item in items]
+        assert [item["status"] for item in checklists[task["uuid"]]] == [item["status"] for item in items]
+
+
+def test_interrupted_export_keeps_the_previous_file(things_db, tmp_path):
+    output = tmp_path / "things.jsonl"
+    export_to_jsonl(str(output))
+    previous = output.read_text(encoding="utf-8")
+
+    def tasks():
+        yield from things.todos()[:3]
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        export_to_jsonl(str(output), tasks=tasks())
+    assert output.read_text(encoding="utf-8") == previous
+    assert os.listdir(tmp_path) == ["things.jsonl"]
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+import things2parquet
+from things2parquet import write_partitioned, write_table
+
+COLUMNS = {"uuid": "string", "tags": "tags"}
+
+
+def rows(*years):
+    return [{"uuid": f"T{year}", "stop_date": f"{year}-05-01 10:00:00", "tags": []} for year in years]
+
+
+@pytest.mark.parametrize("file_format", ["npz", "parquet"])
+def test_partitions_of_vanished_years_are_removed(tmp_path, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    directory = str(tmp_path / "tasks")
+    write_partitioned(rows(2023, 2024), COLUMNS, directory, file_format)
+    write_partitioned(rows(2024), COLUMNS, directory, file_format)
+    assert os.listdir(directory) == ["stop_year=2024"]
+
+
+def test_npz_tags_keep_commas(tmp_path):
+    tags = [["a,b", "c"], [], ["d"]]
+    path = write_table(
+        [{"uuid": str(i), "tags": t} for i, t in enumerate(tags)], COLUMNS, str(tmp_path / "part-0"), "npz"
+    )
+    with np.load(path) as data:
+        values, offsets = data["tags.values"], data["tags.offsets"]
+        assert [list(values[offsets[i]:offsets[i + 1]]) for i in range(len(tags))] == tags
+
+
+@pytest.mark.parametrize("file_format", ["npz", "parquet"])
+def test_interrupted_write_keeps_the_previous_file(tmp_path, monkeypatch, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    path = write_table(rows(2024), COLUMNS, str(tmp_path / "part-0"), file_format)
+    with open(path, 'rb') as f:
+        previous = f.read()
+
+    def interrupted(f, *args, **kwargs):
+        f.write(b"PAR1 truncated")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(np, "savez_compressed", interrupted)
+    if file_format == "parquet":
+        monkeypatch.setattr(things2parquet.pq, "write_table", lambda table, f: interrupted(f))
+    with pytest.raises(KeyboardInterrupt):
+        write_table(rows(2023, 2024), COLUMNS, str(tmp_path / "part-0"), file_format)
+    with open(path, 'rb') as f:
+        assert f.read() == previous
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
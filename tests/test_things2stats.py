@@ -0,0 +1,117 @@
+import datetime
+from collections import Counter
+
+import numpy as np
+import things
+
+from things2stats import NO_GROUP, count_by, logbook_to_columns, newest_first, stats_to_md, week_start
+from thingsdb import get_logbook
+
+
+def expected_group(entry, headings):
+    """Group label of a raw things.logbook() entry, resolved by hand."""
+    project = entry.get("project") or headings.get(entry.get("heading"), {}).get("project")
+    if project:
+        return f"[{things.get(project)['title']}](things:///show?id={project})"
+    if entry.get("area"):
+        return f"[{entry['area_title']}](things:///show?id={entry['area']})"
+    return NO_GROUP
+
+
+def table_rows(markdown, title):
+    """Return {label: (completed, canceled)} of one section's table."""
+    section = markdown.split(f"## {title}\n\n")[1].split("\n\n")[0]
+    rows = {}
+    for line in section.splitlines()[2:]:
+        label, done, canceled, _ = [cell.strip() for cell in line.strip("|").split(" | ")]
+        rows[label] = (int(done), int(canceled))
+    return rows
+
+
+def test_newest_first_sorts_unsorted_labels():
+    labels = np.array(['2024-03-01', '2023-12-31', '2024-01-15'], dtype='datetime64[D]')
+    assert [str(label) for label in labels[newest_first(labels)]] == ['2024-03-01', '2024-01-15', '2023-12-31']
+
+
+def test_count_by_counts_completed_and_canceled():
+    keys = np.array(['b', 'a', 'b', 'b', 'a'], dtype=object)
+    completed = np.array([True, False, False, True, True])
+    labels, done, canceled = count_by(keys, completed)
+    assert list(labels) == ['a', 'b']
+    assert list(done) == [1, 2] and list(canceled) == [1, 1]
+
+
+def test_week_start_crosses_the_iso_year_boundary():
+    days = np.array(['2020-12-31', '2021-01-03', '2021-01-04', '2023-12-31', '2024-01-01'], dtype='datetime64[D]')
+    mondays = [label.item() for label in week_start(days)]
+    assert [str(monday) for monday in mondays] == [
+        '2020-12-28', '2020-12-28', '2021-01-04', '2023-12-25', '2024-01-01',
+    ]
+    assert [monday.isocalendar()[:2] for monday in mondays] == [
+        (2020, 53), (2020, 53), (2021, 1), (2023, 52), (2024, 1),
+    ]
+
+
+def test_groups_and_tags_match_the_logbook(things_db):
+    logbook = things.logbook()
+    headings = {heading["uuid"]: heading for heading in things.tasks(type="heading", status=None)}
+    columns = logbook_to_columns(get_logbook())
+    completed = columns['completed']
+
+    expected = Counter((expected_group(entry, headings), entry["status"]) for entry in logbook)
+    labels, done, canceled = count_by(columns['group'], completed)
+    assert len(labels) > 3
+    for label, d, c in zip(labels, done, canceled):
+        assert (d, c) == (expected[(label, "completed")], expected[(label, "canceled")])
+
+    expected = Counter((tag, entry["status"]) for entry in logbook for tag in entry.get("tags", []))
+    labels, done, canceled = count_by(columns['tag'], completed[columns['tag_row']])
+    assert sorted(labels) == sorted({tag for tag, _ in expected})
+    for label, d, c in zip(labels, done, canceled):
+        assert (d, c) == (expected[(label, "completed")], expected[(label, "canceled")])
+
+
+def test_stats_to_md_tables_add_up(things_db):
+    logbook = things.logbook()
+    markdown = stats_to_md(logbook_to_columns(get_logbook()))
+    statuses = Counter(entry["status"] for entry in logbook)
+    totals = (statuses["completed"], statuses["canceled"])
+
+    assert f"| All | {totals[0]} | {totals[1]} |" in markdown
+    for title in ("By month", "By week", "By day", "By project or area"):
+        rows = table_rows(markdown, title)
+        assert tuple(map(sum, zip(*rows.values()))) == totals
+
+    days = Counter((entry["stop_date"][:10], entry["status"]) for entry in logbook)
+    for label, counts in table_rows(markdown, "By day").items():
+        day = label.strip("[]")
+        assert counts == (days[(day, "completed")], days[(day, "canceled")])
+
+    weeks = Counter()
+    for entry in logbook:
+        year, week, _ = datetime.date.fromisoformat(entry["stop_date"][:10]).isocalendar()
+        weeks[(f"{year}-W{week:02d}", entry["status"])] += 1
+    for label, counts in table_rows(markdown, "By week").items():
+        assert counts == (weeks[(label, "completed")], weeks[(label, "canceled")])
+
+    tags = Counter((f"#{tag}", entry["status"]) for entry in logbook for tag in entry.get("tags", []))
+    for label, counts in table_rows(markdown, "By tag").items():
+        assert counts == (tags[(label, "completed")], tags[(label, "canceled")])
+
+
+def test_stats_to_md_labels_iso_weeks_by_their_iso_year():
+    columns = logbook_to_columns([
+        {"stop_date": "2020-12-31 10:00:00", "status": "completed"},
+        {"stop_date": "2021-01-03 10:00:00", "status": "canceled"},
+        {"stop_date": "2021-01-04 10:00:00", "status": "completed"},
+    ])
+    rows = table_rows(stats_to_md(columns), "By week")
+    assert rows == {"2021-W01": (1, 0), "2020-W53": (1, 1)}
+    assert list(rows) == ["2021-W01", "2020-W53"]
+
+
+def test_stats_to_md_of_an_empty_logbook():
+    markdown = stats_to_md(logbook_to_columns([]))
+    assert "| All | 0 | 0 | - |" in markdown
+    for title in ("By month", "By week", "By day", "By project or area", "By tag"):
+        assert table_rows(markdown, title) == {}
@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+from collections import Counter
+
+import pytest
+
+import things
+from thingsdb import (
+    CALENDAR_VIEW_SORT_KEYS,
+    ReadOnlyDatabase,
+    fetch_calendar_tasks,
+    fetch_concurrently,
+    get_logbook,
+    get_todos,
+    iter_logbook,
+    iter_todos,
+    view_tasks,
+)
+
+
+def test_fetch_concurrently_keeps_a_callers_database(things_db):
+    database = ReadOnlyDatabase()
+    todos, logbook = fetch_concurrently(
+        [(things.todos, {"database": database}), (things.logbook, {})]
+    )
+    assert [task["uuid"] for task in todos] == [task["uuid"] for task in things.todos()]
+    assert [task["uuid"] for task in logbook] == [task["uuid"] for task in things.logbook()]
+
+
+def test_fetch_concurrently_closes_worker_connections(things_db):
+    database = ReadOnlyDatabase()
+    main_connection = database.get_connection()
+    opened = []
+    connect = database.get_connection
+
+    def get_connection():
+        connection = connect()
+        if threading.current_thread() is not threading.main_thread():
+            opened.append(connection)
+        return connection
+
+    database.get_connection = get_connection
+    fetch_concurrently([(things.todos, {}), (things.logbook, {})], database=database)
+
+    assert opened
+    for connection in opened:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            connection.execute("SELECT 1")
+    assert main_connection.execute("SELECT 1").fetchone() == (1,)
+
+
+def uuids(tasks):
+    return [task["uuid"] for task in tasks]
+
+
+def test_get_todos_matches_things(things_db):
+    assert uuids(get_todos()) == uuids(things.todos())
+
+
+def test_get_logbook_matches_things(things_db):
+    assert uuids(get_logbook()) == uuids(things.logbook())
+
+
+def test_get_logbook_since_matches_things(things_db):
+    since = things.logbook()[40]["stop_date"][:10]
+    assert uuids(get_logbook(since=since)) == uuids(things.logbook(stop_date=f">={since}"))
+
+
+def test_get_logbook_of_uuids_keeps_only_logbook_tasks(things_db):
+    logbook = uuids(things.logbook())
+    todo = things.todos()[0]["uuid"]
+    assert uuids(get_logbook(uuids=[logbook[3], todo, logbook[1]])) == [logbook[1], logbook[3]]
+    assert get_logbook(uuids=[]) == []
+
+
+def test_get_logbook_resolves_heading_context(things_db):
+    headings = {heading["uuid"]: heading for heading in things.tasks(type="heading", status=None)}
+    entries = [entry for entry in get_logbook() if entry.get("heading")]
+    assert entries
+    for entry in entries:
+        assert entry["project"] == headings[entry["heading"]]["project"]
+
+
+@pytest.mark.parametrize("page_size", [1, 7, 500])
+def test_iter_logbook_matches_things(things_db, page_size):
+    expected = things.logbook()
+    entries = list(iter_logbook(page_size=page_size))
+    # Ties on the completion time are ordered by uuid instead of by index
+    assert sorted(uuids(entries)) == sorted(uuids(expected))
+    assert [entry["stop_date"] for entry in entries] == [entry["stop_date"] for entry in expected]
+    assert entries == sorted(entries, key=lambda entry: (entry["stop_date"], entry["uuid"]), reverse=True)
+
+
+@pytest.mark.parametrize("page_size", [1, 7, 500])
+def test_iter_todos_matches_things(things_db, page_size):
+    assert uuids(iter_todos(page_size=page_size)) == uuids(things.todos())
+
+
+@pytest.mark.parametrize("view, read", [
+    ("today", things.today), ("upcoming", things.upcoming), ("deadlines", things.deadlines),
+])
+def test_view_tasks_match_things(things_db, view, read):
+    expected = read()
+    tasks = view_tasks(fetch_calendar_tasks(), view)
+    assert expected
+    assert sorted(uuids(tasks)) == sorted(uuids(expected))
+    # things.py leaves the order of tasks with equal sort keys to SQLite
+    sort_key = CALENDAR_VIEW_SORT_KEYS[view]
+    assert [sort_key(task) for task in tasks] == [sort_key(task) for task in expected]
+    counts = Counter(sort_key(task) for task in expected)
+    assert [task["uuid"] for task in tasks if counts[sort_key(task)] == 1] == \
+        [task["uuid"] for task in expected if counts[sort_key(task)] == 1]
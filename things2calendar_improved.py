@@ -1,16 +1,40 @@
-from Foundation import NSDate, NSURL
+from Foundation import NSDate
 from dateutil.parser import parse
-from CalendarStore import CalCalendarStore, CalEvent
+from CalendarStore import CalCalendarStore
 from operator import itemgetter
 from collections import defaultdict
+import argparse
 import datetime
-import things
 import time
 import logging
 
+from calendar_sync import (
+    DEFAULT_BATCH_INTERVAL,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_REFRESH_INTERVAL,
+    DIGEST_MODES,
+    CalendarSession,
+    apply_plan,
+    check_batching,
+    empty_plan,
+    is_carried_over,
+    plan_carried_over,
+    plan_digest_sync,
+    plan_summary,
+)
+from calendar_routing import load_routes, route_sources, route_tasks
+from thingsdb import fetch_calendar_tasks, get_logbook, view_tasks
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Event layout used by each of the built-in calendars
+EVENT_KINDS = {
+    'Things Upcoming': 'upcoming',
+    'Things Logbook': 'logbook',
+    'Things Deadlines': 'deadlines',
+}
+
 def logbook_to_md(data):
     sorted_data = sorted(data, key = itemgetter('stop_date'), reverse=True)
 
@@ -62,9 +86,9 @@ def logbook_to_md(data):
 
     return final_md
 
-def get_existing_events(calendar, start_date=None, end_date=None):
+def get_existing_events(calendar, start_date=None, end_date=None, store=None):
     """Get existing events from calendar within date range."""
-    store = CalCalendarStore.defaultCalendarStore()
+    store = store or CalCalendarStore.defaultCalendarStore()
     
     if start_date is None:
         start_date = NSDate.dateWithTimeIntervalSinceNow_(-60*60*24*365)  # 1 years ago
@@ -78,6 +102,10 @@ def get_existing_events(calendar, start_date=None, end_date=None):
     events = store.eventsWithPredicate_(predicate)
     
     # Create a dictionary of events by Things UUID
+    return events_by_uuid(events)
+
+def events_by_uuid(events):
+    """Index calendar events by the Things UUID in their URL."""
     events_dict = {}
     for event in events:
         url = event.url()
@@ -86,35 +114,56 @@ def get_existing_events(calendar, start_date=None, end_date=None):
             if 'things:///show?id=' in url_string:
                 uuid = url_string.split('things:///show?id=')[1]
                 events_dict[uuid] = event
-    
     return events_dict
 
-def task_to_event_dict(task, calendar_name, is_from_today=False):
+def get_events_by_calendar(calendars, start_date=None, end_date=None, store=None):
+    """Get existing events of several calendars with one query.
+    
+    Returns a dictionary of calendar title -> events by Things UUID.
+    """
+    store = store or CalCalendarStore.defaultCalendarStore()
+    
+    if start_date is None:
+        start_date = NSDate.dateWithTimeIntervalSinceNow_(-60*60*24*365)  # 1 years ago
+    if end_date is None:
+        end_date = NSDate.dateWithTimeIntervalSinceNow_(60*60*24*365*4)  # 4 years ahead
+    
+    predicate = CalCalendarStore.eventPredicateWithStartDate_endDate_calendars_(
+        start_date, end_date, list(calendars)
+    )
+    
+    by_calendar = defaultdict(list)
+    for event in store.eventsWithPredicate_(predicate):
+        by_calendar[event.calendar().title()].append(event)
+    
+    return {calendar.title(): events_by_uuid(by_calendar[calendar.title()]) for calendar in calendars}
+
+def task_to_event_dict(task, calendar_name, is_from_today=False, kind=None):
     """Convert a Things task to event properties dictionary.
     
     Args:
         task: The Things task dictionary
         calendar_name: Name of the calendar to sync to
         is_from_today: Whether this task came from things.today()
+        kind: Event layout ('upcoming', 'logbook' or 'deadlines'); defaults
+            to the layout of the built-in calendar with this name
+    
+    Overdue Today tasks stay on the day they were scheduled; they are
+    listed in the carried-over digest instead of being moved every day.
     """
+    kind = kind or EVENT_KINDS.get(calendar_name)
     event_dict = {}
     
     # Set dates based on calendar type
-    if calendar_name == 'Things Upcoming':
-        # Use start_date if available, otherwise use today for today's tasks
+    if kind == 'upcoming':
         if 'start_date' in task and task['start_date']:
             start_date = parse(task['start_date'])
-            # If this is from today() and the start date is in the past, use today instead
-            # This adjustment should be tracked to avoid unnecessary updates
-            if is_from_today:
-                today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                if start_date < today:
-                    event_dict['original_start_date'] = start_date
-                    start_date = today
+        elif is_from_today:
+            # A today task without a start date only shows in the carried-over digest
+            return None
         else:
-            # This is a today task without a specific start date
             start_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    elif calendar_name == 'Things Logbook':
+    elif kind == 'logbook':
         if 'stop_date' not in task or not task['stop_date']:
             return None
         # Parse the complete datetime including time
@@ -124,7 +173,7 @@ def task_to_event_dict(task, calendar_name, is_from_today=False):
         event_dict['end_date'] = stop_datetime
         # Mark that this should not be all-day
         event_dict['is_all_day'] = False
-    elif calendar_name == 'Things Deadlines':
+    elif kind == 'deadlines':
         if 'deadline' not in task or not task['deadline']:
             return None
         # Parse deadline date (no time component)
@@ -137,7 +186,7 @@ def task_to_event_dict(task, calendar_name, is_from_today=False):
         return None
     
     # For non-logbook/non-deadline items, set dates normally
-    if calendar_name == 'Things Upcoming':
+    if kind == 'upcoming':
         event_dict['start_date'] = start_date
         
         # Set end date
@@ -259,95 +308,131 @@ def logbook_events_need_update(existing_event, new_event_dict):
     # Don't update title/notes - preserve manual edits
     return False
 
-def sync_logbook_to_calendar(tasks, calendar_name='Things Logbook'):
-    """Sync logbook entries with preservation of title/note edits.
+def event_fields(event_dict, is_all_day):
+    """Convert an event dictionary into the plan fields of a new event."""
+    return {
+        'uuid': event_dict['uuid'],
+        'title': event_dict['title'],
+        'notes': event_dict['notes'] if event_dict['notes'] else None,
+        'start_date': event_dict['start_date'].timestamp(),
+        'end_date': event_dict['end_date'].timestamp(),
+        'url': event_dict['url'],
+        'is_all_day': is_all_day,
+    }
+
+def date_changes(event_dict):
+    """Plan fields that move an event to the dates of an event dictionary."""
+    return {
+        'start_date': event_dict['start_date'].timestamp(),
+        'end_date': event_dict['end_date'].timestamp(),
+    }
+
+def run_sync(calendar_name, plan_sync, start_date=None, end_date=None, dry_run=False, session=None):
+    """Plan a calendar sync against its existing events, then apply the plan.
     
     Args:
-        tasks: List of logbook task dictionaries
         calendar_name: Name of the calendar to sync to
+        plan_sync: Function mapping the existing events (by UUID) to a plan
+        start_date, end_date: NSDate range of existing events to consider
+        dry_run: Only log what would change
+        session: CalendarSession to reuse; a fresh one is opened if None
     """
-    store = CalCalendarStore.defaultCalendarStore()
-    calendars = store.calendars()
-    
-    calendar = next((c for c in calendars if c.title() == calendar_name), None)
+    session = session or CalendarSession()
+    store = session.store
+    calendar = session.calendar(calendar_name)
     if calendar is None:
         logger.error(f'Calendar "{calendar_name}" not found')
-        return
+        return None
     
-    # Get existing events - use wider range for logbook (4 years to cover 2022-2025)
-    start_date = NSDate.dateWithTimeIntervalSinceNow_(-60*60*24*365*1)  # 4 years ago
-    end_date = NSDate.dateWithTimeIntervalSinceNow_(60*60*24*365*1)  # 1 year ahead
-    existing_events = get_existing_events(calendar, start_date, end_date)
+    existing_events = session.events(
+        calendar_name, lambda: get_existing_events(calendar, start_date, end_date, store)
+    )
     logger.info(f"Found {len(existing_events)} existing events in {calendar_name}")
     
-    # Track which events we've processed
+    started = time.perf_counter()
+    plan = plan_sync(existing_events)
+    planning_seconds = time.perf_counter() - started
+    logger.info(f"{calendar_name} plan: {plan_summary(plan)} ({planning_seconds:.2f}s)")
+    
+    result = apply_plan(store, calendar, plan, existing_events, session.batch_size, session.batch_interval,
+                        dry_run=dry_run)
+    for error in result['errors']:
+        logger.error(f"{calendar_name}: batch {error['batch']} had {len(error['failures'])} of {error['operations']} operations fail: "
+                     + "; ".join(error['failures']))
+    if result['failed']:
+        # The cached index may be out of date; reload it next cycle
+        session.invalidate(calendar_name)
+    
+    prefix = "[dry run] " if dry_run else ""
+    logger.info(f"{prefix}{calendar_name}: Added {result['created']}, Updated {result['updated']}, Unchanged {result['unchanged']}, "
+                f"Removed {result['removed']}, Preserved {result['preserved']}, Failed {result['failed']} "
+                f"({result['batches']} batches, {result['seconds']:.2f}s calendar I/O)")
+    return result
+
+def plan_logbook_sync(tasks, existing_events, calendar_name='Things Logbook'):
+    """Plan a logbook sync that preserves title/note edits.
+    
+    Args:
+        tasks: List of logbook task dictionaries
+        existing_events: Existing calendar events by Things UUID
+        calendar_name: Name of the calendar to sync to
+    """
+    plan = empty_plan(calendar_name)
     processed_uuids = set()
-    events_added = 0
-    events_updated = 0
-    events_unchanged = 0
-    events_preserved = 0
     
     for task in tasks:
         try:
             # Convert task to event dictionary
-            event_dict = task_to_event_dict(task, calendar_name)
+            event_dict = task_to_event_dict(task, calendar_name, kind='logbook')
             if event_dict is None:
                 continue
             
             uuid = task['uuid']
             processed_uuids.add(uuid)
             
-            # Check if event exists
             if uuid in existing_events:
-                existing_event = existing_events[uuid]
-                
-                # Check if dates need updating
-                if logbook_events_need_update(existing_event, event_dict):
+                if logbook_events_need_update(existing_events[uuid], event_dict):
                     # Only update dates/times, preserve title and notes
-                    existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                    existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                    existing_event.setIsAllDay_(False)
-                    
-                    res, err = store.saveEvent_span_error_(existing_event, 0, None)
-                    if res:
-                        events_updated += 1
-                        logger.debug(f"Updated dates for logbook event: {existing_event.title()}")
-                    else:
-                        logger.error(f"Failed to update dates for {event_dict['title']}: {err.localizedDescription()}")
+                    changes = date_changes(event_dict)
+                    changes['is_all_day'] = False
+                    plan['updates'].append({'uuid': uuid, 'changes': changes})
                 else:
                     # Dates are correct, preserve everything
-                    events_preserved += 1
+                    plan['preserved'] += 1
             else:
-                # Create new event
-                event = CalEvent.event()
-                event.setCalendar_(calendar)
-                event.setTitle_(event_dict['title'])
-                event.setNotes_(event_dict['notes'] if event_dict['notes'] else None)
-                event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                event.setUrl_(NSURL.URLWithString_(event_dict['url']))
-                event.setIsAllDay_(event_dict.get('is_all_day', False))
-                
-                res, err = store.saveEvent_span_error_(event, 0, None)
-                if res:
-                    events_added += 1
-                else:
-                    logger.error(f"Failed to add event for {event_dict['title']}: {err.localizedDescription()}")
+                plan['creates'].append(event_fields(event_dict, event_dict.get('is_all_day', False)))
                     
         except Exception as e:
             logger.error(f"Error processing task {task.get('title', 'Unknown')}: {e}")
     
     # Remove events that no longer exist in Things
-    events_removed = 0
-    for uuid, event in existing_events.items():
-        if uuid not in processed_uuids:
-            res, err = store.removeEvent_span_error_(event, 0, None)
-            if res:
-                events_removed += 1
-            else:
-                logger.error(f"Failed to remove event: {err.localizedDescription()}")
+    plan['deletes'] = [uuid for uuid in existing_events if uuid not in processed_uuids]
+    return plan
+
+def sync_logbook_to_calendar(tasks, calendar_name='Things Logbook', dry_run=False, session=None, digest=None):
+    """Sync logbook entries with preservation of title/note edits.
     
-    logger.info(f"{calendar_name}: Added {events_added}, Updated {events_updated}, Preserved {events_preserved}, Removed {events_removed}")
+    Args:
+        tasks: List of logbook task dictionaries
+        calendar_name: Name of the calendar to sync to
+        dry_run: Only log what would change
+        session: CalendarSession to reuse between cycles
+        digest: None for one event per entry, 'day' or 'project' for one
+            digest event per day (or per day and project)
+    """
+    # Get existing events - use wider range for logbook (4 years to cover 2022-2025)
+    start_date = NSDate.dateWithTimeIntervalSinceNow_(-60*60*24*365*1)  # 4 years ago
+    end_date = NSDate.dateWithTimeIntervalSinceNow_(60*60*24*365*1)  # 1 year ahead
+    
+    if digest:
+        # Only digest days inside the event range, so they are found again next run
+        first_day = (datetime.date.today() - datetime.timedelta(days=364)).isoformat()
+        recent_tasks = [task for task in tasks if (task.get('stop_date') or '') >= first_day]
+        plan_sync = lambda existing_events: plan_digest_sync(calendar_name, recent_tasks, existing_events, digest)
+    else:
+        plan_sync = lambda existing_events: plan_logbook_sync(tasks, existing_events, calendar_name)
+    
+    return run_sync(calendar_name, plan_sync, start_date, end_date, dry_run, session)
 
 def deadlines_events_need_update(existing_event, new_event_dict):
     """Check if a deadline event needs updating.
@@ -364,134 +449,92 @@ def deadlines_events_need_update(existing_event, new_event_dict):
     
     return False
 
-def sync_deadlines_to_calendar(tasks, calendar_name='Things Deadlines'):
-    """Sync deadline tasks with preservation of title/note edits.
+def plan_deadlines_sync(tasks, existing_events, calendar_name='Things Deadlines'):
+    """Plan a deadline sync that preserves title/note edits.
     
     Args:
         tasks: List of deadline task dictionaries
+        existing_events: Existing calendar events by Things UUID
         calendar_name: Name of the calendar to sync to
     """
-    store = CalCalendarStore.defaultCalendarStore()
-    calendars = store.calendars()
-    
-    calendar = next((c for c in calendars if c.title() == calendar_name), None)
-    if calendar is None:
-        logger.error(f'Calendar "{calendar_name}" not found')
-        return
-    
-    # Get existing events
-    existing_events = get_existing_events(calendar)
-    logger.info(f"Found {len(existing_events)} existing events in {calendar_name}")
-    
-    # Track which events we've processed
+    plan = empty_plan(calendar_name)
     processed_uuids = set()
-    events_added = 0
-    events_updated = 0
-    events_preserved = 0
     
     for task in tasks:
         try:
             # Convert task to event dictionary
-            event_dict = task_to_event_dict(task, calendar_name)
+            event_dict = task_to_event_dict(task, calendar_name, kind='deadlines')
             if event_dict is None:
                 continue
             
             uuid = task['uuid']
             processed_uuids.add(uuid)
             
-            # Check if event exists
             if uuid in existing_events:
-                existing_event = existing_events[uuid]
-                
-                # Check if dates need updating
-                if deadlines_events_need_update(existing_event, event_dict):
+                if deadlines_events_need_update(existing_events[uuid], event_dict):
                     # Only update dates, preserve title and notes
-                    existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                    existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                    
-                    res, err = store.saveEvent_span_error_(existing_event, 0, None)
-                    if res:
-                        events_updated += 1
-                        logger.debug(f"Updated dates for deadline event: {existing_event.title()}")
-                    else:
-                        logger.error(f"Failed to update dates for {event_dict['title']}: {err.localizedDescription()}")
+                    plan['updates'].append({'uuid': uuid, 'changes': date_changes(event_dict)})
                 else:
                     # Dates are correct, preserve everything
-                    events_preserved += 1
+                    plan['preserved'] += 1
             else:
-                # Create new event for deadline
-                event = CalEvent.event()
-                event.setCalendar_(calendar)
-                event.setTitle_(event_dict['title'])
-                event.setNotes_(event_dict['notes'] if event_dict['notes'] else None)
-                event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                event.setUrl_(NSURL.URLWithString_(event_dict['url']))
-                event.setIsAllDay_(True)
-                
-                res, err = store.saveEvent_span_error_(event, 0, None)
-                if res:
-                    events_added += 1
-                else:
-                    logger.error(f"Failed to add event for {event_dict['title']}: {err.localizedDescription()}")
+                # Deadlines are all-day events
+                plan['creates'].append(event_fields(event_dict, True))
                     
         except Exception as e:
             logger.error(f"Error processing task {task.get('title', 'Unknown')}: {e}")
     
     # Remove events that no longer exist in Things
-    events_removed = 0
-    for uuid, event in existing_events.items():
-        if uuid not in processed_uuids:
-            res, err = store.removeEvent_span_error_(event, 0, None)
-            if res:
-                events_removed += 1
-            else:
-                logger.error(f"Failed to remove event: {err.localizedDescription()}")
+    plan['deletes'] = [uuid for uuid in existing_events if uuid not in processed_uuids]
+    return plan
+
+def sync_deadlines_to_calendar(tasks, calendar_name='Things Deadlines', dry_run=False, session=None):
+    """Sync deadline tasks with preservation of title/note edits.
     
-    logger.info(f"{calendar_name}: Added {events_added}, Updated {events_updated}, Preserved {events_preserved}, Removed {events_removed}")
+    Args:
+        tasks: List of deadline task dictionaries
+        calendar_name: Name of the calendar to sync to
+        dry_run: Only log what would change
+        session: CalendarSession to reuse between cycles
+    """
+    return run_sync(
+        calendar_name,
+        lambda existing_events: plan_deadlines_sync(tasks, existing_events, calendar_name),
+        dry_run=dry_run,
+        session=session,
+    )
 
-def sync_to_calendar(tasks, calendar_name, today_task_uuids=None):
-    """Intelligently sync tasks to calendar, only updating what's changed.
+def plan_calendar_sync(tasks, existing_events, calendar_name, today_task_uuids=None, kind=None):
+    """Plan a sync that only touches what changed.
     
     Args:
         tasks: List of task dictionaries
+        existing_events: Existing calendar events by Things UUID
         calendar_name: Name of the calendar to sync to
         today_task_uuids: Set of UUIDs for tasks that came from things.today()
+        kind: Event layout, see task_to_event_dict()
     """
     if today_task_uuids is None:
         today_task_uuids = set()
     
-    store = CalCalendarStore.defaultCalendarStore()
-    calendars = store.calendars()
-    
-    calendar = next((c for c in calendars if c.title() == calendar_name), None)
-    if calendar is None:
-        logger.error(f'Calendar "{calendar_name}" not found')
-        return
-    
-    # Get existing events
-    existing_events = get_existing_events(calendar)
-    logger.info(f"Found {len(existing_events)} existing events in {calendar_name}")
-    
-    # Track which events we've processed
+    plan = empty_plan(calendar_name)
     processed_uuids = set()
-    events_added = 0
-    events_updated = 0
-    events_unchanged = 0
-    events_preserved = 0
+    today = datetime.date.today()
+    carried_over = []
     
     for task in tasks:
         try:
             # Convert task to event dictionary
             is_from_today = task['uuid'] in today_task_uuids
-            event_dict = task_to_event_dict(task, calendar_name, is_from_today)
+            if is_from_today and is_carried_over(task, today):
+                carried_over.append(task)
+            event_dict = task_to_event_dict(task, calendar_name, is_from_today, kind)
             if event_dict is None:
                 continue
             
             uuid = task['uuid']
             processed_uuids.add(uuid)
             
-            # Check if event exists
             if uuid in existing_events:
                 existing_event = existing_events[uuid]
                 
@@ -501,109 +544,154 @@ def sync_to_calendar(tasks, calendar_name, today_task_uuids=None):
                     if should_update_dates(existing_event, event_dict):
                         # Only update dates if they've been moved to different day
                         logger.debug(f"Updating dates for manually edited event: {existing_event.title()}")
-                        existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                        existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                        
-                        res, err = store.saveEvent_span_error_(existing_event, 0, None)
-                        if res:
-                            events_updated += 1
-                        else:
-                            logger.error(f"Failed to update dates for {event_dict['title']}: {err.localizedDescription()}")
+                        plan['updates'].append({'uuid': uuid, 'changes': date_changes(event_dict)})
                     else:
                         # Preserve the manually edited event as-is
-                        events_preserved += 1
+                        plan['preserved'] += 1
                         logger.debug(f"Preserving manually edited event: {existing_event.title()}")
                 elif events_are_different(existing_event, event_dict):
                     # Update the event normally
-                    existing_event.setTitle_(event_dict['title'])
-                    existing_event.setNotes_(event_dict['notes'] if event_dict['notes'] else None)
-                    existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                    existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                    
-                    res, err = store.saveEvent_span_error_(existing_event, 0, None)
-                    if res:
-                        events_updated += 1
-                    else:
-                        logger.error(f"Failed to update event for {event_dict['title']}: {err.localizedDescription()}")
+                    changes = date_changes(event_dict)
+                    changes['title'] = event_dict['title']
+                    changes['notes'] = event_dict['notes'] if event_dict['notes'] else None
+                    plan['updates'].append({'uuid': uuid, 'changes': changes})
                 else:
-                    events_unchanged += 1
+                    plan['unchanged'] += 1
             else:
-                # Create new event
-                event = CalEvent.event()
-                event.setCalendar_(calendar)
-                event.setTitle_(event_dict['title'])
-                event.setNotes_(event_dict['notes'] if event_dict['notes'] else None)
-                event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['start_date'].timestamp()))
-                event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(event_dict['end_date'].timestamp()))
-                event.setUrl_(NSURL.URLWithString_(event_dict['url']))
-                event.setIsAllDay_(event_dict.get('is_all_day', True))
-                
-                res, err = store.saveEvent_span_error_(event, 0, None)
-                if res:
-                    events_added += 1
-                else:
-                    logger.error(f"Failed to add event for {event_dict['title']}: {err.localizedDescription()}")
+                plan['creates'].append(event_fields(event_dict, event_dict.get('is_all_day', True)))
                     
         except Exception as e:
             logger.error(f"Error processing task {task.get('title', 'Unknown')}: {e}")
     
+    # One digest event on today lists everything carried over from earlier days
+    digest_key = plan_carried_over(plan, carried_over, existing_events, today)
+    if digest_key:
+        processed_uuids.add(digest_key)
+    
     # Remove events that no longer exist in Things
-    events_removed = 0
-    for uuid, event in existing_events.items():
-        if uuid not in processed_uuids:
-            res, err = store.removeEvent_span_error_(event, 0, None)
-            if res:
-                events_removed += 1
-            else:
-                logger.error(f"Failed to remove event: {err.localizedDescription()}")
+    plan['deletes'] = [uuid for uuid in existing_events if uuid not in processed_uuids]
+    return plan
+
+def sync_to_calendar(tasks, calendar_name, today_task_uuids=None, dry_run=False, session=None, kind=None):
+    """Intelligently sync tasks to calendar, only updating what's changed.
     
-    logger.info(f"{calendar_name}: Added {events_added}, Updated {events_updated}, Unchanged {events_unchanged}, Removed {events_removed}, Preserved (manually edited): {events_preserved}")
+    Args:
+        tasks: List of task dictionaries
+        calendar_name: Name of the calendar to sync to
+        today_task_uuids: Set of UUIDs for tasks that came from things.today()
+        dry_run: Only log what would change
+        session: CalendarSession to reuse between cycles
+        kind: Event layout, see task_to_event_dict()
+    """
+    return run_sync(
+        calendar_name,
+        lambda existing_events: plan_calendar_sync(tasks, existing_events, calendar_name, today_task_uuids, kind),
+        dry_run=dry_run,
+        session=session,
+    )
+
+def get_upcoming_tasks(calendar_tasks=None):
+    """Return upcoming and today's tasks without duplicates, and the UUIDs from today.
+    
+    calendar_tasks is the result of thingsdb.fetch_calendar_tasks(); it is
+    fetched here if not given.
+    """
+    if calendar_tasks is None:
+        logger.info("Getting today's and upcoming tasks...")
+        calendar_tasks = fetch_calendar_tasks()
+    
+    # Each task appears once, tagged with the views it is in
+    upcoming = view_tasks(calendar_tasks, 'upcoming')
+    today_tasks = view_tasks(calendar_tasks, 'today')
+    today_task_uuids = {task['uuid'] for task in today_tasks}
+    
+    return upcoming + today_tasks, today_task_uuids
+
+def sync_routes(routes, dry_run=False, session=None, logbook_digest=None):
+    """Sync tasks to every routed calendar from one fetch and one event scan.
+    
+    Args:
+        routes: Compiled routes, see calendar_routing.load_routes()
+        dry_run: Only log what would change
+        session: CalendarSession to reuse between cycles
+        logbook_digest: Digest mode for calendars fed from the logbook
+    """
+    session = session or CalendarSession()
+    sources = route_sources(routes)
+    
+    # Each source is read from Things once, however many calendars it feeds;
+    # Today, Upcoming and Deadlines share a single query
+    tasks_by_source = {}
+    today_task_uuids = set()
+    if sources & {'upcoming', 'deadlines'}:
+        logger.info("Getting today's, upcoming and deadline tasks...")
+        calendar_tasks = fetch_calendar_tasks()
+        if 'upcoming' in sources:
+            tasks_by_source['upcoming'], today_task_uuids = get_upcoming_tasks(calendar_tasks)
+        if 'deadlines' in sources:
+            tasks_by_source['deadlines'] = view_tasks(calendar_tasks, 'deadlines')
+    if 'logbook' in sources:
+        logger.info("Getting logbook...")
+        tasks_by_source['logbook'] = get_logbook(project_area=True)
+    
+    routed = route_tasks(routes, tasks_by_source)
+    
+    # Read the events of all stale calendars in a single query
+    calendars = {}
+    for calendar_name in routed:
+        calendar = session.calendar(calendar_name)
+        if calendar is None:
+            logger.error(f'Calendar "{calendar_name}" not found')
+        else:
+            calendars[calendar_name] = calendar
+    # Overdue Today tasks keep their scheduled day, which may predate the default range
+    start_date = None
+    start_dates = [task['start_date'] for task in tasks_by_source.get('upcoming', []) if task.get('start_date')]
+    if start_dates:
+        earliest = parse(min(start_dates)).timestamp()
+        if earliest < time.time() - 60*60*24*365:
+            start_date = NSDate.dateWithTimeIntervalSince1970_(earliest)
+    session.preload(
+        list(calendars),
+        lambda names: get_events_by_calendar([calendars[name] for name in names], start_date, store=session.store),
+    )
+    
+    for calendar_name, route in routed.items():
+        if calendar_name not in calendars:
+            continue
+        tasks = route['tasks']
+        logger.info(f"Syncing {len(tasks)} {route['source']} tasks to {calendar_name}...")
+        if route['source'] == 'upcoming':
+            sync_to_calendar(tasks, calendar_name, today_task_uuids, dry_run=dry_run, session=session, kind='upcoming')
+        elif route['source'] == 'logbook':
+            sync_logbook_to_calendar(tasks, calendar_name, dry_run=dry_run, session=session, digest=logbook_digest)
+        else:
+            sync_deadlines_to_calendar(tasks, calendar_name, dry_run=dry_run, session=session)
 
-def main_task():
-    """Main synchronization task."""
+def main_task(dry_run=False, session=None, logbook_digest=None, routes=None):
+    """Main synchronization task.
+    
+    Tasks go to the three Things calendars unless other routes are given.
+    """
     try:
-        # Sync upcoming tasks (includes scheduled tasks)
-        logger.info("Syncing upcoming tasks...")
-        upcoming = things.upcoming()
-        
-        # Also get today's tasks and merge them with upcoming
-        logger.info("Getting today's tasks...")
-        today_tasks = things.today()
-        
-        # Track which tasks came from today()
-        today_task_uuids = {task['uuid'] for task in today_tasks}
-        
-        # Combine both lists, removing duplicates by UUID
-        all_tasks = {task['uuid']: task for task in upcoming}
-        for task in today_tasks:
-            if task['uuid'] not in all_tasks:
-                all_tasks[task['uuid']] = task
-        
-        # Sync combined tasks to the single calendar
-        combined_tasks = list(all_tasks.values())
-        logger.info(f"Syncing {len(combined_tasks)} total tasks (upcoming + today)...")
-        sync_to_calendar(combined_tasks, 'Things Upcoming', today_task_uuids)
-        
-        # Sync logbook - completed/cancelled tasks with timestamps preserved
-        logger.info("Syncing logbook...")
-        logbook = things.logbook()
-        sync_logbook_to_calendar(logbook, 'Things Logbook')
-        
-        # Sync deadlines - tasks with deadlines
-        logger.info("Syncing deadlines...")
-        deadline_tasks = things.deadlines()
-        sync_deadlines_to_calendar(deadline_tasks, 'Things Deadlines')
-        
+        sync_routes(routes or load_routes(), dry_run=dry_run, session=session, logbook_digest=logbook_digest)
     except Exception as e:
         logger.error(f"Error in main task: {e}")
 
-def execute_main_task_every_interval(interval):
-    """Execute the main task at regular intervals."""
+def execute_main_task_every_interval(interval, refresh_interval=DEFAULT_REFRESH_INTERVAL, logbook_digest=None, routes=None,
+                                     batch_size=DEFAULT_BATCH_SIZE, batch_interval=DEFAULT_BATCH_INTERVAL):
+    """Execute the main task at regular intervals.
+    
+    The calendar store, calendars and event indexes are kept between runs;
+    events are re-read from the calendar every refresh_interval seconds.
+    Calendar writes are made batch_size at a time, batch_interval seconds apart.
+    """
     logger.info(f"Starting Things to Calendar sync, running every {interval} seconds")
+    session = CalendarSession(refresh_interval, batch_size, batch_interval)
     
     while True:
         try:
-            main_task()
+            main_task(session=session, logbook_digest=logbook_digest, routes=routes)
             logger.info(f"Sync completed. Next sync in {interval} seconds")
         except KeyboardInterrupt:
             logger.info("Sync stopped by user")
@@ -614,5 +702,34 @@ def execute_main_task_every_interval(interval):
         time.sleep(interval)
 
 if __name__ == "__main__":
-    # Run every 60 seconds (adjust as needed)
-    execute_main_task_every_interval(60)
+    parser = argparse.ArgumentParser(description="Sync Things 3 to the Calendar app.")
+    parser.add_argument("--interval", type=int, default=60, help="seconds between syncs (default: %(default)s)")
+    parser.add_argument("--refresh-interval", type=int, default=DEFAULT_REFRESH_INTERVAL,
+                        help="seconds between full re-reads of calendar events (default: %(default)s)")
+    parser.add_argument("--logbook-digest", choices=DIGEST_MODES,
+                        help="write one logbook event per day (or per day and project) instead of one per entry")
+    parser.add_argument("--routes", metavar="FILE",
+                        help="JSON file routing tasks to calendars by area, project or tag (see calendar_routing.py)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, metavar="N",
+                        help="calendar writes made back to back (default: %(default)s)")
+    parser.add_argument("--batch-interval", type=float, default=DEFAULT_BATCH_INTERVAL, metavar="SECONDS",
+                        help="pause between batches of calendar writes (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="run once and only log the planned changes")
+    args = parser.parse_args()
+    
+    try:
+        check_batching(args.batch_size, args.batch_interval)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    try:
+        routes = load_routes(args.routes)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid routes file: {e}")
+    
+    if args.dry_run:
+        main_task(dry_run=True, logbook_digest=args.logbook_digest, routes=routes)
+    else:
+        # Run every 60 seconds (adjust as needed)
+        execute_main_task_every_interval(args.interval, args.refresh_interval, args.logbook_digest, routes,
+                                         args.batch_size, args.batch_interval)
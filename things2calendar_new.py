@@ -1,69 +1,46 @@
 #!/usr/bin/env python3
 """
 Sync Things 3 tasks to Calendar app with intelligent update handling.
-- Today & Upcoming: Combined in "Things Upcoming" calendar
+- Today & Upcoming: Combined in "Things Upcoming" calendar, with overdue
+  Today items listed in one "carried over" event on today
 - Logbook: "Things Logbook" calendar with date/time preservation
 - Deadlines: "Things Deadlines" calendar as all-day events
 """
 
-from Foundation import NSDate, NSURL
+from Foundation import NSDate
 from dateutil.parser import parse
-from CalendarStore import CalCalendarStore, CalEvent
+from CalendarStore import CalCalendarStore
+import argparse
 import datetime
-import things
 import time
 
+from calendar_sync import (
+    DEFAULT_BATCH_INTERVAL,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_REFRESH_INTERVAL,
+    DIGEST_MODES,
+    CalendarSession,
+    apply_plan,
+    check_batching,
+    empty_plan,
+    is_carried_over,
+    plan_carried_over,
+    plan_digest_sync,
+    plan_summary,
+)
+from thingsdb import fetch_calendar_tasks, get_logbook, probe_views, view_tasks
 
-def get_today_tasks(**kwargs):
-    """Return Today items with safe sorting when start dates are missing."""
 
-    def _sort_key(task):
-        today_index = task.get("today_index")
-        try:
-            today_index = int(today_index)
-        except (TypeError, ValueError):
-            today_index = float("inf")
-
-        start_date = task.get("start_date") or ""
-        return (today_index, start_date)
-
-    regular_today_tasks = things.tasks(
-        start_date="past",
-        start="Anytime",
-        index="todayIndex",
-        **kwargs,
-    )
-
-    unconfirmed_scheduled_tasks = things.tasks(
-        start_date="past",
-        start="Someday",
-        index="todayIndex",
-        **kwargs,
-    )
-
-    unconfirmed_overdue_tasks = things.tasks(
-        start_date=False,
-        deadline="past",
-        deadline_suppressed=False,
-        **kwargs,
-    )
+def get_today_tasks(calendar_tasks=None):
+    """Return Today items, in Today order, from one combined fetch."""
+    if calendar_tasks is None:
+        calendar_tasks = fetch_calendar_tasks()
+    return view_tasks(calendar_tasks, "today")
 
-    result = [
-        *regular_today_tasks,
-        *unconfirmed_scheduled_tasks,
-        *unconfirmed_overdue_tasks,
-    ]
 
-    result.sort(key=_sort_key)
-    return result
-
-
-def get_calendar(calendar_name):
+def get_calendar(calendar_name, session):
     """Get existing calendar."""
-    store = CalCalendarStore.defaultCalendarStore()
-    calendars = store.calendars()
-    
-    calendar = next((c for c in calendars if c.title() == calendar_name), None)
+    calendar = session.calendar(calendar_name)
     if calendar is None:
         print(f'Calendar "{calendar_name}" not found. Please create it manually in the Calendar app.')
         return None
@@ -71,9 +48,9 @@ def get_calendar(calendar_name):
     return calendar
 
 
-def get_existing_events(calendar, start_date, end_date):
+def get_existing_events(calendar, start_date, end_date, store=None):
     """Get all existing events in a date range, indexed by UUID."""
-    store = CalCalendarStore.defaultCalendarStore()
+    store = store or CalCalendarStore.defaultCalendarStore()
     
     start = NSDate.dateWithTimeIntervalSince1970_(start_date.timestamp())
     end = NSDate.dateWithTimeIntervalSince1970_(end_date.timestamp())
@@ -93,13 +70,12 @@ def get_existing_events(calendar, start_date, end_date):
     return events_by_uuid
 
 
-def update_event_if_changed(existing_event, task, event_type="upcoming"):
+def event_changes(existing_event, task, event_type="upcoming"):
     """
-    Update an existing event only if needed.
-    Returns True if updated, False if no changes needed.
+    Work out which fields of an existing event need updating.
+    Returns a dict of plan fields, empty if no changes are needed.
     """
-    store = CalCalendarStore.defaultCalendarStore()
-    needs_update = False
+    changes = {}
     
     # For logbook events, check if basic properties match
     if event_type == "logbook":
@@ -111,20 +87,19 @@ def update_event_if_changed(existing_event, task, event_type="upcoming"):
             
             # Only update if date/time is different
             if abs((existing_start - stop_date).total_seconds()) > 60:  # More than 1 minute difference
-                existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(stop_date.timestamp()))
-                end_date = stop_date + datetime.timedelta(minutes=30)
-                existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(end_date.timestamp()))
-                needs_update = True
+                changes['start_date'] = stop_date.timestamp()
+                changes['end_date'] = (stop_date + datetime.timedelta(minutes=30)).timestamp()
     
     elif event_type == "upcoming":
         # For upcoming/today, check if the date needs updating
         today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # Determine what the date should be
-        if task.get('_is_today'):  # We'll mark today tasks
-            target_date = today
-        elif task.get('start_date'):
+        # Determine what the date should be; overdue today tasks keep their
+        # scheduled day and are listed in the carried-over digest
+        if task.get('start_date'):
             target_date = parse(task['start_date']).replace(hour=0, minute=0, second=0, microsecond=0)
+        elif task.get('_is_today'):  # We'll mark today tasks
+            target_date = today
         else:
             target_date = today + datetime.timedelta(days=1)
         
@@ -141,15 +116,14 @@ def update_event_if_changed(existing_event, task, event_type="upcoming"):
                 # Combine target date with existing start time
                 new_start = datetime.datetime.combine(target_date.date(), existing_start_date.time())
                 new_end = new_start + duration
-                existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(new_start.timestamp()))
-                existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(new_end.timestamp()))
-                existing_event.setIsAllDay_(False)
+                changes['start_date'] = new_start.timestamp()
+                changes['end_date'] = new_end.timestamp()
+                changes['is_all_day'] = False
             else:
                 # Was all-day, keep it all-day
-                existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(target_date.timestamp()))
-                existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(target_date.timestamp()))
-                existing_event.setIsAllDay_(True)
-            needs_update = True
+                changes['start_date'] = target_date.timestamp()
+                changes['end_date'] = target_date.timestamp()
+                changes['is_all_day'] = True
         elif not existing_event.isAllDay():
             # Same day but user has edited to non-all-day - preserve their edit
             # No update needed for the time
@@ -160,8 +134,7 @@ def update_event_if_changed(existing_event, task, event_type="upcoming"):
         if existing_title != task['title']:
             # Check if it's a user edit or just outdated
             if not existing_title or existing_title == task.get('_old_title', ''):
-                existing_event.setTitle_(task['title'])
-                needs_update = True
+                changes['title'] = task['title']
     
     elif event_type == "deadline":
         # For deadlines, ensure date matches
@@ -170,35 +143,25 @@ def update_event_if_changed(existing_event, task, event_type="upcoming"):
             existing_date = datetime.datetime.fromtimestamp(existing_event.startDate().timeIntervalSince1970())
             
             if existing_date.date() != deadline_date.date():
-                existing_event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(deadline_date.timestamp()))
-                existing_event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(deadline_date.timestamp()))
-                existing_event.setIsAllDay_(True)
-                needs_update = True
-    
-    if needs_update:
-        res, err = store.saveEvent_span_error_(existing_event, 0, None)
-        if not res:
-            print(f"    Error updating event: {err.localizedDescription() if err else 'Unknown error'}")
-            return False
+                changes['start_date'] = deadline_date.timestamp()
+                changes['end_date'] = deadline_date.timestamp()
+                changes['is_all_day'] = True
     
-    return needs_update
+    return changes
 
 
-def create_new_event(task, calendar, event_type="upcoming"):
-    """Create a new calendar event for a task."""
-    store = CalCalendarStore.defaultCalendarStore()
-    event = CalEvent.event()
-    event.setCalendar_(calendar)
+def new_event_fields(task, event_type="upcoming"):
+    """Return the plan fields of a new calendar event for a task, or None."""
+    fields = {'uuid': task['uuid']}
     
     if event_type == "logbook":
         if not task.get('stop_date'):
-            return False
+            return None
         
         stop_date = parse(task['stop_date'])
-        event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(stop_date.timestamp()))
-        end_date = stop_date + datetime.timedelta(minutes=30)
-        event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(end_date.timestamp()))
-        event.setIsAllDay_(False)
+        fields['start_date'] = stop_date.timestamp()
+        fields['end_date'] = (stop_date + datetime.timedelta(minutes=30)).timestamp()
+        fields['is_all_day'] = False
         
         # Set title with status indicator
         status_prefix = ""
@@ -207,7 +170,7 @@ def create_new_event(task, calendar, event_type="upcoming"):
         elif task['status'] == 'canceled':
             status_prefix = "✗ "
         
-        event.setTitle_(f"{status_prefix}{task['title']}")
+        fields['title'] = f"{status_prefix}{task['title']}"
         
         # Build notes
         notes_parts = []
@@ -218,33 +181,34 @@ def create_new_event(task, calendar, event_type="upcoming"):
         elif task.get('area_title'):
             notes_parts.append(f"Area: {task['area_title']}")
         
-        event.setNotes_('\n'.join(notes_parts) if notes_parts else '')
+        fields['notes'] = '\n'.join(notes_parts) if notes_parts else ''
         
     elif event_type == "upcoming":
         today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        if task.get('_is_today'):
-            start_date = today
-        elif task.get('start_date'):
+        if task.get('start_date'):
             start_date = parse(task['start_date'])
+        elif task.get('_is_today'):
+            # Only listed in the carried-over digest
+            return None
         else:
             start_date = today + datetime.timedelta(days=1)
         
-        event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(start_date.timestamp()))
-        event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(start_date.timestamp()))
-        event.setIsAllDay_(True)
-        event.setTitle_(task['title'])
-        event.setNotes_(task.get('notes', '') or '')
+        fields['start_date'] = start_date.timestamp()
+        fields['end_date'] = start_date.timestamp()
+        fields['is_all_day'] = True
+        fields['title'] = task['title']
+        fields['notes'] = task.get('notes', '') or ''
         
     elif event_type == "deadline":
         if not task.get('deadline'):
-            return False
+            return None
         
         deadline_date = parse(task['deadline'])
-        event.setStartDate_(NSDate.dateWithTimeIntervalSince1970_(deadline_date.timestamp()))
-        event.setEndDate_(NSDate.dateWithTimeIntervalSince1970_(deadline_date.timestamp()))
-        event.setIsAllDay_(True)
-        event.setTitle_(f"⚑ {task['title']}")
+        fields['start_date'] = deadline_date.timestamp()
+        fields['end_date'] = deadline_date.timestamp()
+        fields['is_all_day'] = True
+        fields['title'] = f"⚑ {task['title']}"
         
         # Build notes
         notes_parts = []
@@ -255,32 +219,94 @@ def create_new_event(task, calendar, event_type="upcoming"):
         elif task.get('area_title'):
             notes_parts.append(f"Area: {task['area_title']}")
         
-        event.setNotes_('\n'.join(notes_parts) if notes_parts else '')
+        fields['notes'] = '\n'.join(notes_parts) if notes_parts else ''
     
     # Set URL for all event types
-    url = f"things:///show?id={task['uuid']}"
-    event.setUrl_(NSURL.URLWithString_(url))
+    fields['url'] = f"things:///show?id={task['uuid']}"
+    return fields
+
+
+def plan_sync(calendar_name, tasks, existing_events, event_type):
+    """Compute the creates, updates and removals that bring a calendar in line with tasks."""
+    plan = empty_plan(calendar_name)
+    processed_uuids = set()
+    today = datetime.date.today()
+    carried_over = []
+    
+    for task in tasks:
+        if event_type == "upcoming" and task.get('_is_today') and is_carried_over(task, today):
+            carried_over.append(task)
+            if not task.get('start_date'):
+                # Without a start date the digest is the task's only event
+                continue
+        processed_uuids.add(task['uuid'])
+        
+        if task['uuid'] in existing_events:
+            # Update existing event if needed
+            changes = event_changes(existing_events[task['uuid']], task, event_type)
+            if changes:
+                plan['updates'].append({'uuid': task['uuid'], 'changes': changes})
+            else:
+                plan['unchanged'] += 1
+        else:
+            # Create new event
+            fields = new_event_fields(task, event_type)
+            if fields:
+                plan['creates'].append(fields)
     
-    # Save the event
-    res, err = store.saveEvent_span_error_(event, 0, None)
-    if not res:
-        print(f"    Error creating event for {task['title']}: {err.localizedDescription() if err else 'Unknown error'}")
-        return False
+    # One event on today lists the today tasks carried over from earlier days
+    digest_key = plan_carried_over(plan, carried_over, existing_events, today)
+    if digest_key:
+        processed_uuids.add(digest_key)
     
-    return True
+    # Remove events no longer in Things
+    plan['deletes'] = [uuid for uuid in existing_events if uuid not in processed_uuids]
+    return plan
+
+
+def load_existing_events(session, calendar, start_date, end_date):
+    """Get a calendar's events by UUID, reusing the session's index between refreshes."""
+    return session.events(
+        calendar.title(), lambda: get_existing_events(calendar, start_date, end_date, session.store)
+    )
 
 
-def sync_upcoming_and_today(calendar_name="Things Upcoming"):
-    """Sync today and upcoming tasks to calendar."""
-    store = CalCalendarStore.defaultCalendarStore()
-    calendar = get_calendar(calendar_name)
+def apply_sync_plan(session, calendar, plan, existing_events, planning_seconds, dry_run=False):
+    """Apply a plan and print what happened."""
+    print(f"  Plan: {plan_summary(plan)} ({planning_seconds:.2f}s)")
+    
+    result = apply_plan(session.store, calendar, plan, existing_events, session.batch_size, session.batch_interval,
+                        dry_run=dry_run)
+    for error in result['errors']:
+        print(f"    Batch {error['batch']}: {len(error['failures'])} of {error['operations']} operations failed")
+        for failure in error['failures']:
+            print(f"      {failure}")
+    if result['failed']:
+        # The cached index may be out of date; reload it next cycle
+        session.invalidate(plan['calendar'])
+    
+    prefix = "[dry run] " if dry_run else ""
+    print(f"    {prefix}Created: {result['created']}, Updated: {result['updated']}, Removed: {result['removed']}, "
+          f"Unchanged: {result['unchanged']}, Failed: {result['failed']} ({result['seconds']:.2f}s calendar I/O)")
+    return result
+
+
+def sync_upcoming_and_today(calendar_name="Things Upcoming", dry_run=False, session=None, calendar_tasks=None):
+    """Sync today and upcoming tasks to calendar.
+    
+    calendar_tasks is the result of thingsdb.fetch_calendar_tasks(), shared
+    with the deadline sync; it is fetched here if not given.
+    """
+    session = session or CalendarSession()
+    calendar = get_calendar(calendar_name, session)
     if not calendar:
         return
     
-    print(f"  Getting tasks from Things...")
-    # Get all tasks
-    today_tasks = get_today_tasks()
-    upcoming_tasks = things.upcoming()
+    if calendar_tasks is None:
+        print(f"  Getting tasks from Things...")
+        calendar_tasks = fetch_calendar_tasks()
+    today_tasks = view_tasks(calendar_tasks, "today")
+    upcoming_tasks = view_tasks(calendar_tasks, "upcoming")
     
     # Combine tasks, keeping track of which are from today
     all_tasks = []
@@ -304,59 +330,47 @@ def sync_upcoming_and_today(calendar_name="Things Upcoming"):
     today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     past_date = today - datetime.timedelta(days=3)  # -1 year
     future_date = today + datetime.timedelta(days=365)  # +4 years
-    existing_events = get_existing_events(calendar, past_date, future_date)
-    
-    processed_uuids = set()
-    created_count = 0
-    updated_count = 0
-    
-    for task in all_tasks:
-        processed_uuids.add(task['uuid'])
-        
-        if task['uuid'] in existing_events:
-            # Update existing event if needed
-            if update_event_if_changed(existing_events[task['uuid']], task, "upcoming"):
-                updated_count += 1
-        else:
-            # Create new event
-            if create_new_event(task, calendar, "upcoming"):
-                created_count += 1
-    
-    # Remove events no longer in Things
-    removed_count = 0
-    for uuid, event in existing_events.items():
-        if uuid not in processed_uuids:
-            store.removeEvent_span_error_(event, 0, None)
-            removed_count += 1
-    
-    print(f"    Created: {created_count}, Updated: {updated_count}, Removed: {removed_count}")
+    # Overdue today tasks stay on their scheduled day, so look back far enough to find them
+    start_dates = [task['start_date'] for task in all_tasks if task.get('start_date')]
+    if start_dates:
+        past_date = min(past_date, parse(min(start_dates)))
+    existing_events = load_existing_events(session, calendar, past_date, future_date)
+    
+    started = time.perf_counter()
+    plan = plan_sync(calendar_name, all_tasks, existing_events, "upcoming")
+    return apply_sync_plan(session, calendar, plan, existing_events, time.perf_counter() - started, dry_run)
 
 
-def sync_logbook(calendar_name="Things Logbook"):
-    """Sync logbook tasks to calendar with date/time preservation."""
-    store = CalCalendarStore.defaultCalendarStore()
-    calendar = get_calendar(calendar_name)
+def sync_logbook(calendar_name="Things Logbook", dry_run=False, session=None, digest=None):
+    """
+    Sync logbook tasks to calendar with date/time preservation.
+    
+    With digest='day' (or 'project') each day (or day and project) gets a
+    single all-day event listing its completions instead of one event per task.
+    """
+    session = session or CalendarSession()
+    calendar = get_calendar(calendar_name, session)
     if not calendar:
         return
     
-    print(f"  Getting logbook from Things...")
-    logbook_tasks = things.logbook()
-    
     # Process entries from -4 to +1 years
     now = datetime.datetime.now()
     cutoff_date = now - datetime.timedelta(days=30)  # -4 years
     future_cutoff = now + datetime.timedelta(days=1)  # +1 year
     
-    # Get existing events
-    existing_events = get_existing_events(calendar, cutoff_date, future_cutoff)
+    # The query compares UTC dates, so read one extra day and filter below
+    print(f"  Getting logbook from Things...")
+    since = (cutoff_date - datetime.timedelta(days=1)).date().isoformat()
+    logbook_tasks = get_logbook(project_area=True, since=since)
     
-    processed_uuids = set()
-    created_count = 0
-    updated_count = 0
-    skipped_count = 0
+    # Get existing events (digests sit at midnight, so start the range on the cutoff day)
+    events_start = cutoff_date.replace(hour=0, minute=0, second=0, microsecond=0) if digest else cutoff_date
+    existing_events = load_existing_events(session, calendar, events_start, future_cutoff)
     
     print(f"  Processing {len(logbook_tasks)} logbook entries...")
     
+    started = time.perf_counter()
+    tasks_in_range = []
     for task in logbook_tasks:
         if not task.get('stop_date'):
             continue
@@ -368,38 +382,27 @@ def sync_logbook(calendar_name="Things Logbook"):
         except:
             continue
         
-        processed_uuids.add(task['uuid'])
-        
-        if task['uuid'] in existing_events:
-            # For logbook, we generally skip existing events unless date needs fixing
-            if update_event_if_changed(existing_events[task['uuid']], task, "logbook"):
-                updated_count += 1
-            else:
-                skipped_count += 1
-        else:
-            # Create new event
-            if create_new_event(task, calendar, "logbook"):
-                created_count += 1
-    
-    # Remove events no longer in date range or Things
-    removed_count = 0
-    for uuid, event in existing_events.items():
-        if uuid not in processed_uuids:
-            store.removeEvent_span_error_(event, 0, None)
-            removed_count += 1
-    
-    print(f"    Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_count}, Removed: {removed_count}")
+        tasks_in_range.append(task)
+    
+    if digest:
+        plan = plan_digest_sync(calendar_name, tasks_in_range, existing_events, digest)
+    else:
+        # For logbook, we generally skip existing events unless date needs fixing
+        plan = plan_sync(calendar_name, tasks_in_range, existing_events, "logbook")
+    return apply_sync_plan(session, calendar, plan, existing_events, time.perf_counter() - started, dry_run)
 
 
-def sync_deadlines(calendar_name="Things Deadlines"):
+def sync_deadlines(calendar_name="Things Deadlines", dry_run=False, session=None, calendar_tasks=None):
     """Sync tasks with deadlines to calendar as all-day events."""
-    store = CalCalendarStore.defaultCalendarStore()
-    calendar = get_calendar(calendar_name)
+    session = session or CalendarSession()
+    calendar = get_calendar(calendar_name, session)
     if not calendar:
         return
     
-    print(f"  Getting deadlines from Things...")
-    deadline_tasks = things.deadlines()
+    if calendar_tasks is None:
+        print(f"  Getting deadlines from Things...")
+        calendar_tasks = fetch_calendar_tasks()
+    deadline_tasks = view_tasks(calendar_tasks, "deadlines")
     
     print(f"  Processing {len(deadline_tasks)} deadline tasks...")
     
@@ -407,51 +410,66 @@ def sync_deadlines(calendar_name="Things Deadlines"):
     today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     past_date = today - datetime.timedelta(days=365)  # -1 year
     future_date = today + datetime.timedelta(days=365)  # +4 years
-    existing_events = get_existing_events(calendar, past_date, future_date)
+    existing_events = load_existing_events(session, calendar, past_date, future_date)
     
-    processed_uuids = set()
-    created_count = 0
-    updated_count = 0
-    
-    for task in deadline_tasks:
-        if not task.get('deadline'):
-            continue
-        
-        processed_uuids.add(task['uuid'])
-        
-        if task['uuid'] in existing_events:
-            # Update existing event if needed
-            if update_event_if_changed(existing_events[task['uuid']], task, "deadline"):
-                updated_count += 1
-        else:
-            # Create new event
-            if create_new_event(task, calendar, "deadline"):
-                created_count += 1
+    started = time.perf_counter()
+    tasks_with_deadlines = [task for task in deadline_tasks if task.get('deadline')]
+    plan = plan_sync(calendar_name, tasks_with_deadlines, existing_events, "deadline")
+    return apply_sync_plan(session, calendar, plan, existing_events, time.perf_counter() - started, dry_run)
+
+
+def sync_if_changed(session, calendar_name, signature, sync, dry_run=False):
+    """
+    Run a calendar sync unless its Things view is unchanged since the last one.
     
-    # Remove events no longer in Things
-    removed_count = 0
-    for uuid, event in existing_events.items():
-        if uuid not in processed_uuids:
-            store.removeEvent_span_error_(event, 0, None)
-            removed_count += 1
+    The signature comes from thingsdb.probe_views(); it is only recorded
+    after a sync that wrote everything it planned to.
+    """
+    if session.is_unchanged(calendar_name, signature):
+        print("  No changes in Things since the last sync, skipping")
+        return None
     
-    print(f"    Created: {created_count}, Updated: {updated_count}, Removed: {removed_count}")
+    result = sync()
+    if result and not result['failed'] and not dry_run:
+        session.signatures[calendar_name] = signature
+    return result
 
 
-def main_sync(include_logbook=True):
-    """Main sync function to update all calendars."""
+def main_sync(include_logbook=True, dry_run=False, session=None, logbook_digest=None,
+              batch_size=DEFAULT_BATCH_SIZE, batch_interval=DEFAULT_BATCH_INTERVAL):
+    """
+    Main sync function to update all calendars.
+    
+    batch_size and batch_interval set how calendar writes are batched when
+    no session is given; a session brings its own.
+    """
     print(f"Starting sync at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
+        session = session or CalendarSession(batch_size=batch_size, batch_interval=batch_interval)
+        signatures = probe_views()
+        
+        # Today, Upcoming and Deadlines come from one query, only run when one of them changed
+        calendar_tasks = None
+        if not (session.is_unchanged("Things Upcoming", signatures["upcoming"])
+                and session.is_unchanged("Things Deadlines", signatures["deadlines"])):
+            print("Getting tasks from Things...")
+            calendar_tasks = fetch_calendar_tasks()
+        
         print("Syncing Upcoming and Today tasks...")
-        sync_upcoming_and_today()
+        sync_if_changed(session, "Things Upcoming", signatures["upcoming"],
+                        lambda: sync_upcoming_and_today(dry_run=dry_run, session=session, calendar_tasks=calendar_tasks),
+                        dry_run)
         
         if include_logbook:
             print("Syncing Logbook...")
-            sync_logbook()
+            sync_if_changed(session, "Things Logbook", (signatures["logbook"], logbook_digest),
+                            lambda: sync_logbook(dry_run=dry_run, session=session, digest=logbook_digest), dry_run)
         
         print("Syncing Deadlines...")
-        sync_deadlines()
+        sync_if_changed(session, "Things Deadlines", signatures["deadlines"],
+                        lambda: sync_deadlines(dry_run=dry_run, session=session, calendar_tasks=calendar_tasks),
+                        dry_run)
         
         print("Sync completed successfully!")
     except Exception as e:
@@ -460,15 +478,22 @@ def main_sync(include_logbook=True):
         traceback.print_exc()
 
 
-def run_continuous_sync(interval=60, logbook_interval=1800):
+def run_continuous_sync(interval=60, logbook_interval=1800, refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                        logbook_digest=None, batch_size=DEFAULT_BATCH_SIZE, batch_interval=DEFAULT_BATCH_INTERVAL):
     """
     Run sync continuously at specified intervals.
     
     Args:
         interval: Seconds between syncing Upcoming/Deadlines (default 60 = 1 minute)
         logbook_interval: Seconds between syncing Logbook (default 1800 = 30 minutes)
+        refresh_interval: Seconds between full re-reads of calendar events (default 1800);
+            in between, the calendars and event indexes from earlier cycles are reused
+        logbook_digest: 'day' or 'project' to write logbook digests instead of one event per task
+        batch_size: Calendar writes made back to back (default 50)
+        batch_interval: Seconds of pause between batches of writes (default 0.5)
     """
     last_logbook_sync = 0
+    session = CalendarSession(refresh_interval, batch_size, batch_interval)
     
     while True:
         current_time = time.time()
@@ -480,7 +505,7 @@ def run_continuous_sync(interval=60, logbook_interval=1800):
             print(f"Including logbook sync (every {logbook_interval/60:.0f} minutes)")
             last_logbook_sync = current_time
         
-        main_sync(include_logbook=include_logbook)
+        main_sync(include_logbook=include_logbook, session=session, logbook_digest=logbook_digest)
         
         print(f"Waiting {interval} seconds until next sync...")
         if not include_logbook:
@@ -492,8 +517,24 @@ def run_continuous_sync(interval=60, logbook_interval=1800):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync Things 3 to the Calendar app.")
+    parser.add_argument("--logbook-digest", choices=DIGEST_MODES,
+                        help="write one logbook event per day (or per day and project) instead of one per task")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, metavar="N",
+                        help="calendar writes made back to back (default: %(default)s)")
+    parser.add_argument("--batch-interval", type=float, default=DEFAULT_BATCH_INTERVAL, metavar="SECONDS",
+                        help="pause between batches of calendar writes (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="only print the planned changes")
+    args = parser.parse_args()
+    
+    try:
+        check_batching(args.batch_size, args.batch_interval)
+    except ValueError as e:
+        parser.error(str(e))
+    
     # Run continuous sync: Upcoming/Deadlines every 60 seconds, Logbook every 30 minutes
     #run_continuous_sync(interval=60, logbook_interval=1800)
     
     # Run one-off sync
-    main_sync(include_logbook=True)
+    main_sync(include_logbook=True, dry_run=args.dry_run, logbook_digest=args.logbook_digest,
+              batch_size=args.batch_size, batch_interval=args.batch_interval)
@@ -5,12 +5,17 @@ Author: Claude
 Date: 2025-08-26
 """
 
+import argparse
 import csv
 import things
 from datetime import datetime
 import sys
 import os
 
+from output_writer import open_atomically
+from progress import PROGRESS_MODES, Progress
+from thingsdb import fetch_concurrently, get_logbook, get_todos
+
 def format_datetime(dt_string):
     """Convert Things datetime to Dida format (YYYY-MM-DDTHH:MM:SS+0000)"""
     if not dt_string:
@@ -54,17 +59,21 @@ def format_tags(tags):
         return ""
     return ", ".join(tags)
 
-def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
+def export_to_dida_csv(output_file="Things_to_Dida_export.csv", progress=None):
     """Export Things data to Dida CSV format"""
+    progress = progress or Progress()
     
     print("Fetching data from Things 3...")
+    progress.start("fetch")
     
-    # Get all data from Things
-    todos = things.todos()
-    logbook = things.logbook()
-    projects = things.projects()
-    areas = things.areas()
-    headings = things.tasks(type='heading', status=None)  # Get ALL headings including completed
+    # Get all data from Things (independent reads, fetched concurrently).
+    # To-dos under headings come with the heading's project and area resolved.
+    todos, logbook, projects, areas = fetch_concurrently([
+        (get_todos, {}),
+        (get_logbook, {}),
+        (things.projects, {}),
+        (things.areas, {}),
+    ])
     
     # Separate completed projects from regular tasks in logbook
     logbook_tasks = [t for t in logbook if t.get('type') != 'project']
@@ -72,29 +81,20 @@ def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
     
     all_tasks = todos + logbook_tasks
     all_projects = projects + logbook_projects  # Include completed projects
+    progress.finish(len(all_tasks) + len(all_projects))
     
-    print(f"Found {len(all_tasks)} tasks, {len(all_projects)} projects ({len(logbook_projects)} completed), {len(areas)} areas, {len(headings)} headings")
+    print(f"Found {len(all_tasks)} tasks, {len(all_projects)} projects ({len(logbook_projects)} completed), {len(areas)} areas")
     
     # Create project and area lookup (include completed projects from logbook)
     project_lookup = {p['uuid']: p['title'] for p in all_projects}
+    project_objects = {p['uuid']: p for p in all_projects}
     area_lookup = {a['uuid']: a['title'] for a in areas}
     
-    # Create heading lookup with project info
-    heading_lookup = {}
-    for h in headings:
-        heading_lookup[h['uuid']] = {
-            'title': h.get('title', ''),
-            'project': h.get('project', ''),
-            'project_title': h.get('project_title', ''),
-            'area': h.get('area', ''),
-            'area_title': h.get('area_title', '')
-        }
-    
     # Prepare CSV rows
     rows = []
     
     # Add header rows (Dida format)
-    with open(output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
+    with open_atomically(output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
         # Write BOM for UTF-8
         csvfile.write('\ufeff')
         
@@ -116,6 +116,7 @@ def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
         writer.writeheader()
         
         task_id = 1
+        progress.start("write", len(all_tasks) + len(all_projects))
         
         # Process all tasks
         for task in all_tasks:
@@ -123,24 +124,11 @@ def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
             folder_name = ""
             list_name = "Inbox"
             
-            # First check if task has a heading (heading -> project -> area)
-            if 'heading' in task and task['heading'] and task['heading'] in heading_lookup:
-                heading_info = heading_lookup[task['heading']]
-                # Get project from heading
-                if heading_info['project']:
-                    list_name = heading_info['project_title'] or project_lookup.get(heading_info['project'], "Inbox")
-                    # Find the area for this project
-                    project_obj = next((p for p in all_projects if p['uuid'] == heading_info['project']), None)
-                    if project_obj:
-                        if 'area' in project_obj:
-                            folder_name = area_lookup.get(project_obj['area'], "")
-                        elif 'area_title' in project_obj:
-                            folder_name = project_obj['area_title']
-            # Then check if task has a project directly
-            elif 'project' in task:
-                list_name = project_lookup.get(task['project'], "Inbox")
+            # Check if task has a project (tasks under headings have the heading's project)
+            if 'project' in task:
+                list_name = project_lookup.get(task['project']) or task.get('project_title') or "Inbox"
                 # Find the area for this project
-                project_obj = next((p for p in all_projects if p['uuid'] == task['project']), None)
+                project_obj = project_objects.get(task['project'])
                 if project_obj:
                     if 'area' in project_obj:
                         folder_name = area_lookup.get(project_obj['area'], "")
@@ -237,6 +225,7 @@ def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
             
             writer.writerow(row)
             task_id += 1
+            progress.advance()
         
         # Add projects as lists (optional - Dida doesn't import these as separate entities)
         # But we can add them as placeholder tasks to preserve the project structure
@@ -279,6 +268,8 @@ def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
             
             writer.writerow(row)
             task_id += 1
+            progress.advance()
+        progress.finish()
     
     print(f"\nExport completed successfully!")
     print(f"Output file: {output_file}")
@@ -287,11 +278,14 @@ def export_to_dida_csv(output_file="Things_to_Dida_export.csv"):
     return output_file
 
 if __name__ == "__main__":
-    # Check if output filename is provided
-    output_file = sys.argv[1] if len(sys.argv) > 1 else "Things_to_Dida_export.csv"
+    parser = argparse.ArgumentParser(description="Export Things 3 data to Dida CSV format.")
+    parser.add_argument("output_file", nargs="?", default="Things_to_Dida_export.csv")
+    parser.add_argument("--progress", choices=PROGRESS_MODES,
+                        help="report progress on stderr as a terminal bar or as JSON lines")
+    args = parser.parse_args()
     
     try:
-        export_to_dida_csv(output_file)
+        export_to_dida_csv(args.output_file, Progress(args.progress))
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Export Things 3 tasks as JSON Lines.
+
+Every line is one fully resolved task: heading, project and area context
+is resolved in SQL the same way as for the Markdown exports, checklist items are
+inlined and dates are normalised to ISO 8601. Tasks are read a page at a
+time, with the checklist items of a page loaded in one query, and records
+are written as they are produced, so memory use is bounded by the page
+size rather than by the output.
+"""
+
+import argparse
+import json
+import sys
+
+from output_writer import open_atomically
+from task_records import TaskRecord
+from things2md import get_checklist_items
+from thingsdb import DEFAULT_PAGE_SIZE, ReadOnlyDatabase, iter_logbook, iter_todos
+
+RECORD_FIELDS = (
+    "uuid", "type", "title", "status", "notes",
+    "project", "project_title", "area", "area_title", "heading", "heading_title",
+    "start", "start_date", "deadline", "stop_date", "created", "modified",
+)
+DATE_FIELDS = ("start_date", "deadline", "stop_date", "created", "modified")
+
+
+def normalize_date(value):
+    """Convert Things date strings to ISO 8601 ('YYYY-MM-DD[THH:MM:SS]')."""
+    if not value:
+        return None
+    return value.replace(' ', 'T', 1)
+
+
+def task_to_record(task):
+    """Turn a Things task into a flat, JSON-serialisable record."""
+    task = TaskRecord.from_task(task)
+
+    record = {field: getattr(task, field) for field in RECORD_FIELDS}
+    for field in DATE_FIELDS:
+        record[field] = normalize_date(record[field])
+
+    record["notes"] = record["notes"] or ""
+    record["tags"] = list(task.tags)
+    record["checklist"] = [
+        {
+            "title": item.get("title", ""),
+            "status": item.get("status"),
+            "stop_date": normalize_date(item.get("stop_date")),
+        }
+        for item in get_checklist_items(task)
+    ]
+    return record
+
+
+def iter_tasks(page_size=DEFAULT_PAGE_SIZE):
+    """Yield open to-dos followed by the logbook, page_size tasks at a time."""
+    database = ReadOnlyDatabase()
+    yield from iter_todos(page_size, database, checklists=True)
+    yield from iter_logbook(page_size, database, checklists=True)
+
+
+def iter_task_records(tasks):
+    """Yield records for tasks as they are consumed."""
+    for task in tasks:
+        yield task_to_record(task)
+
+
+def write_jsonl(records, f):
+    """Write records as JSON Lines, returning how many were written."""
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def export_to_jsonl(output_file="things.jsonl", tasks=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Stream every task into a JSON Lines file ('-' for stdout).
+
+    The file is replaced atomically once every record is written.
+    """
+    records = iter_task_records(tasks if tasks is not None else iter_tasks(page_size))
+
+    if output_file == '-':
+        return write_jsonl(records, sys.stdout)
+
+    with open_atomically(output_file, encoding='utf-8') as f:
+        return write_jsonl(records, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Things 3 tasks as JSON Lines.")
+    parser.add_argument("output_file", nargs="?", default="things.jsonl", help="output file, '-' for stdout")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, metavar="N",
+                        help=f"read tasks N at a time (default: {DEFAULT_PAGE_SIZE})")
+    args = parser.parse_args()
+
+    count = export_to_jsonl(args.output_file, page_size=args.page_size)
+    if args.output_file != '-':
+        print(f"Exported {count} tasks to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
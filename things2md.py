@@ -1,8 +1,20 @@
 from operator import itemgetter
 from collections import defaultdict
+import argparse
 import datetime
+import hashlib
+import json
+import os
 import things
 
+from checkpoint import Checkpoint
+from md_templates import checkbox_for, default_templates, load_templates, template_file_key
+from output_writer import BatchedWriter
+from projects2md import compute_md5
+from progress import PROGRESS_MODES, Progress, track
+from render_cache import open_cache
+from thingsdb import get_logbook, iter_logbook
+
 
 def get_checklist_items(entry):
     """Return checklist items for a logbook entry, fetching them if required."""
@@ -15,16 +27,17 @@ def get_checklist_items(entry):
 
     if checklist is True and entry.get("uuid"):
         try:
-            return things.checklist_items(entry["uuid"])
+            return things.checklist_items(entry.get("uuid"))
         except Exception:
             return []
 
     return []
 
 
-def format_checklist_as_markdown(entry):
+def format_checklist_as_markdown(entry, templates=None):
     """Format checklist items as indented markdown tasks."""
     items = get_checklist_items(entry)
+    render_item = (templates or default_templates())["checklist_item"]
     lines = []
     for item in items:
         title = item.get("title", "").strip()
@@ -32,72 +45,18 @@ def format_checklist_as_markdown(entry):
             continue
 
         status = item.get("status", "incomplete")
-        if status == "completed":
-            checkbox = "- [x]"
-        elif status == "canceled":
-            checkbox = "- [-]"
-        else:
-            checkbox = "- [ ]"
-
-        lines.append(f"\t{checkbox} {title}")
+        lines.append(render_item(checkbox=checkbox_for(status), title=title, status=status))
 
     return lines
 
 
-def build_heading_lookup():
-    """Map heading UUIDs to their parent project and area metadata."""
-    project_lookup = {
-        project["uuid"]: project
-        for project in things.projects(status=None)
-    }
-
-    heading_lookup = {}
-    headings = things.tasks(type="heading", status=None)
-    for heading in headings:
-        project_id = heading.get("project")
-        if not project_id:
-            continue
-
-        project_info = project_lookup.get(project_id, {})
-        heading_lookup[heading["uuid"]] = {
-            "project": project_id,
-            "project_title": heading.get("project_title")
-            or project_info.get("title", ""),
-            "area": project_info.get("area"),
-            "area_title": project_info.get("area_title"),
-            "heading_title": heading.get("title", ""),
-        }
-
-    return heading_lookup
-
-
-def inject_heading_context(entry, heading_lookup):
-    """Ensure logbook entries under headings have project context."""
-    if "project" in entry or "heading" not in entry:
-        return
-
-    meta = heading_lookup.get(entry["heading"])
-    if not meta:
-        return
-
-    entry["project"] = meta.get("project")
-    entry["project_title"] = meta.get("project_title")
-
-    if meta.get("area") and "area" not in entry:
-        entry["area"] = meta["area"]
-
-    if meta.get("area_title") and "area_title" not in entry:
-        entry["area_title"] = meta["area_title"]
-
-    if (not entry.get("heading_title")) and meta.get("heading_title"):
-        entry["heading_title"] = meta["heading_title"]
-
-
-def format_entries_with_headings(entries, heading_level):
+def format_entries_with_headings(entries, heading_level, templates=None):
     """Render Markdown lines grouping entries beneath heading titles."""
     if not entries:
         return ""
 
+    render_heading = (templates or default_templates())["heading"]
+
     lines = []
     items_without_heading = []
     heading_sections = {}
@@ -125,32 +84,66 @@ def format_entries_with_headings(entries, heading_level):
         section = heading_sections[heading_id]
         if lines:
             lines.append("")
-        lines.append(f"{heading_prefix} {section['title']}")
+        lines.append(render_heading(prefix=heading_prefix, level=heading_level, title=section['title']))
         lines.extend(section["items"])
 
     return '\n'.join(lines)
 
 
-def logbook_to_md(data, heading_lookup=None):
-    sorted_data = sorted(data, key = itemgetter('stop_date'), reverse=True)
+def format_summary_line(summary):
+    """Render history-wide rollup totals for the logbook header."""
+    return f"{summary['completed']} completed, {summary['canceled']} canceled"
+
 
-    md_dict = defaultdict(lambda: defaultdict(list))
+def format_logbook_entry(entry, templates=None):
+    """Render a logbook entry's line, notes and checklist as Markdown."""
+    templates = templates or default_templates()
+    todo_url = f"things:///show?id={entry['uuid']}"
 
-    heading_lookup = heading_lookup or build_heading_lookup()
+    hashtags = " ".join(f"#{tag}" for tag in entry.get('tags', []))
+    md_str = templates["task"](
+        checkbox=checkbox_for(entry['status']),
+        title=entry['title'],
+        uuid=entry['uuid'],
+        url=todo_url,
+        link=f"[{entry['title']}]({todo_url})",
+        status=entry['status'],
+        tags=hashtags,
+        tags_suffix=f" {hashtags}" if hashtags else "",
+    )
+
+    lines = [md_str]
+    notes = entry.get('notes')
+    if notes:
+        render_note_line = templates["note_line"]
+        lines.extend(render_note_line(line=line) for line in notes.splitlines())
+
+    lines.extend(format_checklist_as_markdown(entry, templates))
+
+    return '\n'.join(lines)
+
+
+def iter_logbook_days(sorted_data, templates=None, cache=None):
+    """
+    Yield (date, groups) for entries already sorted newest first.
+
+    Entries are expected to carry their project and area, as thingsdb
+    returns them.
+    """
+    templates = templates or default_templates()
+    current_date = None
+    groups = None
+
+    def render(entry):
+        return format_logbook_entry(entry, templates)
 
     for entry in sorted_data:
-        inject_heading_context(entry, heading_lookup)
-        todo_link = f"[{entry['title']}](things:///show?id={entry['uuid']})"
         stop_date = datetime.datetime.strptime(entry['stop_date'], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
 
-        if entry['status'] == 'completed':
-            md_str = f"- [x] {todo_link}"
-        elif entry['status'] == 'canceled':
-            md_str = f"- [-] {todo_link}"
-         
-        if 'tags' in entry:
-            for tag in entry['tags']:
-                md_str += f" #{tag}"
+        if cache is not None:
+            md_str = cache.get_or_render(entry, render, namespace="logbook")
+        else:
+            md_str = render(entry)
 
         if 'project' in entry:
             project_link = f"[{entry['project_title']}](things:///show?id={entry['project']})"
@@ -161,39 +154,291 @@ def logbook_to_md(data, heading_lookup=None):
         else:
             group_key = 'No project or area'
 
-        lines = [md_str]
-        notes = entry.get('notes')
-        if notes:
-            lines.extend('\t' + line for line in notes.splitlines())
+        if stop_date != current_date:
+            if groups is not None:
+                yield current_date, groups
+            current_date = stop_date
+            groups = defaultdict(list)
 
-        lines.extend(format_checklist_as_markdown(entry))
-
-        md_str = '\n'.join(lines)
-
-        md_dict[stop_date][group_key].append({
+        groups[group_key].append({
             "heading": entry.get("heading"),
             "heading_title": entry.get("heading_title"),
             "content": md_str,
         })
 
-    final_md = "# Things3 Logbook\n"
-    for date, groups in md_dict.items():
-        final_md += f"\n\n## [[{date}]]\n"
-        for group, entries in groups.items():
-            if group == 'No project or area':
-                rendered = format_entries_with_headings(entries, heading_level=4)
-                if rendered:
-                    final_md += rendered
-        for group, entries in groups.items():
-            if group != 'No project or area':
-                rendered = format_entries_with_headings(entries, heading_level=4)
-                final_md += f"\n### {group}\n"
-                if rendered:
-                    final_md += rendered
-    return final_md
+    if groups is not None:
+        yield current_date, groups
+
+
+def format_day_section(groups, templates=None):
+    """Render the body of one day's logbook section."""
+    section = ""
+    for group, entries in groups.items():
+        if group == 'No project or area':
+            rendered = format_entries_with_headings(entries, heading_level=4, templates=templates)
+            if rendered:
+                section += rendered
+    for group, entries in groups.items():
+        if group != 'No project or area':
+            rendered = format_entries_with_headings(entries, heading_level=4, templates=templates)
+            section += f"\n### {group}\n"
+            if rendered:
+                section += rendered
+    return section
+
+
+def iter_day_sections(data, templates=None, cache=None, presorted=False, progress=None):
+    """
+    Yield (date, section) pairs for logbook entries, newest day first.
+
+    With presorted=True the entries (e.g. from thingsdb.iter_logbook) are
+    consumed as a stream instead of being sorted in memory first.
+    """
+    sorted_data = data if presorted else sorted(data, key = itemgetter('stop_date'), reverse=True)
+    sorted_data = track(progress, "render", sorted_data)
+
+    for date, groups in iter_logbook_days(sorted_data, templates, cache):
+        yield date, format_day_section(groups, templates)
+
+
+def iter_logbook_md(data, summary=None, templates=None, title="Things3 Logbook",
+                    cache=None, presorted=False, progress=None, on_section=None):
+    """
+    Yield the logbook Markdown piece by piece.
+
+    on_section(date, section) is called with every day section as it is
+    rendered, so other outputs (daily notes) can reuse it.
+    """
+    yield f"# {title}\n"
+    if summary:
+        yield f"\n{format_summary_line(summary)}\n"
+    for date, section in iter_day_sections(data, templates, cache, presorted, progress):
+        if on_section is not None:
+            on_section(date, section)
+        yield f"\n\n## [[{date}]]\n"
+        yield section
+
+
+def logbook_to_md(data, summary=None, templates=None, title="Things3 Logbook",
+                  cache=None, on_section=None):
+    return ''.join(iter_logbook_md(data, summary, templates, title, cache, on_section=on_section))
+
+
+PARTITION_STATE_FILENAME = ".partitions.json"
+PARTITION_KEY_LENGTH = {"year": 4, "month": 7}
+
+
+def partition_signature(entries, render_key=""):
+    """
+    Fingerprint the entries of a partition without rendering them.
+
+    Project, area and heading titles are included because renaming them
+    changes the rendered partition without touching its entries.
+    """
+    digest = hashlib.md5(render_key.encode('utf-8'))
+    for entry in sorted(entries, key=itemgetter('uuid')):
+        digest.update(
+            f"{entry['uuid']}|{entry['status']}|{entry['stop_date']}|{entry.get('modified')}|"
+            f"{entry.get('project_title')}|{entry.get('area_title')}|{entry.get('heading_title')}\n".encode('utf-8')
+        )
+    return digest.hexdigest()
+
+
+def load_partition_state(output_directory):
+    """Load partition signatures and content hashes from a previous run."""
+    path = os.path.join(output_directory, PARTITION_STATE_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def format_partition_index(partitions, summary=None):
+    """Render the index file linking every logbook partition."""
+    index_md = "# Things3 Logbook\n"
+    if summary:
+        index_md += f"\n{format_summary_line(summary)}\n"
+    index_md += "\n"
+    for key in sorted(partitions, reverse=True):
+        index_md += f"- [{key}]({key}.md) ({partitions[key]} entries)\n"
+    return index_md
+
+
+def write_partitioned_logbook(data, output_directory="logbook", period="year", templates=None,
+                              summary=None, render_key="", cache=None, writer=None,
+                              checkpoint=None, progress=None, on_section=None, keep_sections=None):
+    """
+    Write the logbook as one file per year (or month) plus an index.
+
+    Closed partitions are frozen: they are skipped without rendering when
+    neither their entries nor their file changed since the last run. The
+    current partition is always rendered, but only written when changed.
+    With a checkpoint, partitions finished by an interrupted run with the
+    same entries are skipped too, the current one included.
+
+    Freezing, checkpoints and the removal of stale partitions only apply
+    to filesystem output. A writer that is not incremental (such as an
+    ArchiveWriter) gets every partition rendered and no partition state.
+
+    on_section(date, section) is called with every day section, as for
+    iter_logbook_md(). The days of a skipped partition are only rendered
+    for it when keep_sections(dates), given the partition's days, returns
+    False, i.e. when the consumer does not already hold their sections.
+
+    Returns the number of partitions rendered and skipped.
+    """
+    owns_writer = writer is None
+    writer = writer or BatchedWriter()
+    writer.makedirs(output_directory)
+    key_length = PARTITION_KEY_LENGTH[period]
+    current_key = datetime.date.today().isoformat()[:key_length]
+
+    partitions = defaultdict(list)
+    for entry in data:
+        partitions[entry['stop_date'][:key_length]].append(entry)
+
+    incremental = writer.incremental
+    state = load_partition_state(output_directory) if incremental else {}
+    new_state = {}
+    rendered = 0
+    skipped = 0
+
+    for key, entries in track(progress, "render", partitions.items()):
+        path = os.path.join(output_directory, f"{key}.md")
+        signature = partition_signature(entries, render_key)
+        previous = state.get(key, {})
+
+        frozen = None
+        if incremental and checkpoint is not None:
+            frozen = checkpoint.resume(key, signature)
+
+        if not frozen and incremental and key != current_key and previous.get("signature") == signature \
+                and os.path.exists(path):
+            with open(path, 'r') as f:
+                if compute_md5(f.read()) == previous.get("hash"):
+                    frozen = previous
+
+        if frozen:
+            new_state[key] = frozen
+            skipped += 1
+            if on_section is not None:
+                dates = sorted({entry['stop_date'][:10] for entry in entries})
+                if keep_sections is None or not keep_sections(dates):
+                    for date, section in iter_day_sections(entries, templates, cache):
+                        on_section(date, section)
+            continue
+
+        content = logbook_to_md(entries, templates=templates, title=f"Things3 Logbook {key}",
+                                cache=cache, on_section=on_section)
+        writer.write(path, content)
+        new_state[key] = {"signature": signature, "hash": compute_md5(content)}
+        rendered += 1
+        if incremental and checkpoint is not None:
+            checkpoint.mark(key, signature, new_state[key]["hash"])
+
+    for key in set(state) - set(partitions):
+        writer.remove(os.path.join(output_directory, f"{key}.md"))
+
+    index = format_partition_index({key: len(entries) for key, entries in partitions.items()}, summary)
+    writer.write(os.path.join(output_directory, "index.md"), index)
+    if incremental:
+        writer.write(
+            os.path.join(output_directory, PARTITION_STATE_FILENAME),
+            json.dumps(new_state, indent=1, sort_keys=True),
+        )
+    if owns_writer:
+        writer.flush()
+    return rendered, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Things 3 logbook to Markdown.")
+    parser.add_argument("--output", default="logbook.md", help="logbook Markdown file")
+    parser.add_argument("--rollups", action="store_true",
+                        help="maintain logbook_rollups.json next to the output and add totals to the header")
+    parser.add_argument("--daily-notes", metavar="DIR",
+                        help="also write each day's section into the matching daily note in DIR")
+    parser.add_argument("--daily-notes-format", default="%Y-%m-%d.md",
+                        help="strftime pattern of daily note paths relative to DIR (default: %(default)s)")
+    parser.add_argument("--templates", metavar="FILE", help="JSON file of custom output templates")
+    parser.add_argument("--partition", choices=sorted(PARTITION_KEY_LENGTH),
+                        help="write one file per year or month into --output-directory instead of --output")
+    parser.add_argument("--output-directory", default="logbook", help="directory for partitioned output")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse rendered entries from a cache next to the output")
+    parser.add_argument("--page-size", type=int, metavar="N",
+                        help="stream the logbook from the database N entries at a time instead of loading it at once")
+    parser.add_argument("--resume", action="store_true",
+                        help="with --partition, skip partitions finished by an interrupted run")
+    parser.add_argument("--progress", choices=PROGRESS_MODES,
+                        help="report progress on stderr as a terminal bar or as JSON lines")
+    args = parser.parse_args()
+    if args.resume and not args.partition:
+        parser.error("--resume needs --partition")
+    progress = Progress(args.progress)
+
+    templates = load_templates(args.templates) if args.templates else None
+    render_key = template_file_key(args.templates)
+    output_directory = args.output_directory if args.partition else os.path.dirname(args.output)
+    cache = open_cache(output_directory, render_key) if args.cache else None
+
+    if args.page_size:
+        def read_logbook():
+            return iter_logbook(page_size=args.page_size)
+    else:
+        progress.start("fetch")
+        logbook = get_logbook()
+        progress.finish(len(logbook))
+
+        def read_logbook():
+            return logbook
+    presorted = bool(args.page_size)
+
+    summary = None
+    if args.rollups:
+        from logbook_rollups import ROLLUPS_FILENAME, refresh_rollups, rollup_summary
+        os.makedirs(output_directory or ".", exist_ok=True)
+        rollups_path = os.path.join(output_directory, ROLLUPS_FILENAME)
+        summary = rollup_summary(refresh_rollups(rollups_path))
+
+    checkpoint = None
+    with BatchedWriter(progress=progress) as writer:
+        notes = None
+        if args.daily_notes:
+            from daily_notes import DailyNotes
+            notes = DailyNotes(args.daily_notes, args.daily_notes_format, writer=writer)
+        on_section = notes.add if notes is not None else None
+        keep_sections = notes.keep if notes is not None else None
+
+        if args.partition:
+            writer.makedirs(args.output_directory)
+            checkpoint = Checkpoint(args.output_directory, writer, render_key, resume=args.resume)
+            with checkpoint:
+                rendered, skipped = write_partitioned_logbook(
+                    read_logbook(), args.output_directory, args.partition,
+                    templates=templates, summary=summary, render_key=render_key, cache=cache, writer=writer,
+                    checkpoint=checkpoint, progress=progress, on_section=on_section,
+                    keep_sections=keep_sections,
+                )
+            print(f"Logbook partitions rendered: {rendered}, frozen: {skipped}")
+        else:
+            writer.write_chunks(args.output, iter_logbook_md(
+                read_logbook(), summary=summary, templates=templates, cache=cache,
+                presorted=presorted, progress=progress, on_section=on_section,
+            ))
+
+        if notes is not None:
+            updated, unchanged, missing = notes.finish()
+            print(f"Daily notes updated: {updated}, unchanged: {unchanged}, missing: {missing}")
+
+    if checkpoint is not None:
+        checkpoint.clear()
+    if cache is not None:
+        cache.save()
+
 
 if __name__ == "__main__":
-    logbook = things.logbook()
-    logbook_md = logbook_to_md(logbook)
-    with open('logbook.md', 'w') as f:
-        f.write(logbook_md)
+    main()
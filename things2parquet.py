@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Export Things 3 tasks, projects, areas and checklist items as columnar files.
+
+Tables are written as Parquet when pyarrow is installed and as NumPy
+``.npz`` archives otherwise. Dates are typed, low-cardinality columns
+(status, type, project and area UUIDs) are dictionary-encoded, and tasks,
+projects and checklist items are partitioned by completion year
+(``stop_year=2024``, ``stop_year=open`` for items that are not done).
+Partitions left over from an earlier export whose year no longer has any
+rows are removed. In ``.npz`` archives, list columns such as tags are
+stored Arrow-style as ``<name>.values`` plus ``<name>.offsets``, where
+row ``i`` holds ``values[offsets[i]:offsets[i + 1]]``.
+"""
+
+import argparse
+import datetime
+import os
+from collections import defaultdict
+
+import numpy as np
+import things
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from output_writer import open_atomically
+from thingsdb import ReadOnlyDatabase, get_logbook, get_todos
+
+OPEN_PARTITION = "open"
+PARTITION_PREFIX = "stop_year="
+FILE_FORMATS = ("parquet", "npz")
+
+# Column name -> column kind, per table.
+TASK_COLUMNS = {
+    "uuid": "string",
+    "type": "dictionary",
+    "title": "string",
+    "status": "dictionary",
+    "notes": "string",
+    "tags": "tags",
+    "project": "dictionary",
+    "project_title": "string",
+    "area": "dictionary",
+    "area_title": "string",
+    "heading": "string",
+    "heading_title": "string",
+    "start": "dictionary",
+    "start_date": "date",
+    "deadline": "date",
+    "stop_date": "timestamp",
+    "created": "timestamp",
+    "modified": "timestamp",
+}
+
+PROJECT_COLUMNS = {
+    "uuid": "string",
+    "title": "string",
+    "status": "dictionary",
+    "notes": "string",
+    "tags": "tags",
+    "area": "dictionary",
+    "area_title": "string",
+    "start": "dictionary",
+    "start_date": "date",
+    "deadline": "date",
+    "stop_date": "timestamp",
+    "created": "timestamp",
+    "modified": "timestamp",
+}
+
+AREA_COLUMNS = {
+    "uuid": "string",
+    "title": "string",
+    "tags": "tags",
+}
+
+CHECKLIST_COLUMNS = {
+    "task": "dictionary",
+    "uuid": "string",
+    "title": "string",
+    "status": "dictionary",
+    "stop_date": "date",
+    "index": "int",
+}
+
+
+def parse_date(value):
+    """Parse a Things 'YYYY-MM-DD' string into a date."""
+    return datetime.date.fromisoformat(value[:10]) if value else None
+
+
+def parse_timestamp(value):
+    """Parse a Things 'YYYY-MM-DD HH:MM:SS' string into a datetime."""
+    return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+
+
+def to_arrow_column(values, kind):
+    """Convert a list of Python values into a typed Arrow array."""
+    if kind == "date":
+        return pa.array([parse_date(v) for v in values], pa.date32())
+    if kind == "timestamp":
+        return pa.array([parse_timestamp(v) for v in values], pa.timestamp('s'))
+    if kind == "tags":
+        return pa.array([list(v or []) for v in values], pa.list_(pa.string()))
+    if kind == "int":
+        return pa.array(values, pa.int64())
+    array = pa.array(values, pa.string())
+    if kind == "dictionary":
+        return array.dictionary_encode()
+    return array
+
+
+def to_numpy_columns(name, values, kind):
+    """Convert a list of Python values into one or more named NumPy arrays."""
+    if kind == "date":
+        return {name: np.array([v[:10] if v else 'NaT' for v in values], dtype='datetime64[D]')}
+    if kind == "timestamp":
+        return {name: np.array([v.replace(' ', 'T') if v else 'NaT' for v in values], dtype='datetime64[s]')}
+    if kind == "tags":
+        lengths = [len(v or ()) for v in values]
+        return {
+            f"{name}.values": np.array([tag for v in values for tag in (v or ())], dtype=str),
+            f"{name}.offsets": np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+        }
+    if kind == "int":
+        return {name: np.array([-1 if v is None else v for v in values], dtype=np.int64)}
+    if kind == "dictionary":
+        categories = sorted({v for v in values if v is not None})
+        codes_by_value = {value: code for code, value in enumerate(categories)}
+        codes = np.array([codes_by_value.get(v, -1) for v in values], dtype=np.int32)
+        return {
+            f"{name}.codes": codes,
+            f"{name}.categories": np.array(categories, dtype=str),
+        }
+    return {name: np.array([v or '' for v in values], dtype=str)}
+
+
+def write_table(rows, columns, path, file_format):
+    """
+    Write rows (dicts) as one columnar file; the extension is added here.
+
+    The file is replaced atomically, so an interrupted export leaves the
+    previous file in place instead of a truncated one.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    values = {name: [row.get(name) for row in rows] for name in columns}
+
+    if file_format == "parquet":
+        table = pa.table({name: to_arrow_column(values[name], kind) for name, kind in columns.items()})
+        with open_atomically(f"{path}.parquet", 'wb') as f:
+            pq.write_table(table, f)
+        return f"{path}.parquet"
+
+    arrays = {}
+    for name, kind in columns.items():
+        arrays.update(to_numpy_columns(name, values[name], kind))
+    with open_atomically(f"{path}.npz", 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    return f"{path}.npz"
+
+
+def stop_year(row):
+    """Return the completion-year partition of a row."""
+    stop_date = row.get("stop_date")
+    return stop_date[:4] if stop_date else OPEN_PARTITION
+
+
+def remove_other_formats(path, file_format):
+    """Delete files at path (without extension) written in another format."""
+    for other_format in FILE_FORMATS:
+        if other_format != file_format and os.path.exists(f"{path}.{other_format}"):
+            os.remove(f"{path}.{other_format}")
+
+
+def remove_partition(directory):
+    """Delete the data files of a partition, and the directory once empty."""
+    for file_format in FILE_FORMATS:
+        try:
+            os.remove(os.path.join(directory, f"part-0.{file_format}"))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
+
+
+def write_partitioned(rows, columns, directory, file_format, partition_of=stop_year):
+    """
+    Write rows into one file per completion-year partition.
+
+    Partitions of an earlier export that received no rows this time are
+    removed, as is a file of the other format left in a live partition.
+    """
+    partitions = defaultdict(list)
+    for row in rows:
+        partitions[partition_of(row)].append(row)
+
+    written = []
+    for year in sorted(partitions):
+        path = os.path.join(directory, f"{PARTITION_PREFIX}{year}", "part-0")
+        written.append(write_table(partitions[year], columns, path, file_format))
+        remove_other_formats(path, file_format)
+
+    if os.path.isdir(directory):
+        live = {f"{PARTITION_PREFIX}{year}" for year in partitions}
+        for name in sorted(os.listdir(directory)):
+            if name.startswith(PARTITION_PREFIX) and name not in live:
+                remove_partition(os.path.join(directory, name))
+    return written
+
+
+def get_all_checklist_items(database=None):
+    """Read every checklist item in one query."""
+    database = database or things.Database()
+    sql_query = """
+        SELECT
+            task,
+            uuid,
+            title,
+            CASE
+                WHEN status = 0 THEN 'incomplete'
+                WHEN status = 2 THEN 'canceled'
+                WHEN status = 3 THEN 'completed'
+            END AS status,
+            date(stopDate, "unixepoch", "localtime") AS stop_date,
+            "index"
+        FROM
+            TMChecklistItem
+        ORDER BY
+            task, "index"
+        """
+    return database.execute_query(sql_query)
+
+
+def export_to_columns(output_directory="things_columns", file_format=None):
+    """Export all tables below output_directory and return the file paths."""
+    if file_format is None:
+        file_format = "parquet" if pa is not None else "npz"
+    if file_format == "parquet" and pa is None:
+        raise RuntimeError("pyarrow is required for Parquet output; use --format npz")
+
+    project_list = things.projects(status=None)
+
+    database = ReadOnlyDatabase()
+    tasks = get_todos(database) + [t for t in get_logbook(database) if t.get('type') == 'to-do']
+
+    task_years = {task['uuid']: stop_year(task) for task in tasks}
+    checklist_items = [item for item in get_all_checklist_items() if item['task'] in task_years]
+
+    written = []
+    written += write_partitioned(tasks, TASK_COLUMNS, os.path.join(output_directory, "tasks"), file_format)
+    written += write_partitioned(project_list, PROJECT_COLUMNS, os.path.join(output_directory, "projects"), file_format)
+    written += write_partitioned(
+        checklist_items, CHECKLIST_COLUMNS, os.path.join(output_directory, "checklist_items"), file_format,
+        partition_of=lambda item: task_years[item['task']],
+    )
+    areas_path = os.path.join(output_directory, "areas", "part-0")
+    written.append(write_table(things.areas(), AREA_COLUMNS, areas_path, file_format))
+    remove_other_formats(areas_path, file_format)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Things 3 data as columnar files.")
+    parser.add_argument("output_directory", nargs="?", default="things_columns")
+    parser.add_argument("--format", choices=FILE_FORMATS,
+                        help="output format (default: parquet if pyarrow is installed, else npz)")
+    args = parser.parse_args()
+
+    written = export_to_columns(args.output_directory, args.format)
+    print(f"Wrote {len(written)} files to {args.output_directory}/")
+
+
+if __name__ == "__main__":
+    main()
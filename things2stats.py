@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Summarise the Things 3 logbook as Markdown statistics tables.
+
+Logbook entries are flattened once into NumPy columns; every table is then
+an array group-by (np.unique + np.bincount) rather than a dict-of-dicts walk.
+"""
+
+import sys
+import numpy as np
+
+from task_records import iter_records
+from thingsdb import get_logbook
+
+NO_GROUP = 'No project or area'
+
+
+def entry_group(record):
+    """Return the logbook group label (project, area or none) of a record."""
+    if record.project is not None:
+        return f"[{record.project_title}](things:///show?id={record.project})"
+    if record.area is not None:
+        return f"[{record.area_title}](things:///show?id={record.area})"
+    return NO_GROUP
+
+
+def logbook_to_columns(data):
+    """Flatten logbook entries, as thingsdb.get_logbook() returns them, into columnar arrays."""
+    days = []
+    completed = []
+    groups = []
+    tag_rows = []
+    tags = []
+
+    for row, record in enumerate(iter_records(data)):
+        days.append(record.stop_date[:10])
+        completed.append(record.status == 'completed')
+        groups.append(entry_group(record))
+        for tag in record.tags:
+            tag_rows.append(row)
+            tags.append(tag)
+
+    return {
+        'day': np.array(days, dtype='datetime64[D]'),
+        'completed': np.array(completed, dtype=bool),
+        'group': np.array(groups, dtype=object),
+        'tag_row': np.array(tag_rows, dtype=np.int64),
+        'tag': np.array(tags, dtype=object),
+    }
+
+
+def count_by(keys, completed):
+    """Count completed and canceled entries for each distinct key."""
+    if len(keys) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return keys[:0], empty, empty
+
+    labels, codes = np.unique(keys, return_inverse=True)
+    codes = codes.ravel()
+    done = np.bincount(codes, weights=completed, minlength=len(labels))
+    total = np.bincount(codes, minlength=len(labels))
+    done = done.astype(np.int64)
+    return labels, done, total - done
+
+
+def week_start(days):
+    """Map each day onto the Monday of its ISO week."""
+    # 1970-01-01 was a Thursday, so shift by three days to land on Monday.
+    offset = (days.astype(np.int64) + 3) % 7
+    return days - offset.astype('timedelta64[D]')
+
+
+def escape_cell(value):
+    """Escape characters that would break a Markdown table cell."""
+    return str(value).replace('|', '\\|')
+
+
+def markdown_table(header, rows):
+    """Render a Markdown table from a header and rows of cells."""
+    lines = [
+        '| ' + ' | '.join(header) + ' |',
+        '|' + '|'.join(' --- ' for _ in header) + '|',
+    ]
+    for row in rows:
+        lines.append('| ' + ' | '.join(escape_cell(cell) for cell in row) + ' |')
+    return '\n'.join(lines)
+
+
+def ratio(done, canceled):
+    """Format the completed share of a bucket as a percentage."""
+    total = done + canceled
+    if not total:
+        return '-'
+    return f"{100.0 * done / total:.1f}%"
+
+
+def count_rows(labels, done, canceled, order):
+    """Turn group-by results into table rows in the given order."""
+    return [
+        (labels[i], int(done[i]), int(canceled[i]), ratio(done[i], canceled[i]))
+        for i in order
+    ]
+
+
+def newest_first(labels):
+    """Order period labels from the most recent backwards."""
+    return np.argsort(labels, kind='stable')[::-1]
+
+
+def busiest_first(done, canceled):
+    """Order groups by total logbook entries, largest first."""
+    return np.argsort(-(done + canceled), kind='stable')
+
+
+def stats_to_md(columns):
+    """Render every statistics table for the given logbook columns."""
+    day = columns['day']
+    completed = columns['completed']
+    header = ['Completed', 'Canceled', 'Completed %']
+
+    done = int(completed.sum())
+    canceled = int(len(completed) - done)
+
+    sections = ["# Things3 Logbook Statistics"]
+    sections.append(markdown_table(
+        ['Total'] + header,
+        [('All', done, canceled, ratio(done, canceled))],
+    ))
+
+    labels, d, c = count_by(day.astype('datetime64[M]'), completed)
+    sections.append("## By month\n\n" + markdown_table(
+        ['Month'] + header,
+        count_rows([str(label) for label in labels], d, c, newest_first(labels)),
+    ))
+
+    labels, d, c = count_by(week_start(day), completed)
+    weeks = []
+    for label in labels:
+        year, week, _ = label.item().isocalendar()
+        weeks.append(f"{year}-W{week:02d}")
+    sections.append("## By week\n\n" + markdown_table(
+        ['Week'] + header,
+        count_rows(weeks, d, c, newest_first(labels)),
+    ))
+
+    labels, d, c = count_by(day, completed)
+    sections.append("## By day\n\n" + markdown_table(
+        ['Day'] + header,
+        count_rows([f"[[{label}]]" for label in labels], d, c, newest_first(labels)),
+    ))
+
+    labels, d, c = count_by(columns['group'], completed)
+    sections.append("## By project or area\n\n" + markdown_table(
+        ['Project or area'] + header,
+        count_rows(labels, d, c, busiest_first(d, c)),
+    ))
+
+    tag_completed = completed[columns['tag_row']]
+    labels, d, c = count_by(columns['tag'], tag_completed)
+    sections.append("## By tag\n\n" + markdown_table(
+        ['Tag'] + header,
+        count_rows([f"#{label}" for label in labels], d, c, busiest_first(d, c)),
+    ))
+
+    return '\n\n'.join(sections) + '\n'
+
+
+def logbook_to_stats_md(data):
+    """Render completion statistics for logbook entries as Markdown."""
+    return stats_to_md(logbook_to_columns(data))
+
+
+if __name__ == "__main__":
+    output_file = sys.argv[1] if len(sys.argv) > 1 else "stats.md"
+    logbook = get_logbook()
+    with open(output_file, 'w') as f:
+        f.write(logbook_to_stats_md(logbook))
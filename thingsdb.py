@@ -0,0 +1,508 @@
+"""
+Shared read helpers on top of things.py.
+
+``ReadOnlyDatabase`` keeps one read-only SQLite connection per thread
+instead of opening a new connection for every query, and
+``fetch_concurrently`` runs independent reads on a small thread pool (one
+connection per worker) while returning results in a fixed order.
+``iter_todos`` and ``iter_logbook`` stream tasks page by page, so memory
+stays flat however long the history is. ``probe_views`` returns a cheap change
+signature per view, so a sync can skip views that did not change, and
+``fetch_calendar_tasks`` reads Today, Upcoming and Deadlines in one query.
+
+``get_todos``, ``get_logbook`` and ``iter_logbook`` return to-dos under a
+heading with the heading's project and area already filled in by the
+query, so exporters need no heading lookup of their own.
+"""
+
+import datetime
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import things
+from things.database import (
+    IS_CANCELED,
+    IS_COMPLETED,
+    IS_INCOMPLETE,
+    IS_NOT_RECURRING,
+    IS_TODO,
+    START_TO_FILTER,
+    TRASHED_TO_FILTER,
+    convert_isodate_sql_expression_to_thingsdate,
+    dict_factory,
+    make_tasks_sql_query,
+    make_truthy_filter,
+    prettify_sql,
+)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PAGE_SIZE = 500
+
+# Same selection as things.logbook(): done, not trashed, not recurring
+# templates and not inside a trashed project or heading.
+LOGBOOK_PREDICATE = f"""
+    TASK.{IS_NOT_RECURRING}
+    AND TASK.{TRASHED_TO_FILTER[False]}
+    {make_truthy_filter("PROJECT.trashed", False)}
+    {make_truthy_filter("PROJECT_OF_HEADING.trashed", False)}
+    AND (TASK.{IS_CANCELED} OR TASK.{IS_COMPLETED})
+    """
+
+# Open tasks, with the same trash and recurrence filters as things.tasks().
+OPEN_PREDICATE = f"""
+    TASK.{IS_NOT_RECURRING}
+    AND TASK.{TRASHED_TO_FILTER[False]}
+    {make_truthy_filter("PROJECT.trashed", False)}
+    {make_truthy_filter("PROJECT_OF_HEADING.trashed", False)}
+    AND TASK.{IS_INCOMPLETE}
+    """
+
+# Selections covering each calendar view. Today and Upcoming share one
+# probe that includes every open task with a start date or deadline.
+VIEW_PREDICATES = {
+    "upcoming": f"{OPEN_PREDICATE} AND (TASK.startDate IS NOT NULL OR TASK.deadline IS NOT NULL)",
+    "logbook": LOGBOOK_PREDICATE,
+    "deadlines": f"{OPEN_PREDICATE} AND TASK.deadline IS NOT NULL",
+}
+
+TODAY_THINGSDATE = convert_isodate_sql_expression_to_thingsdate("date('now', 'localtime')", null_possible=False)
+
+# Membership of each calendar view, on the raw task row TASK. Today mirrors
+# things.today(): scheduled Anytime to-dos, Someday to-dos whose date has
+# come, and unscheduled to-dos whose deadline has passed.
+CALENDAR_VIEW_PREDICATES = {
+    "today": f"""
+        (TASK.{START_TO_FILTER["Anytime"]} AND TASK.startDate IS NOT NULL)
+        OR (TASK.{START_TO_FILTER["Someday"]} AND TASK.startDate <= {TODAY_THINGSDATE})
+        OR (TASK.startDate IS NULL AND TASK.deadline <= {TODAY_THINGSDATE} AND TASK.deadlineSuppressionDate IS NULL)
+        """,
+    "upcoming": f"TASK.{START_TO_FILTER['Someday']} AND TASK.startDate > {TODAY_THINGSDATE}",
+    "deadlines": "TASK.deadline IS NOT NULL",
+}
+
+# Order of each view, as things.today(), things.upcoming() and things.deadlines() return it.
+CALENDAR_VIEW_SORT_KEYS = {
+    "today": lambda task: (
+        task["today_index"] if task.get("today_index") is not None else float("inf"),
+        task.get("start_date") or "",
+    ),
+    "upcoming": lambda task: task["index"],
+    "deadlines": lambda task: task["deadline"],
+}
+
+# Wraps a make_tasks_sql_query() selection. To-dos under a heading get the
+# project of that heading and, if they have no area of their own, the
+# project's area.
+# SQLite may drop the ORDER BY of a subquery in a join, so the order is
+# applied again on the outer query, which sees the raw row as TASK.
+HEADING_CONTEXT_QUERY = """
+    SELECT
+        TASKS.*,
+        CASE
+            WHEN TASKS.project IS NULL THEN HEADING_PROJECT.uuid ELSE TASKS.project
+        END AS project,
+        CASE
+            WHEN TASKS.project IS NULL THEN HEADING_PROJECT.title ELSE TASKS.project_title
+        END AS project_title,
+        {area_columns}{columns}
+    FROM
+        ({tasks_query}) AS TASKS
+    JOIN
+        TMTask TASK ON TASK.uuid = TASKS.uuid
+    LEFT OUTER JOIN
+        TMTask HEADING ON TASKS.heading = HEADING.uuid AND HEADING.trashed = 0
+    LEFT OUTER JOIN
+        TMTask HEADING_PROJECT ON HEADING.project = HEADING_PROJECT.uuid AND HEADING_PROJECT.trashed = 0
+    LEFT OUTER JOIN
+        TMArea HEADING_AREA ON HEADING_PROJECT.area = HEADING_AREA.uuid
+    LEFT OUTER JOIN
+        TMTask PROJECT ON TASKS.project = PROJECT.uuid
+    LEFT OUTER JOIN
+        TMArea PROJECT_AREA ON PROJECT.area = PROJECT_AREA.uuid
+    ORDER BY
+        {order_predicate}
+    """
+
+# things.py leaves the area of a to-do inside a project empty; exports
+# keep that, so their grouping by project or area is unchanged.
+HEADING_AREA_COLUMNS = """
+        COALESCE(TASKS.area, CASE WHEN TASKS.project IS NULL THEN HEADING_AREA.uuid END) AS area,
+        COALESCE(TASKS.area_title, CASE WHEN TASKS.project IS NULL THEN HEADING_AREA.title END) AS area_title"""
+
+# Calendar routing matches every to-do against the area it lives in:
+# its own, its heading's project's, or its project's.
+PROJECT_AREA_COLUMNS = """
+        COALESCE(TASKS.area, HEADING_AREA.uuid, PROJECT_AREA.uuid) AS area,
+        COALESCE(TASKS.area_title, HEADING_AREA.title, PROJECT_AREA.title) AS area_title"""
+
+# Row-value comparison against the last row of the previous page.
+AFTER_PREDICATE = "AND (TASK.stopDate, TASK.uuid) < ((SELECT stopDate FROM TMTask WHERE uuid = ?), ?)"
+AFTER_INDEX_PREDICATE = 'AND (TASK."index", TASK.uuid) > ((SELECT "index" FROM TMTask WHERE uuid = ?), ?)'
+PERIOD_PREDICATE = "AND substr(datetime(TASK.stopDate, 'unixepoch', 'localtime'), 1, ?) = ?"
+# Same comparison as things.logbook(stop_date=">=...")
+SINCE_PREDICATE = "AND date(TASK.stopDate, 'unixepoch') >= date(?)"
+
+
+class ReadOnlyDatabase(things.Database):
+    """Things database that reuses a read-only connection per thread."""
+
+    def __init__(self, filepath=None, print_sql=False):
+        self._local = threading.local()
+        self._connections = {}
+        self._lock = threading.Lock()
+        super().__init__(filepath=filepath, print_sql=print_sql)
+
+    def get_connection(self):
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # "ro" means read-only, see https://sqlite.org/uri.html; other
+            # threads only touch the connection to close it after this one ends
+            connection = sqlite3.connect(f"file:{self.filepath}?mode=ro", uri=True, check_same_thread=False)
+            self._local.connection = connection
+            with self._lock:
+                self._connections[threading.current_thread()] = connection
+        return connection
+
+    def close(self, finished_only=False):
+        """Close the connections of all threads, or only of threads that have ended."""
+        with self._lock:
+            threads = [
+                thread for thread in self._connections
+                if not (finished_only and thread.is_alive())
+            ]
+            connections = [self._connections.pop(thread) for thread in threads]
+        for connection in connections:
+            connection.close()
+        if not finished_only:
+            self._local = threading.local()
+
+    def execute_query(self, sql_query, parameters=(), row_factory=None):
+        """Run a query on this thread's connection."""
+        if self.print_sql:
+            print(prettify_sql(sql_query))
+            print()
+
+        cursor = self.get_connection().cursor()
+        cursor.row_factory = row_factory or dict_factory
+        cursor.execute(sql_query, parameters)
+        return cursor.fetchall()
+
+
+def fetch_concurrently(calls, database=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Run independent things.py reads in parallel.
+
+    ``calls`` is a list of ``(function, kwargs)`` pairs such as
+    ``(things.todos, {})``. Every call shares one ``ReadOnlyDatabase``, so
+    each worker thread reuses its own connection. A call whose kwargs name
+    a database of its own keeps it. Results are returned in the order of
+    ``calls``, regardless of which query finishes first. The workers'
+    connections are closed once the pool has shut down.
+    """
+    shared = database or ReadOnlyDatabase()
+    workers = max(1, min(max_workers, len(calls)))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(function, **{"database": shared, **kwargs})
+                for function, kwargs in calls
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        # A caller's database keeps the connection of the calling thread
+        shared.close(finished_only=database is not None)
+    return results
+
+
+def get_tags_of_tasks(database, uuids):
+    """Return {task uuid: [tag titles]} for many tasks in one query."""
+    if not uuids:
+        return {}
+    placeholders = ", ".join("?" * len(uuids))
+    sql_query = f"""
+        SELECT
+            TASK_TAG.tasks AS task,
+            TAG.title
+        FROM
+            TMTaskTag AS TASK_TAG
+        JOIN
+            TMTag TAG ON TAG.uuid = TASK_TAG.tags
+        WHERE
+            TASK_TAG.tasks IN ({placeholders})
+        ORDER BY TAG."index"
+        """
+    tags = {}
+    for row in database.execute_query(sql_query, parameters=tuple(uuids)):
+        tags.setdefault(row["task"], []).append(row["title"])
+    return tags
+
+
+def load_tags(database, tasks):
+    """Replace the tags flag of tasks with their tag titles, in one query."""
+    tags = get_tags_of_tasks(database, [task["uuid"] for task in tasks if task.get("tags")])
+    for task in tasks:
+        if task.get("tags"):
+            task["tags"] = tags.get(task["uuid"], [])
+    return tasks
+
+
+def get_checklist_items_of_tasks(database, uuids):
+    """Return {task uuid: things.checklist_items()} for many tasks in one query."""
+    if not uuids:
+        return {}
+    placeholders = ", ".join("?" * len(uuids))
+    sql_query = f"""
+        SELECT
+            CHECKLIST_ITEM.task,
+            CHECKLIST_ITEM.title,
+            CASE
+                WHEN CHECKLIST_ITEM.{IS_INCOMPLETE} THEN 'incomplete'
+                WHEN CHECKLIST_ITEM.{IS_CANCELED} THEN 'canceled'
+                WHEN CHECKLIST_ITEM.{IS_COMPLETED} THEN 'completed'
+            END AS status,
+            date(CHECKLIST_ITEM.stopDate, "unixepoch", "localtime") AS stop_date,
+            'checklist-item' as type,
+            CHECKLIST_ITEM.uuid,
+            datetime(CHECKLIST_ITEM.userModificationDate, "unixepoch", "localtime") AS created,
+            datetime(CHECKLIST_ITEM.userModificationDate, "unixepoch", "localtime") AS modified
+        FROM
+            TMChecklistItem AS CHECKLIST_ITEM
+        WHERE
+            CHECKLIST_ITEM.task IN ({placeholders})
+        ORDER BY CHECKLIST_ITEM.task, CHECKLIST_ITEM."index"
+        """
+    items = {}
+    for row in database.execute_query(sql_query, parameters=tuple(uuids)):
+        items.setdefault(row.pop("task"), []).append(row)
+    return items
+
+
+def load_checklists(database, tasks):
+    """Replace the checklist flag of tasks with their items, in one query."""
+    items = get_checklist_items_of_tasks(database, [task["uuid"] for task in tasks if task.get("checklist")])
+    for task in tasks:
+        if task.get("checklist"):
+            task["checklist"] = items.get(task["uuid"], [])
+    return tasks
+
+
+def fetch_tasks(where_predicate, order_predicate=None, parameters=(), database=None, columns="",
+                project_area=False):
+    """
+    Run a make_tasks_sql_query() selection with heading context resolved.
+
+    Returns the same dicts as things.tasks(), with tags loaded. columns
+    adds SQL columns computed on the raw row TASK; with project_area,
+    to-dos inside a project also get the project's area.
+    """
+    database = database or ReadOnlyDatabase()
+    order_predicate = order_predicate or 'TASK."index"'
+    sql_query = HEADING_CONTEXT_QUERY.format(
+        tasks_query=make_tasks_sql_query(where_predicate, order_predicate),
+        order_predicate=order_predicate,
+        area_columns=PROJECT_AREA_COLUMNS if project_area else HEADING_AREA_COLUMNS,
+        columns=f",\n        {columns}" if columns else "",
+    )
+    return load_tags(database, database.execute_query(sql_query, parameters=parameters))
+
+
+def get_todos(database=None):
+    """Return things.todos() with heading context resolved."""
+    return fetch_tasks(f"{OPEN_PREDICATE} AND TASK.{IS_TODO}", 'TASK."index"', database=database)
+
+
+def get_logbook(database=None, period=None, project_area=False, since=None, uuids=None):
+    """
+    Return things.logbook(), in the same order, with heading context resolved.
+
+    period limits the logbook to entries whose stop_date starts with it,
+    for example "2024" or "2024-03". since keeps entries stopped on or
+    after an ISO date (a UTC date, like things.logbook(stop_date=">=...")),
+    and uuids only the given tasks. project_area fills in the area of
+    to-dos inside a project, as calendar routing needs.
+    """
+    where_predicate = LOGBOOK_PREDICATE
+    parameters = ()
+    if period:
+        where_predicate += PERIOD_PREDICATE
+        parameters += (len(period), period)
+    if since:
+        where_predicate += SINCE_PREDICATE
+        parameters += (since,)
+    if uuids is not None:
+        if not uuids:
+            return []
+        where_predicate += f"AND TASK.uuid IN ({', '.join('?' * len(uuids))})"
+        parameters += tuple(uuids)
+    # things.logbook() lists canceled before completed tasks, each by index,
+    # then sorts stably by completion time
+    tasks = fetch_tasks(
+        where_predicate, f'TASK.{IS_COMPLETED}, TASK."index"', parameters, database, project_area=project_area
+    )
+    tasks.sort(key=lambda task: task["stop_date"], reverse=True)
+    return tasks
+
+
+def iter_task_pages(where_predicate, order_predicate, after_predicate, page_size=DEFAULT_PAGE_SIZE,
+                    database=None, checklists=False):
+    """
+    Yield pages of at most page_size tasks, keyset-paginated.
+
+    order_predicate must end in the task uuid, and after_predicate must
+    select the rows that sort after the task whose uuid it is given, so
+    each page is a bounded query that starts right after the previous one
+    instead of an OFFSET scan. Tags, and with checklists the checklist
+    items, are loaded with one query per page.
+    """
+    database = database or ReadOnlyDatabase()
+    last_uuid = None
+
+    while True:
+        page_predicate = where_predicate
+        parameters = ()
+        if last_uuid is not None:
+            page_predicate = f"{where_predicate} {after_predicate}"
+            parameters = (last_uuid, last_uuid)
+        page = fetch_tasks(
+            page_predicate,
+            f"{order_predicate} LIMIT {int(page_size)}",
+            parameters,
+            database,
+        )
+        if not page:
+            return
+        if checklists:
+            load_checklists(database, page)
+        yield page
+
+        if len(page) < page_size:
+            return
+        last_uuid = page[-1]["uuid"]
+
+
+def iter_todos(page_size=DEFAULT_PAGE_SIZE, database=None, checklists=False):
+    """
+    Yield the to-dos of get_todos(), reading page_size rows at a time.
+
+    Ties on the index are ordered by uuid.
+    """
+    for page in iter_task_pages(
+        f"{OPEN_PREDICATE} AND TASK.{IS_TODO}", 'TASK."index", TASK.uuid', AFTER_INDEX_PREDICATE,
+        page_size, database, checklists,
+    ):
+        yield from page
+
+
+def iter_logbook(page_size=DEFAULT_PAGE_SIZE, database=None, checklists=False):
+    """
+    Yield logbook tasks newest first, reading page_size rows at a time.
+
+    Pages are keyset-paginated on (stopDate, uuid). Entries are the same
+    dicts as get_logbook() returns; ties on the completion time are
+    ordered by uuid.
+    """
+    for page in iter_task_pages(
+        LOGBOOK_PREDICATE, "TASK.stopDate DESC, TASK.uuid DESC", AFTER_PREDICATE,
+        page_size, database, checklists,
+    ):
+        yield from page
+
+
+def probe_views(views=None, database=None):
+    """
+    Return {view: (count, last modified, today)} for the calendar views.
+
+    All views are aggregated in one pass over the task table without
+    fetching any rows. A task entering, leaving or changing within a view
+    changes its count or latest ``userModificationDate``; today's date is
+    part of the signature because Today, overdue and logbook windows move
+    with it. Probes err on the side of reporting a change.
+    """
+    views = views or list(VIEW_PREDICATES)
+    database = database or ReadOnlyDatabase()
+    columns = ",\n".join(
+        f"""
+            SUM(CASE WHEN {VIEW_PREDICATES[view]} THEN 1 ELSE 0 END) AS "{view}_count",
+            MAX(CASE WHEN {VIEW_PREDICATES[view]} THEN TASK.userModificationDate END) AS "{view}_modified"
+        """
+        for view in views
+    )
+    sql_query = f"""
+        SELECT
+            {columns}
+        FROM
+            TMTask AS TASK
+        LEFT OUTER JOIN
+            TMTask PROJECT ON TASK.project = PROJECT.uuid
+        LEFT OUTER JOIN
+            TMTask HEADING ON TASK.heading = HEADING.uuid
+        LEFT OUTER JOIN
+            TMTask PROJECT_OF_HEADING ON HEADING.project = PROJECT_OF_HEADING.uuid
+        """
+    row = database.execute_query(sql_query)[0]
+    today = datetime.date.today().isoformat()
+    return {
+        view: (row[f"{view}_count"], row[f"{view}_modified"], today)
+        for view in views
+    }
+
+
+def get_checklist_signatures(database=None):
+    """
+    Return {task uuid: signature} of every task with checklist items.
+
+    The signature changes when an item is added, removed, reordered,
+    checked off or edited, so a rendered checklist can be reused as long
+    as it stays the same. Items are aggregated in one query.
+    """
+    database = database or ReadOnlyDatabase()
+    sql_query = """
+        SELECT
+            task,
+            COUNT(*) AS count,
+            MAX(userModificationDate) AS modified,
+            group_concat(uuid || ':' || status || ':' || ifnull(title, ''), char(10)) AS items
+        FROM (
+            SELECT task, uuid, status, title, userModificationDate
+            FROM TMChecklistItem
+            ORDER BY task, "index"
+        )
+        GROUP BY task
+        """
+    return {
+        row["task"]: hashlib.md5(f"{row['count']}|{row['modified']}|{row['items']}".encode('utf-8')).hexdigest()
+        for row in database.execute_query(sql_query)
+    }
+
+
+def fetch_calendar_tasks(database=None):
+    """
+    Return the open tasks in Today, Upcoming or Deadlines with one query.
+
+    Each task appears once, as the same dict things.py returns, with its
+    tags loaded and a ``views`` tuple naming the views it belongs to. Use
+    ``view_tasks`` to get one view in its usual order. To-dos under a
+    heading get the heading's project, and every to-do gets the area it
+    lives in, so routes can match on either.
+    """
+    any_view = " OR ".join(f"({predicate})" for predicate in CALENDAR_VIEW_PREDICATES.values())
+    flags = ",\n        ".join(
+        f"CASE WHEN {predicate} THEN 1 ELSE 0 END AS \"in_{view}\""
+        for view, predicate in CALENDAR_VIEW_PREDICATES.items()
+    )
+    tasks = fetch_tasks(f"{OPEN_PREDICATE} AND ({any_view})", database=database, columns=flags, project_area=True)
+    for task in tasks:
+        task["views"] = tuple(view for view in CALENDAR_VIEW_PREDICATES if task.pop(f"in_{view}"))
+    return tasks
+
+
+def view_tasks(tasks, view):
+    """Return the tasks of one view from fetch_calendar_tasks(), in view order."""
+    return sorted(
+        (task for task in tasks if view in task["views"]),
+        key=CALENDAR_VIEW_SORT_KEYS[view],
+    )